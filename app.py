@@ -5,25 +5,33 @@ from telebot import types
 import traceback
 import time as time_module
 from datetime import datetime, timedelta, time
-import sqlite3
 import base64
 import json
+import tempfile
 from threading import Thread
 
 # Importações Flask e Werkzeug
 from flask import (
     Flask, render_template, request, redirect,
-    url_for, session, flash, jsonify
+    url_for, session, flash, jsonify, Response, stream_with_context
 )
 from werkzeug.security import check_password_hash, generate_password_hash
+from jinja2 import FileSystemBytecodeCache
 
 # Carrega variáveis de ambiente do arquivo .env (apenas para desenvolvimento local)
 from dotenv import load_dotenv
 load_dotenv()
 
 # Importa as funções centralizadas de conexão e inicialização do banco de dados
-from database import get_db_connection
-from database.db_init import init_db
+from database import get_db_connection, get_pool_stats
+from database.query import Query, execute, fetch_one, fetch_all, insert_returning_id
+from database import statements
+from database import query_stats
+from database import partitions
+from database import rollup
+from database import painel_eventos
+from database.migrations import check_schema
+from database.indexes import report_missing_indexes
 
 # Importa o módulo de pagamentos do Mercado Pago
 import pagamentos
@@ -38,6 +46,15 @@ from bot.handlers.produtos import register_produtos_handlers
 from web.routes.comunidades import comunidades_bp
 from bot.handlers.access_passes import register_access_pass_handlers
 from web.routes.access_passes import passes_bp
+from web.services import dashboard
+from web.services import vendas as vendas_service
+from web.services import usuarios as usuarios_service
+from web.services import csv_export
+from web.services import http_cache
+from web.services import analytics as analytics_service
+from web.services import live_feed
+from web.services import assets
+from bot.services.known_users import known_users
 
 def escape_markdown(text: str) -> str:
     """Helper function to escape telegram markdown characters."""
@@ -74,6 +91,11 @@ if not API_TOKEN:
 # ────────────────────────────────────────────────────────────────────
 app = Flask(__name__, template_folder='web/templates', static_folder='web/static')
 app.secret_key = FLASK_SECRET_KEY
+# Templates compilados ficam em disco: cada worker novo (ou reinício) carrega o
+# bytecode em vez de recompilar o Jinja. Precisa vir antes do primeiro uso de app.jinja_env.
+JINJA_CACHE_DIR = os.getenv('JINJA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'svbot-jinja'))
+os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(JINJA_CACHE_DIR)}
 bot = telebot.TeleBot(API_TOKEN, threaded=False, parse_mode='Markdown')
 
 @app.context_processor
@@ -85,6 +107,10 @@ def inject_datetime():
 # 3. FUNÇÕES DE UTILIDADE DE BASE DE DADOS
 # ────────────────────────────────────────────────────────────────────
 def get_or_register_user(user: types.User):
+    # Usuário já visto (registrado e ativo) neste processo: nada a fazer no banco.
+    if user.id in known_users:
+        return
+
     conn = None
     try:
         conn = get_db_connection()
@@ -92,21 +118,15 @@ def get_or_register_user(user: types.User):
             print(f"ERRO DB: get_or_register_user - Não foi possível obter conexão com a base de dados.")
             return
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn:
             cur = conn.cursor()
 
-            cur.execute("SELECT id, is_active FROM users WHERE id = %s" if not is_sqlite else "SELECT id, is_active FROM users WHERE id = ?", (user.id,))
-            db_user = cur.fetchone()
+            execute(cur, statements.REGISTRAR_USUARIO,
+                    (user.id, user.username, user.first_name, user.last_name))
+            if cur.rowcount:
+                print(f"DEBUG DB: Utilizador registado/reativado: {user.username or user.first_name} (ID: {user.id})")
 
-            if db_user is None:
-                cur.execute("INSERT INTO users (id, username, first_name, last_name, is_active) VALUES (%s, %s, %s, %s, %s)" if not is_sqlite else "INSERT INTO users (id, username, first_name, last_name, is_active) VALUES (?, ?, ?, ?, ?)",
-                            (user.id, user.username, user.first_name, user.last_name, True))
-                print(f"DEBUG DB: Novo utilizador registado: {user.username or user.first_name} (ID: {user.id})")
-            else:
-                if not db_user['is_active']:
-                    cur.execute("UPDATE users SET is_active = %s WHERE id = %s" if not is_sqlite else "UPDATE users SET is_active = ? WHERE id = ?", (True, user.id))
-                    print(f"DEBUG DB: Utilizador reativado: {user.username or user.first_name} (ID: {user.id})")
+        known_users.add(user.id)
 
     except Exception as e:
         print(f"ERRO DB: get_or_register_user falhou: {e}")
@@ -141,39 +161,23 @@ def generar_cobranca(call: types.CallbackQuery, produto_id: int):
             bot.send_message(chat_id, "Ocorreu um erro interno ao conectar ao banco de dados para gerar cobrança.")
             return
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn:
             cur = conn.cursor()
-            
-            if is_sqlite and not hasattr(cur, 'keys'): 
-                 conn.row_factory = sqlite3.Row
-                 cur = conn.cursor()
 
-            if is_sqlite:
-                cur.execute('SELECT id, nome, preco, link FROM produtos WHERE id = ?', (produto_id,)) 
-            else:
-                cur.execute('SELECT id, nome, preco, link FROM produtos WHERE id = %s', (produto_id,)) 
-            produto = cur.fetchone()
+            produto = fetch_one(cur, statements.PRODUTO_POR_ID, (produto_id,))
 
             if not produto:
                 bot.send_message(chat_id, "Produto não encontrado.")
                 return
+            produto = dict(produto)
 
             data_venda = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-            if is_sqlite:
-                cur.execute("INSERT INTO vendas (user_id, produto_id, preco, status, data_venda) VALUES (?, ?, ?, ?, ?)",
-                            (user_id, produto['id'], produto['preco'], 'pendente', data_venda))
-                cur.execute("SELECT last_insert_rowid()")
-                result_id = cur.fetchone()
-                if result_id:
-                    venda_id = result_id[0] 
-            else:
-                cur.execute("INSERT INTO vendas (user_id, produto_id, preco, status, data_venda) VALUES (%s, %s, %s, %s, %s) RETURNING id",
-                            (user_id, produto['id'], produto['preco'], 'pendente', data_venda))
-                result_id = cur.fetchone()
-                if result_id:
-                    venda_id = result_id['id'] 
+            venda_id = insert_returning_id(
+                cur,
+                "INSERT INTO vendas (user_id, produto_id, preco, status, data_venda) VALUES (%s, %s, %s, %s, %s)",
+                (user_id, produto['id'], produto['preco'], 'pendente', data_venda)
+            )
 
             if venda_id is None: 
                 bot.send_message(chat_id, "Erro ao registrar a venda. Tente novamente.")
@@ -255,6 +259,15 @@ def format_datetime(value, format="%d/%m/%Y %H:%M:%S"):
     return dt_obj.strftime(format)
 
 app.jinja_env.filters['datetimeformat'] = format_datetime
+app.jinja_env.globals['asset_url'] = assets.asset_url
+app.add_url_rule('/assets/<path:filename>', 'send_asset', assets.send_asset)
+
+def precompile_templates():
+    """Compila todos os templates (gravando o bytecode) antes da primeira requisição."""
+    names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    print(f"DEBUG: {len(names)} template(s) compilado(s).")
 
 # ────────────────────────────────────────────────────────────────────
 # 5. MIDDLEWARE DE AUTENTICAÇÃO (para painel web)
@@ -266,7 +279,7 @@ def require_login():
     Redirects to the login page if not authenticated.
     """
     # Rotas que não exigem login
-    if request.endpoint in ['login', 'static', 'telegram_webhook', 'health_check', 'webhook_mercado_pago', 'reset_admin_password_route', None, 'get_sales_data']:
+    if request.endpoint in ['login', 'static', 'telegram_webhook', 'health_check', 'webhook_mercado_pago', 'reset_admin_password_route', None, 'get_sales_data', 'send_asset']:
         return
     
     # As rotas de blueprint são referenciadas como 'blueprint_name.endpoint_function_name'
@@ -275,7 +288,7 @@ def require_login():
         flash('Por favor, faça login para acessar esta página.', 'warning')
         return redirect(url_for('login')) 
 
-    if request.endpoint not in ['login', 'static', 'telegram_webhook', 'health_check', 'webhook_mercado_pago', 'reset_admin_password_route', None, 'get_sales_data'] and not session.get('logged_in'):
+    if request.endpoint not in ['login', 'static', 'telegram_webhook', 'health_check', 'webhook_mercado_pago', 'reset_admin_password_route', None, 'get_sales_data', 'send_asset'] and not session.get('logged_in'):
         print(f"DEBUG AUTH: Unauthorized access to '{request.path}'. Redirecting to login.")
         flash('Por favor, faça login para acessar esta página.', 'warning')
         return redirect(url_for('login'))
@@ -290,6 +303,30 @@ def health_check():
     print(f"DEBUG HEALTH: Requisição para /health. Method: {request.method}")
     return "OK", 200
 
+@app.route('/api/db_pool_stats')
+def db_pool_stats():
+    """Estatísticas do pool de conexões deste worker (em uso, ociosas, tempo de espera)."""
+    return jsonify(get_pool_stats()), 200
+
+@app.route('/api/query_stats')
+def query_stats_endpoint():
+    """
+    Top-N instruções SQL deste worker por tempo total (ou `order=avg_ms|max_ms|calls`).
+    `?reset=1` zera os contadores depois de responder.
+    """
+    top = request.args.get('top', 20, type=int)
+    order = request.args.get('order', 'total_ms')
+    if order not in ('total_ms', 'avg_ms', 'max_ms', 'calls'):
+        return jsonify({'error': 'order deve ser total_ms, avg_ms, max_ms ou calls'}), 400
+    statements_top = query_stats.top_statements(max(1, min(top, 200)), order)
+    if request.args.get('reset') == '1':
+        query_stats.reset()
+    return jsonify({
+        'pid': os.getpid(),
+        'slow_query_ms': query_stats.SLOW_QUERY_MS,
+        'statements': statements_top,
+    }), 200
+
 @app.route(f"/{API_TOKEN}", methods=['POST'])
 def telegram_webhook():
     """
@@ -342,13 +379,12 @@ def webhook_mercado_pago():
                 user_id = int(parts[0].split('=')[1])
                 pass_id = int(parts[1].split('=')[1])
 
-                cur.execute("""
+                pass_item = fetch_one(cur, """
                     SELECT ap.*, c.chat_id
                     FROM access_passes ap
                     LEFT JOIN comunidades c ON ap.community_id = c.id
                     WHERE ap.id = %s
                 """, (pass_id,))
-                pass_item = cur.fetchone()
 
                 if not pass_item:
                     print(f"ERRO: Passe de acesso com ID {pass_id} não encontrado no banco.")
@@ -377,7 +413,8 @@ def webhook_mercado_pago():
                         start_date = datetime.now()
                         expiration_date = start_date + duration
 
-                        cur.execute(
+                        execute(
+                            cur,
                             """
                             INSERT INTO user_access
                             (user_id, pass_id, status, start_date, expiration_date, payment_id, invite_link_used)
@@ -385,6 +422,7 @@ def webhook_mercado_pago():
                             """,
                             (user_id, pass_id, start_date, expiration_date, payment_id, invite_link)
                         )
+                        painel_eventos.publish_access_granted(cur, user_id, pass_item, expiration_date)
                         conn.commit()
                         
                         print(f"SUCESSO: Novo acesso para user {user_id} (passe {pass_id}) registrado. Expira em: {expiration_date}")
@@ -409,18 +447,28 @@ def webhook_mercado_pago():
             # LÓGICA PARA VENDA DE PRODUTO NORMAL (sem alterações)
             else:
                 venda_id = external_reference
-                cur.execute("UPDATE vendas SET status = 'aprovado', payment_id = %s WHERE id = %s", (payment_id, venda_id))
-                
-                cur.execute("SELECT * FROM vendas WHERE id = %s", (venda_id,))
-                venda = cur.fetchone()
-                
-                cur.execute("SELECT * FROM produtos WHERE id = %s", (venda['produto_id'],))
-                produto = cur.fetchone()
+                execute(
+                    cur,
+                    "UPDATE vendas SET status = 'aprovado', payment_id = %s WHERE id = %s AND status <> 'aprovado'",
+                    (payment_id, venda_id)
+                )
+                # Só a notificação que de fato aprovou a venda soma no agregado do painel
+                # (o Mercado Pago pode reenviar a mesma notificação); mesma transação do UPDATE.
+                venda_aprovada_agora = cur.rowcount == 1
+                if venda_aprovada_agora:
+                    rollup.record_approved_sale(cur, venda_id)
+                    painel_eventos.publish_approved_sale(cur, venda_id)
+
+                venda = fetch_one(cur, "SELECT * FROM vendas WHERE id = %s", (venda_id,))
+
+                produto = fetch_one(cur, "SELECT * FROM produtos WHERE id = %s", (venda['produto_id'],))
                 
                 if produto:
                     enviar_produto_telegram(venda['user_id'], produto['nome'], produto['link'])
                 
                 conn.commit()
+                if venda_aprovada_agora:
+                    dashboard.invalidate()
                 print(f"SUCESSO: Venda de produto {venda_id} processada.")
 
     except Exception as e:
@@ -447,14 +495,9 @@ def login():
                 flash('Erro de conexão com a base de dados.', 'error')
                 return render_template('login.html')
 
-            is_sqlite = isinstance(conn, sqlite3.Connection)
             with conn:
                 cur = conn.cursor()
-                if is_sqlite:
-                    cur.execute('SELECT * FROM admin WHERE username = ?', (username,))
-                else:
-                    cur.execute('SELECT * FROM admin WHERE username = %s', (username,))
-                admin_user = cur.fetchone()
+                admin_user = fetch_one(cur, 'SELECT * FROM admin WHERE username = %s', (username,))
 
                 if admin_user and check_password_hash(admin_user['password_hash'], password):
                     session['logged_in'] = True
@@ -497,20 +540,13 @@ def reset_admin_password_route():
         if conn is None:
             return f"<h1>Error</h1><p>Database connection error.</p>", 500
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn:
             cur = conn.cursor()
-            if is_sqlite:
-                cur.execute("UPDATE admin SET password_hash = ? WHERE username = ?", (hashed_password, USERNAME_TO_RESET))
-            else:
-                cur.execute("UPDATE admin SET password_hash = %s WHERE username = %s", (hashed_password, USERNAME_TO_RESET))
+            execute(cur, "UPDATE admin SET password_hash = %s WHERE username = %s", (hashed_password, USERNAME_TO_RESET))
 
             if cur.rowcount == 0:
                 print(f"DEBUG RESET: User '{USERNAME_TO_RESET}' not found for update. Attempting to create...")
-                if is_sqlite:
-                    cur.execute("INSERT INTO admin (username, password_hash) VALUES (?, ?)", (USERNAME_TO_RESET, hashed_password))
-                else:
-                    cur.execute("INSERT INTO admin (username, password_hash) VALUES (%s, %s)", (USERNAME_TO_RESET, hashed_password))
+                execute(cur, "INSERT INTO admin (username, password_hash) VALUES (%s, %s)", (USERNAME_TO_RESET, hashed_password))
                 message = f"User '{USERNAME_TO_RESET}' not found. A new user was created with the default password. PLEASE, REMOVE THIS ROUTE NOW!"
                 print(f"[SUCCESS RESET] {message}")
                 return f"<h1>Success</h1><p>{message}</p>", 200
@@ -541,158 +577,69 @@ def logout():
 def index():
     print(f"DEBUG INDEX: Requisição para /. session.get('logged_in'): {session.get('logged_in')}")
 
-    conn = None
     try:
-        conn = get_db_connection()
-        if conn is None:
+        today = datetime.now().date()
+        painel = dashboard.dashboard_snapshot(get_db_connection, today)
+        if painel is None:
             flash('Erro de conexão com o banco de dados.', 'danger')
             return redirect(url_for('login')) 
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
-        with conn:
-            cur = conn.cursor()
-
-            # Inicializa as variáveis com valores padrão
-            total_usuarios = 0
-            total_produtos = 0
-            receita_total = 0.0 
-            vendas_recentes = []
-            chart_labels = []
-            chart_data_receita = [] 
-            chart_data_quantidade = []
-
-            # --- Métricas de Período Atual e Período Anterior ---
-            today = datetime.now().date() 
-            
-            start_of_current_month = datetime(today.year, today.month, 1)
-            last_day_of_month = (datetime(today.year, today.month + 1, 1) - timedelta(days=1)).replace(hour=23, minute=59, second=59, microsecond=999999) if today.month < 12 else datetime(today.year, 12, 31, 23, 59, 59, 999999)
-            end_of_current_month = last_day_of_month
-
-            start_of_previous_month = (start_of_current_month - timedelta(days=1)).replace(day=1) 
-            end_of_previous_month = (start_of_current_month - timedelta(microseconds=1)).replace(hour=23, minute=59, second=59, microsecond=999999) 
-            
-            def get_sales_data_for_period_internal(start_dt, end_dt, cursor, is_sqlite_db):
-                if is_sqlite_db:
-                    cursor.execute(
-                        "SELECT COUNT(id) AS count, SUM(preco) AS sum FROM vendas WHERE status = 'aprovado' AND data_venda BETWEEN ? AND ?",
-                        (start_dt.isoformat(), end_dt.isoformat())
-                    )
-                else: 
-                    cursor.execute(
-                        "SELECT COUNT(id) AS count, SUM(preco) AS sum FROM vendas WHERE status = %s AND data_venda BETWEEN %s AND %s",
-                        ('aprovado', start_dt, end_dt)
-                    )
-                row = cursor.fetchone()
-                count = row['count'] if row and 'count' in row and row['count'] is not None else 0
-                total_sum = float(row['sum']) if row and 'sum' in row and row['sum'] is not None else 0.0
-                return count, total_sum
-
-            periodo_atual_vendas_quantidade, periodo_atual_vendas_valor = get_sales_data_for_period_internal(start_of_current_month, end_of_current_month, cur, is_sqlite)
-            
-            periodo_anterior_vendas_quantidade, periodo_anterior_vendas_valor = get_sales_data_for_period_internal(start_of_previous_month, end_of_previous_month, cur, is_sqlite)
-
-            if periodo_anterior_vendas_quantidade > 0:
-                variacao_vendas_quantidade = ((periodo_atual_vendas_quantidade - periodo_anterior_vendas_quantidade) / periodo_anterior_vendas_quantidade) * 100
-            else:
-                variacao_vendas_quantidade = 100.0 if periodo_atual_vendas_quantidade > 0 else 0.0
-            
-            if periodo_anterior_vendas_valor > 0:
-                variacao_vendas_valor = ((periodo_atual_vendas_valor - periodo_anterior_vendas_valor) / periodo_anterior_vendas_valor) * 100
-            else:
-                variacao_vendas_valor = 100.0 if periodo_atual_vendas_valor > 0 else 0.0
-
-
-            cur.execute('SELECT COUNT(id) AS count FROM users WHERE is_active = TRUE' if not is_sqlite else 'SELECT COUNT(id) AS count FROM users WHERE is_active = 1')
-            total_usuarios_row = cur.fetchone()
-            if total_usuarios_row and 'count' in total_usuarios_row and total_usuarios_row['count'] is not None:
-                total_usuarios = total_usuarios_row['count']
-
-            cur.execute('SELECT COUNT(id) AS count FROM produtos')
-            total_produtos_row = cur.fetchone()
-            if total_produtos_row and 'count' in total_produtos_row and total_produtos_row['count'] is not None:
-                total_produtos = total_produtos_row['count']
-
-            cur.execute("SELECT COUNT(id) AS count, SUM(preco) AS sum FROM vendas WHERE status = %s" if not is_sqlite else "SELECT COUNT(id) AS count, SUM(preco) AS sum FROM vendas WHERE status = ?", ('aprovado',))
-            vendas_data_row_geral = cur.fetchone()
-            if vendas_data_row_geral and 'sum' in vendas_data_row_geral and vendas_data_row_geral['sum'] is not None:
-                receita_total = float(vendas_data_row_geral['sum'])
+        print(f"DEBUG INDEX: Rendering index.html with dashboard data.")
+        return render_template(
+            'index.html',
+            total_usuarios=painel['total_usuarios'],
+            total_produtos=painel['total_produtos'],
+            receita_total=painel['receita_total'],
+            periodo_atual_vendas_quantidade=painel['periodo_atual_vendas_quantidade'],
+            periodo_atual_vendas_valor=painel['periodo_atual_vendas_valor'],
+            variacao_vendas_quantidade=f"{painel['variacao_vendas_quantidade']:.1f}", 
+            variacao_vendas_valor=f"{painel['variacao_vendas_valor']:.1f}",
+            periodo_anterior_vendas_quantidade=painel['periodo_anterior_vendas_quantidade'],
+            periodo_anterior_vendas_valor=painel['periodo_anterior_vendas_valor'],
             
-            if is_sqlite:
-                cur.execute("""
-                    SELECT v.id, u.username, u.first_name, p.nome, v.preco, v.data_venda, p.id AS produto_id,
-                    CASE WHEN v.status = 'aprovado' THEN 'aprovado'
-                         WHEN v.status = 'pendente' AND (strftime('%s', 'now') - strftime('%s', v.data_venda)) > 3600 THEN 'expirado'
-                         ELSE v.status
-                    END AS status
-                    FROM vendas v JOIN users u ON v.user_id = u.id JOIN produtos p ON v.produto_id = p.id
-                    ORDER BY v.id DESC LIMIT 5
-                """)
-            else: 
-                cur.execute("""
-                    SELECT v.id, u.username, u.first_name, p.nome, v.preco, v.data_venda, p.id AS produto_id,
-                    CASE WHEN v.status = 'aprovado' THEN 'aprovado'
-                         WHEN v.status = 'pendente' AND EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC' - v.data_venda)) > 3600 THEN 'expirado'
-                         ELSE v.status
-                    END AS status
-                    FROM vendas v JOIN users u ON v.user_id = u.id JOIN produtos p ON v.produto_id = p.id
-                    ORDER BY v.id DESC LIMIT 5
-                """)
-            vendas_recentes = cur.fetchall()
-
-            today_date_chart = datetime.now().date()
-            for i in range(6, -1, -1): 
-                day = today_date_chart - timedelta(days=i)
-                start_of_day = datetime.combine(day, time.min)
-                end_of_day = datetime.combine(day, time.max)
-                chart_labels.append(day.strftime('%d/%m'))
-
-                if is_sqlite:
-                    cur.execute(
-                        "SELECT SUM(preco) AS sum, COUNT(id) AS count FROM vendas WHERE status = ? AND data_venda BETWEEN ? AND ?",
-                        ('aprovado', start_of_day.isoformat(), end_of_day.isoformat())
-                    )
-                else: 
-                    cur.execute(
-                        "SELECT SUM(preco) AS sum, COUNT(id) AS count FROM vendas WHERE status = %s AND data_venda BETWEEN %s AND %s",
-                        ('aprovado', start_of_day, end_of_day)
-                    )
-
-                daily_data_row = cur.fetchone()
-                daily_revenue = float(daily_data_row['sum']) if daily_data_row and 'sum' in daily_data_row and daily_data_row['sum'] is not None else 0
-                daily_quantity = int(daily_data_row['count']) if daily_data_row and 'count' in daily_data_row and daily_data_row['count'] is not None else 0
-
-                chart_data_receita.append(daily_revenue)
-                chart_data_quantidade.append(daily_quantity)
-                
-            print(f"DEBUG INDEX: Rendering index.html with dashboard data.")
-            return render_template(
-                'index.html',
-                total_usuarios=total_usuarios,
-                total_produtos=total_produtos,
-                receita_total=receita_total,
-                periodo_atual_vendas_quantidade=periodo_atual_vendas_quantidade,
-                periodo_atual_vendas_valor=periodo_atual_vendas_valor,
-                variacao_vendas_quantidade=f"{variacao_vendas_quantidade:.1f}", 
-                variacao_vendas_valor=f"{variacao_vendas_valor:.1f}",
-                periodo_anterior_vendas_quantidade=periodo_anterior_vendas_quantidade,
-                periodo_anterior_vendas_valor=periodo_anterior_vendas_valor,
-                
-                vendas_recentes=vendas_recentes,
-                chart_labels=json.dumps(chart_labels),
-                chart_data_receita=json.dumps(chart_data_receita), 
-                chart_data_quantidade=json.dumps(chart_data_quantidade), 
-                current_year=datetime.now().year,
-                data_inicio_periodo_atual=start_of_current_month.strftime('%d/%m/%Y'),
-                data_fim_periodo_atual=today.strftime('%d/%m/%Y') 
-            )
+            vendas_recentes=painel['vendas_recentes'],
+            chart_labels=json.dumps(painel['chart_labels']),
+            chart_data_receita=json.dumps(painel['chart_data_receita']), 
+            chart_data_quantidade=json.dumps(painel['chart_data_quantidade']), 
+            current_year=datetime.now().year,
+            data_inicio_periodo_atual=today.replace(day=1).strftime('%d/%m/%Y'),
+            data_fim_periodo_atual=today.strftime('%d/%m/%Y') 
+        )
     except Exception as e:
         print(f"ERRO INDEX: Falha ao renderizar o dashboard: {e}")
         traceback.print_exc()
         flash('Erro ao carregar o dashboard.', 'danger')
         return redirect(url_for('login')) 
-    finally:
-        if conn:
-            conn.close()
+
+@app.route('/api/eventos', methods=['GET'])
+def eventos_painel():
+    """Server-Sent Events do painel ao vivo (vendas aprovadas e passes ativados)."""
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is None:
+        # Reconexão feita pelo próprio painel depois de um 503 (o EventSource novo não envia o cabeçalho).
+        last_event_id = request.args.get('last_event_id', type=int)
+    if not live_feed.acquire_stream():
+        print("AVISO PAINEL AO VIVO: Limite de conexões SSE do worker atingido; respondendo 503.")
+        return Response(
+            f"retry: {live_feed.RETRY_MS}\n\n",
+            status=503,
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'Retry-After': str(max(1, live_feed.RETRY_MS // 1000))},
+        )
+    response = Response(
+        stream_with_context(live_feed.stream(last_event_id)),
+        mimetype='text/event-stream',
+        # Sem buffer em proxies (nginx/Render), senão os eventos chegam em rajadas.
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    # O servidor WSGI sempre fecha a resposta, mesmo se o gerador nem chegar a rodar.
+    response.call_on_close(live_feed.release_stream)
+    return response
+
+# Tempo (s) que o navegador reutiliza, sem revalidar, o gráfico de um período já
+# encerrado e os detalhes de uma venda aprovada.
+SALES_DATA_MAX_AGE = int(os.getenv('SALES_DATA_MAX_AGE', '3600'))
+VENDA_DETALHES_MAX_AGE = int(os.getenv('VENDA_DETALHES_MAX_AGE', '3600'))
 
 @app.route('/api/sales_data', methods=['GET'])
 def get_sales_data():
@@ -700,12 +647,10 @@ def get_sales_data():
 
     conn = None
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(readonly=True)
         if conn is None:
             return jsonify({'error': 'Erro de conexão com o banco de dados'}), 500
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
-        
         start_date_str = request.args.get('start_date')
         end_date_str = request.args.get('end_date')
 
@@ -719,46 +664,34 @@ def get_sales_data():
             except ValueError:
                 return jsonify({'error': 'Formato de data inválido. UsebeginPath-MM-DD.'}), 400
         
-        chart_labels = []
-        chart_data_receita = []
-        chart_data_quantidade = []
+        try:
+            granularity = dashboard.choose_granularity(start_date, end_date, request.args.get('granularity'))
+        except ValueError:
+            return jsonify({'error': 'Granularidade inválida. Use day, week ou month.'}), 400
 
-        print(f"DEBUG API SALES DATA: start_date={start_date}, end_date={end_date}")
+        print(f"DEBUG API SALES DATA: start_date={start_date}, end_date={end_date}, granularity={granularity}")
+
+        # Um intervalo que já terminou só muda se o agregado for recalculado: o
+        # navegador pode reutilizá-lo; o que inclui hoje é sempre revalidado.
+        max_age = SALES_DATA_MAX_AGE if end_date < datetime.now().date() else None
 
-        current_day = start_date 
-        
         with conn: 
             cur = conn.cursor()
-            while current_day <= end_date: 
-                chart_labels.append(current_day.strftime('%d/%m')) 
-                start_of_day_dt = datetime.combine(current_day, time.min)
-                end_of_day_dt = datetime.combine(current_day, time.max)
-
-                if is_sqlite:
-                    cur.execute(
-                        "SELECT SUM(preco) AS sum, COUNT(id) AS count FROM vendas WHERE status = 'aprovado' AND data_venda BETWEEN ? AND ?",
-                        ('aprovado', start_of_day_dt.isoformat(), end_of_day_dt.isoformat())
-                    )
-                else: 
-                    cur.execute(
-                        "SELECT SUM(preco) AS sum, COUNT(id) AS count FROM vendas WHERE status = %s AND data_venda BETWEEN %s AND %s",
-                        ('aprovado', start_of_day_dt, end_of_day_dt)
-                    )
-
-                daily_data_row = cur.fetchone()
-                daily_revenue = float(daily_data_row['sum']) if daily_data_row and 'sum' in daily_data_row and daily_data_row['sum'] is not None else 0
-                daily_quantity = int(daily_data_row['count']) if daily_data_row and 'count' in daily_data_row and daily_data_row['count'] is not None else 0
-
-                chart_data_receita.append(daily_revenue)
-                chart_data_quantidade.append(daily_quantity)
-                
-                current_day += timedelta(days=1) 
+            etag = http_cache.make_etag(rollup.data_version(cur, start_date, end_date), start_date, end_date, granularity)
+            not_modified = http_cache.not_modified(etag, max_age)
+            if not_modified is not None:
+                return not_modified
+            chart_labels, chart_data_receita, chart_data_quantidade = dashboard.sales_series(
+                cur, start_date, end_date, granularity
+            )
                 
-        return jsonify({
+        response = jsonify({
+            'granularity': granularity,
             'labels': chart_labels,
             'data_receita': chart_data_receita,
             'data_quantidade': chart_data_quantidade
-        }), 200
+        })
+        return http_cache.apply_cache_headers(response, etag, max_age), 200
     except Exception as e:
         print(f"ERRO API SALES DATA: Falha ao obter dados de vendas: {e}")
         traceback.print_exc()
@@ -778,7 +711,6 @@ def produtos():
             flash('Erro de conexão com o banco de dados.', 'error')
             return redirect(url_for('index')) 
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn:
             cur = conn.cursor()
             if request.method == 'POST':
@@ -798,19 +730,14 @@ def produtos():
                     flash('Preço inválido. Use um número.', 'danger')
                     return redirect(url_for('produtos', nome_val=nome, preco_val=preco_str, link_val=link))
 
-                if is_sqlite:
-                    cur.execute('INSERT INTO produtos (nome, preco, link) VALUES (?, ?, ?)', (nome, preco, link))
-                else:
-                    cur.execute('INSERT INTO produtos (nome, preco, link) VALUES (%s, %s, %s)', (nome, preco, link))
+                execute(cur, 'INSERT INTO produtos (nome, preco, link) VALUES (%s, %s, %s)', (nome, preco, link))
+                conn.commit()
+                dashboard.invalidate()
                 flash('Produto adicionado com sucesso!', 'success')
                 return redirect(url_for('produtos'))
 
             # For GET request, just fetch and display products
-            if is_sqlite:
-                cur.execute('SELECT * FROM produtos ORDER BY id DESC')
-            else:
-                cur.execute('SELECT * FROM produtos ORDER BY id DESC')
-            produtos_lista = cur.fetchall()
+            produtos_lista = fetch_all(cur, 'SELECT * FROM produtos ORDER BY id DESC')
             print(f"DEBUG PRODUTOS: {len(produtos_lista)} produtos encontrados.")
             return render_template('produtos.html', produtos=produtos_lista)
 
@@ -834,7 +761,6 @@ def editar_produto(produto_id):
             flash('Erro de conexão com o banco de dados para editar produto.', 'danger')
             return redirect(url_for('produtos')) 
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn:
             cur = conn.cursor()
             if request.method == 'POST':
@@ -855,19 +781,12 @@ def editar_produto(produto_id):
                     flash('Preço inválido. Use um número.', 'danger')
                     return redirect(url_for('produtos', nome_val=nome, preco_val=preco_str, link_val=link))
 
-                if is_sqlite:
-                    cur.execute("UPDATE produtos SET nome = ?, preco = ?, link = ? WHERE id = ?", (nome, preco, link, produto_id))
-                else:
-                    cur.execute("UPDATE produtos SET nome = %s, preco = %s, link = %s WHERE id = %s", (nome, preco, link, produto_id))
+                execute(cur, "UPDATE produtos SET nome = %s, preco = %s, link = %s WHERE id = %s", (nome, preco, link, produto_id))
                 print(f"DEBUG EDITAR_PRODUTO: Produto ID {produto_id} atualizado com sucesso.")
                 flash('Produto atualizado com sucesso!', 'success')
                 return redirect(url_for('produtos')) 
             else: # GET request to show edit form
-                if is_sqlite:
-                    cur.execute('SELECT * FROM produtos WHERE id = ?', (produto_id,))
-                else:
-                    cur.execute('SELECT * FROM produtos WHERE id = %s', (produto_id,))
-                produto = cur.fetchone()
+                produto = fetch_one(cur, 'SELECT * FROM produtos WHERE id = %s', (produto_id,))
 
                 if not produto:
                     flash('Produto não encontrado.', 'danger')
@@ -901,21 +820,15 @@ def deletar_produto(produto_id):
             flash('Erro de conexão com o banco de dados.', 'error')
             return redirect(url_for('produtos')) 
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn:
             cur = conn.cursor()
-            if is_sqlite:
-                cur.execute('SELECT id FROM produtos WHERE id = ?', (produto_id,))
-            else:
-                cur.execute('SELECT id FROM produtos WHERE id = %s', (produto_id,))
-            if not cur.fetchone():
+            if not fetch_one(cur, 'SELECT id FROM produtos WHERE id = %s', (produto_id,)):
                 flash('Produto não encontrado.', 'danger')
                 return redirect(url_for('produtos')) 
 
-            if is_sqlite:
-                cur.execute('DELETE FROM produtos WHERE id = ?', (produto_id,))
-            else:
-                cur.execute('DELETE FROM produtos WHERE id = %s', (produto_id,))
+            execute(cur, 'DELETE FROM produtos WHERE id = %s', (produto_id,))
+            conn.commit()
+            dashboard.invalidate()
             print(f"DEBUG DELETAR_PRODUTO: Produto ID {produto_id} deletado com sucesso.")
             flash('Produto deletado com sucesso!', 'success')
             return redirect(url_for('produtos')) 
@@ -933,84 +846,25 @@ def vendas():
 
     conn = None
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(readonly=True)
         if conn is None:
             flash('Erro de conexão com o banco de dados.', 'error')
             return redirect(url_for('index')) 
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn:
             cur = conn.cursor()
             # Fetch available products for the filter
-            cur.execute('SELECT id, nome FROM produtos ORDER BY nome')
-            produtos_disponiveis = cur.fetchall()
-
-            # Base SQL query for sales
-            query_base = """
-                SELECT
-                    v.id,
-                    u.username,
-                    u.first_name,
-                    p.nome AS nome_produto,
-                    v.preco,
-                    v.data_venda,
-                    v.payment_id,
-                    v.payer_name,
-                    v.payer_email,
-                    CASE
-                        WHEN v.status = 'aprovado' THEN 'aprovado'
-                        WHEN v.status = 'pendente' """
-
-            if is_sqlite:
-                query_base += " AND (strftime('%s', 'now') - strftime('%s', v.data_venda)) > 3600 THEN 'expirado'"
-            else: # PostgreSQL
-                query_base += " AND EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC' - v.data_venda)) > 3600 THEN 'expirado'"
-            query_base += """
-                        ELSE v.status
-                    END AS status
-                FROM vendas v
-                JOIN users u ON v.user_id = u.id
-                JOIN produtos p ON v.produto_id = p.id
-            """
-            conditions = []
-            params = []
-
-            data_inicio_str = request.args.get('data_inicio')
-            data_fim_str = request.args.get('data_fim')
-            pesquisa_str = request.args.get('pesquisa')
-            produto_id_str = request.args.get('produto_id')
-            status_str = request.args.get('status')
-
-            if data_inicio_str:
-                conditions.append("DATE(v.data_venda) >= %s" if not is_sqlite else "DATE(v.data_venda) >= ?")
-                params.append(data_inicio_str)
-            if data_fim_str:
-                conditions.append("DATE(v.data_venda) <= %s" if not is_sqlite else "DATE(v.data_venda) <= ?")
-                params.append(data_fim_str)
-            if pesquisa_str:
-                conditions.append("(u.username {} %s OR p.nome {} %s OR u.first_name {} %s)".format("ILIKE" if not is_sqlite else "LIKE", "ILIKE" if not is_sqlite else "LIKE", "ILIKE" if not is_sqlite else "LIKE"))
-                params.extend([f'%{pesquisa_str}%'] * 3)
-            if produto_id_str:
-                conditions.append("p.id = %s" if not is_sqlite else "p.id = ?")
-                params.append(int(produto_id_str))
-            if status_str:
-                if status_str == 'expirado':
-                    if is_sqlite:
-                        conditions.append("(v.status = 'pendente' AND (strftime('%s', 'now') - strftime('%s', v.data_venda)) > 3600)")
-                    else:
-                        conditions.append("(v.status = 'pendente' AND EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC' - v.data_venda)) > 3600)")
-                else:
-                    conditions.append("v.status = %s" if not is_sqlite else "v.status = ?")
-                    params.append(status_str)
-
-            if conditions:
-                query_base += " WHERE " + " AND ".join(conditions)
-
-            query_base += " ORDER BY v.id DESC"
+            produtos_disponiveis = fetch_all(cur, 'SELECT id, nome FROM produtos ORDER BY nome')
 
-            cur.execute(query_base, tuple(params))
-            vendas_lista = cur.fetchall()
-            return render_template('vendas.html', vendas=vendas_lista, produtos_disponiveis=produtos_disponiveis)
+            try:
+                vendas_lista, proximo_cursor = vendas_service.sales_page(cur, request.args)
+            except ValueError:
+                flash('Formato de data inválido. Use AAAA-MM-DD.', 'warning')
+                return redirect(url_for('vendas'))
+            return render_template(
+                'vendas.html', vendas=vendas_lista, produtos_disponiveis=produtos_disponiveis,
+                proximo_cursor=proximo_cursor
+            )
     except Exception as e:
         print(f"ERRO VENDAS: Falha ao carregar vendas para o dashboard: {e}")
         traceback.print_exc()
@@ -1020,30 +874,100 @@ def vendas():
         if conn:
             conn.close()
 
+@app.route('/api/vendas', methods=['GET'])
+def api_vendas():
+    """Próximas páginas de /vendas (rolagem infinita): mesmos filtros, cursor em `antes_de`."""
+    conn = None
+    try:
+        try:
+            antes_de = request.args.get('antes_de') or None
+            limite = request.args.get('limite', default=vendas_service.VENDAS_POR_PAGINA, type=int)
+            conn = get_db_connection(readonly=True)
+            if conn is None:
+                return jsonify({'error': 'Erro de conexão com o banco de dados'}), 500
+            with conn:
+                cur = conn.cursor()
+                vendas_lista, proximo_cursor = vendas_service.sales_page(cur, request.args, antes_de, limite)
+        except ValueError:
+            return jsonify({'error': 'Filtro inválido. Datas em AAAA-MM-DD.'}), 400
+
+        return jsonify({
+            'vendas': [
+                {
+                    'id': venda['id'],
+                    'data_venda': format_datetime(venda['data_venda']),
+                    'first_name': venda['first_name'],
+                    'username': venda['username'],
+                    'nome_produto': venda['nome_produto'],
+                    'preco': float(venda['preco']) if venda['preco'] is not None else None,
+                    'status': venda['status'],
+                }
+                for venda in vendas_lista
+            ],
+            'proximo_cursor': proximo_cursor,
+        }), 200
+    except Exception as e:
+        print(f"ERRO API VENDAS: Falha ao carregar a página de vendas: {e}")
+        traceback.print_exc()
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+    finally:
+        if conn:
+            conn.close()
+
+@app.route('/vendas/export.csv', methods=['GET'])
+def exportar_vendas():
+    """CSV de todas as vendas que atendem aos filtros de /vendas, em streaming."""
+    conn = get_db_connection(readonly=True)
+    if conn is None:
+        flash('Erro de conexão com o banco de dados.', 'error')
+        return redirect(url_for('vendas'))
+    try:
+        cur = conn.cursor()
+        try:
+            query, params = vendas_service.export_query(cur, request.args)
+        finally:
+            cur.close()
+    except ValueError:
+        conn.close()
+        flash('Formato de data inválido. Use AAAA-MM-DD.', 'warning')
+        return redirect(url_for('vendas'))
+    except Exception:
+        conn.close()
+        raise
+
+    response = Response(
+        stream_with_context(csv_export.stream_csv(conn, query, params, vendas_service.EXPORT_COLUMNS, 'exportar_vendas')),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f"attachment; filename=vendas_{datetime.now():%Y%m%d_%H%M}.csv"},
+    )
+    response.call_on_close(conn.close)
+    return response
+
 @app.route('/venda_detalhes/<int:id>')
 def venda_detalhes(id):
     print(f"DEBUG VENDA DETALHES: Requisição para /venda_detalhes. Method: {request.method}")
 
     conn = None
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(readonly=True)
         if conn is None:
             return jsonify({'error': 'Erro de conexão com o banco de dados'}), 500
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn:
             cur = conn.cursor()
-            if is_sqlite:
-                cur.execute('SELECT * FROM vendas WHERE id = ?', (id,))
-            else:
-                cur.execute('SELECT * FROM vendas WHERE id = %s', (id,))
-
-            venda = cur.fetchone()
+            venda = fetch_one(cur, 'SELECT * FROM vendas WHERE id = %s', (id,))
             if venda:
                 venda_dict = dict(venda)
                 if 'data_venda' in venda_dict and isinstance(venda_dict['data_venda'], datetime):
                     venda_dict['data_venda'] = venda_dict['data_venda'].isoformat()
-                return jsonify(venda_dict)
+                # A busca pela PK é barata; o que se economiza é o corpo. Venda
+                # aprovada não muda mais, as demais ainda podem mudar de status.
+                etag = http_cache.make_etag(json.dumps(venda_dict, sort_keys=True, default=str))
+                max_age = VENDA_DETALHES_MAX_AGE if venda_dict.get('status') == 'aprovado' else None
+                not_modified = http_cache.not_modified(etag, max_age)
+                if not_modified is not None:
+                    return not_modified
+                return http_cache.apply_cache_headers(jsonify(venda_dict), etag, max_age)
             return jsonify({'error': 'Venda não encontrada'}), 404
     except Exception as e:
         print(f"ERRO VENDA DETALHES: Falha ao obter detalhes da venda: {e}")
@@ -1053,28 +977,50 @@ def venda_detalhes(id):
         if conn:
             conn.close()
 
+@app.route('/analytics')
+def analytics():
+    print(f"DEBUG ANALYTICS: Requisição para /analytics. Method: {request.method}")
+
+    try:
+        dados = analytics_service.analytics_snapshot(get_db_connection, datetime.now().date())
+        if dados is None:
+            flash('Erro de conexão com o banco de dados.', 'error')
+            return redirect(url_for('index'))
+        return render_template('analytics.html', **dados)
+    except Exception as e:
+        print(f"ERRO ANALYTICS: Falha ao calcular a análise de compradores: {e}")
+        traceback.print_exc()
+        flash('Erro ao carregar a análise de compradores.', 'error')
+        return redirect(url_for('index'))
+
 @app.route('/usuarios')
 def usuarios():
     print(f"DEBUG USUARIOS: Requisição para /usuarios. Method: {request.method}")
 
     conn = None
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(readonly=True)
         if conn is None:
             flash('Erro de conexão com o banco de dados.', 'error')
             return redirect(url_for('index')) 
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
+        pesquisa = request.args.get('pesquisa', '').strip()
+        status = request.args.get('status', '')
+        cursor = request.args.get('cursor') or None
+
         with conn:
             cur = conn.cursor()
-            if is_sqlite:
-                cur.execute('SELECT * FROM users ORDER BY data_registro DESC')
-            else:
-                cur.execute('SELECT * FROM users ORDER BY data_registro DESC')
-            usuarios_lista = cur.fetchall()
-            print(f"DEBUG USUARIOS: {len(usuarios_lista)} usuários encontrados.")
+            try:
+                usuarios_lista, proximo_cursor = usuarios_service.users_page(cur, pesquisa, status, cursor)
+            except ValueError:
+                flash('Página inválida; voltando ao início da lista.', 'warning')
+                return redirect(url_for('usuarios', pesquisa=pesquisa or None, status=status or None))
+            print(f"DEBUG USUARIOS: {len(usuarios_lista)} usuários na página.")
 
-        return render_template('usuarios.html', usuarios=usuarios_lista)
+        return render_template(
+            'usuarios.html', usuarios=usuarios_lista, proximo_cursor=proximo_cursor,
+            pesquisa=pesquisa, status=status, primeira_pagina=cursor is None
+        )
 
     except Exception as e:
         print(f"ERRO UTILIZADORES: Falha ao carregar utilizadores: {e}")
@@ -1085,6 +1031,33 @@ def usuarios():
         if conn:
             conn.close()
 
+@app.route('/usuarios/export.csv', methods=['GET'])
+def exportar_usuarios():
+    """CSV de todos os usuários que atendem aos filtros de /usuarios, em streaming."""
+    conn = get_db_connection(readonly=True)
+    if conn is None:
+        flash('Erro de conexão com o banco de dados.', 'error')
+        return redirect(url_for('usuarios'))
+    try:
+        cur = conn.cursor()
+        try:
+            query, params = usuarios_service.export_query(
+                cur, request.args.get('pesquisa', '').strip(), request.args.get('status', '')
+            )
+        finally:
+            cur.close()
+    except Exception:
+        conn.close()
+        raise
+
+    response = Response(
+        stream_with_context(csv_export.stream_csv(conn, query, params, usuarios_service.EXPORT_COLUMNS, 'exportar_usuarios')),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f"attachment; filename=usuarios_{datetime.now():%Y%m%d_%H%M}.csv"},
+    )
+    response.call_on_close(conn.close)
+    return response
+
 @app.route('/toggle_user_status/<int:user_id>', methods=['POST'])
 def toggle_user_status(user_id):
     print(f"DEBUG TOGGLE_USER_STATUS: Requisição para /toggle_user_status/{user_id}. Method: {request.method}")
@@ -1096,24 +1069,17 @@ def toggle_user_status(user_id):
             flash('Erro de conexão com o banco de dados.', 'error')
             return redirect(url_for('usuarios')) 
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn:
             cur = conn.cursor()
-            if is_sqlite:
-                cur.execute('SELECT is_active FROM users WHERE id = ?', (user_id,))
-            else:
-                cur.execute('SELECT is_active FROM users WHERE id = %s', (user_id,))
-            user = cur.fetchone()
+            user = fetch_one(cur, 'SELECT is_active FROM users WHERE id = %s', (user_id,))
 
             if not user:
                 flash('Usuário não encontrado.', 'danger')
                 return redirect(url_for('usuarios')) 
 
             new_status = not user['is_active']
-            if is_sqlite:
-                cur.execute('UPDATE users SET is_active = ? WHERE id = ?', (new_status, user_id))
-            else:
-                cur.execute('UPDATE users SET is_active = %s WHERE id = %s', (new_status, user_id))
+            execute(cur, 'UPDATE users SET is_active = %s WHERE id = %s', (new_status, user_id))
+            known_users.discard(user_id)
 
             status_text = "ativado" if new_status else "desativado"
             print(f"DEBUG TOGGLE_USER_STATUS: Usuário {user_id} {status_text} com sucesso.")
@@ -1138,42 +1104,23 @@ def scheduled_messages():
             flash('Erro de conexão com o banco de dados.', 'error')
             return redirect(url_for('login')) 
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn:
             cur = conn.cursor()
-            if is_sqlite:
-                cur.execute("""
-                    SELECT
-                        sm.id,
-                        sm.message_text,
-                        sm.target_chat_id,
-                        sm.image_url,
-                        sm.schedule_time,
-                        sm.status,
-                        sm.created_at,
-                        sm.sent_at,
-                        COALESCE(u.username, 'Todos os usuários') AS target_username
-                    FROM scheduled_messages sm
-                    LEFT JOIN users u ON sm.target_chat_id = u.id
-                    ORDER BY sm.schedule_time DESC
-                """)
-            else:
-                cur.execute("""
-                    SELECT
-                        sm.id,
-                        sm.message_text,
-                        sm.target_chat_id,
-                        sm.image_url,
-                        sm.schedule_time,
-                        sm.status,
-                        sm.created_at,
-                        sm.sent_at,
-                        COALESCE(u.username, 'Todos os usuários') AS target_username
-                    FROM scheduled_messages sm
-                    LEFT JOIN users u ON sm.target_chat_id = u.id
-                    ORDER BY sm.schedule_time DESC
-                """)
-            messages_list = cur.fetchall()
+            messages_list = fetch_all(cur, """
+                SELECT
+                    sm.id,
+                    sm.message_text,
+                    sm.target_chat_id,
+                    sm.image_url,
+                    sm.schedule_time,
+                    sm.status,
+                    sm.created_at,
+                    sm.sent_at,
+                    COALESCE(u.username, 'Todos os usuários') AS target_username
+                FROM scheduled_messages sm
+                LEFT JOIN users u ON sm.target_chat_id = u.id
+                ORDER BY sm.schedule_time DESC
+            """)
             print(f"DEBUG SCHEDULED_MESSAGES: {len(messages_list)} mensagens agendadas encontradas.")
 
         return render_template('scheduled_messages.html', messages=messages_list)
@@ -1211,7 +1158,8 @@ def add_scheduled_message():
             
             conn = get_db_connection()
             with conn.cursor() as cur:
-                cur.execute(
+                execute(
+                    cur,
                     """
                     INSERT INTO scheduled_messages 
                     (message_text, target_chat_id, image_url, schedule_time, status, recurrence_rule) 
@@ -1237,8 +1185,7 @@ def add_scheduled_message():
     # Lógica para GET (exibir formulário)
     conn = get_db_connection()
     with conn.cursor() as cur:
-        cur.execute('SELECT id, username, first_name FROM users WHERE is_active = TRUE ORDER BY username ASC')
-        users = cur.fetchall()
+        users = fetch_all(cur, 'SELECT id, username, first_name FROM users WHERE is_active = {true} ORDER BY username ASC')
     conn.close()
     return render_template('add_scheduled_message.html', users=users)
 
@@ -1253,15 +1200,9 @@ def edit_scheduled_message(message_id):
             flash('Erro de conexão com o banco de dados.', 'danger')
             return redirect(url_for('scheduled_messages')) 
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
-        
         # Busca os dados da mensagem para o GET e para o POST
         with conn.cursor() as cur:
-            if is_sqlite:
-                cur.execute('SELECT * FROM scheduled_messages WHERE id = ?', (message_id,))
-            else:
-                cur.execute('SELECT * FROM scheduled_messages WHERE id = %s', (message_id,))
-            message = cur.fetchone()
+            message = fetch_one(cur, 'SELECT * FROM scheduled_messages WHERE id = %s', (message_id,))
 
         if not message:
             flash('Mensagem agendada não encontrada.', 'danger')
@@ -1290,16 +1231,11 @@ def edit_scheduled_message(message_id):
 
             # Atualiza o banco de dados SEM ALTERAR O STATUS
             with conn.cursor() as cur:
-                if is_sqlite:
-                    cur.execute(
-                        "UPDATE scheduled_messages SET message_text = ?, target_chat_id = ?, image_url = ?, schedule_time = ? WHERE id = ?",
-                        (message_text, target_chat_id_db, image_url or None, schedule_time, message_id)
-                    )
-                else:
-                    cur.execute(
-                        "UPDATE scheduled_messages SET message_text = %s, target_chat_id = %s, image_url = %s, schedule_time = %s WHERE id = %s",
-                        (message_text, target_chat_id_db, image_url or None, schedule_time, message_id)
-                    )
+                execute(
+                    cur,
+                    "UPDATE scheduled_messages SET message_text = %s, target_chat_id = %s, image_url = %s, schedule_time = %s WHERE id = %s",
+                    (message_text, target_chat_id_db, image_url or None, schedule_time, message_id)
+                )
             conn.commit()
             flash('Mensagem agendada atualizada com sucesso!', 'success')
             return redirect(url_for('scheduled_messages')) 
@@ -1329,44 +1265,25 @@ def resend_scheduled_message(message_id):
             return redirect(url_for('scheduled_messages')) 
 
         with conn.cursor() as cur:
-            if isinstance(conn, sqlite3.Connection):
-                 cur.execute("SELECT * FROM scheduled_messages WHERE id = ?", (message_id,))
-            else:
-                 cur.execute("SELECT * FROM scheduled_messages WHERE id = %s", (message_id,))
-            original_message = cur.fetchone()
+            original_message = fetch_one(cur, "SELECT * FROM scheduled_messages WHERE id = %s", (message_id,))
 
             if not original_message:
                 flash('Mensagem original não encontrada para clonar.', 'warning')
                 return redirect(url_for('scheduled_messages')) 
 
-            insert_query = """
-                INSERT INTO scheduled_messages (message_text, target_chat_id, image_url, status, schedule_time)
-                VALUES (%s, %s, %s, 'pending', NOW())
-                RETURNING id
+            new_message_id = insert_returning_id(
+                cur,
                 """
-            insert_params = (
-                original_message['message_text'],
-                original_message['target_chat_id'],
-                original_message['image_url']
-            )
-
-            is_sqlite = isinstance(conn, sqlite3.Connection)
-            if is_sqlite:
-                insert_query = "INSERT INTO scheduled_messages (message_text, target_chat_id, image_url, status, schedule_time) VALUES (?, ?, ?, ?, ?)"
-                insert_params = (
+                INSERT INTO scheduled_messages (message_text, target_chat_id, image_url, status, schedule_time)
+                VALUES (%s, %s, %s, 'pending', {now})
+                """,
+                (
                     original_message['message_text'],
                     original_message['target_chat_id'],
-                    original_message['image_url'],
-                    'pending',
-                    datetime.now()
+                    original_message['image_url']
                 )
-                cur.execute(insert_query, insert_params)
-                cur.execute("SELECT last_insert_rowid()")
-                new_message_id = cur.fetchone()[0]
-            else:
-                cur.execute(insert_query, insert_params)
-                new_message_id = cur.fetchone()['id']
-            
+            )
+
             conn.commit()
 
             flash('Mensagem clonada com sucesso! Por favor, defina um novo horário de agendamento.', 'success')
@@ -1395,18 +1312,10 @@ def delete_scheduled_message(message_id):
             return redirect(url_for('scheduled_messages')) 
 
         with conn.cursor() as cur:
-            if isinstance(conn, sqlite3.Connection):
-                cur.execute("SELECT id FROM scheduled_messages WHERE id = ?", (message_id,))
-            else:
-                cur.execute("SELECT id FROM scheduled_messages WHERE id = %s", (message_id,))
-            
-            if cur.fetchone() is None:
+            if fetch_one(cur, "SELECT id FROM scheduled_messages WHERE id = %s", (message_id,)) is None:
                 flash('Mensagem não encontrada para deletar.', 'warning')
             else:
-                if isinstance(conn, sqlite3.Connection):
-                    cur.execute("DELETE FROM scheduled_messages WHERE id = ?", (message_id,))
-                else:
-                    cur.execute("DELETE FROM scheduled_messages WHERE id = %s", (message_id,))
+                execute(cur, "DELETE FROM scheduled_messages WHERE id = %s", (message_id,))
                 conn.commit()
                 flash('Mensagem agendada deletada com sucesso!', 'success')
                 
@@ -1431,12 +1340,8 @@ def cancel_cloned_message(message_id):
             flash('Erro de conexão com o banco de dados.', 'danger')
             return redirect(url_for('scheduled_messages')) 
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn.cursor() as cur:
-            if is_sqlite:
-                cur.execute("DELETE FROM scheduled_messages WHERE id = ?", (message_id,))
-            else:
-                cur.execute("DELETE FROM scheduled_messages WHERE id = %s", (message_id,))
+            execute(cur, "DELETE FROM scheduled_messages WHERE id = %s", (message_id,))
         conn.commit()
         flash('Reenvio cancelado e cópia da mensagem descartada.', 'info')
     except Exception as e:
@@ -1460,14 +1365,9 @@ def send_broadcast():
             flash('Erro de conexão com o banco de dados.', 'danger')
             return redirect(url_for('index', error='broadcast_db_connection_error')) 
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn:
             cur = conn.cursor()
-            if is_sqlite:
-                cur.execute('SELECT id, username, first_name FROM users ORDER BY username ASC')
-            else:
-                cur.execute('SELECT id, username, first_name FROM users ORDER BY username ASC')
-            active_users = cur.fetchall()
+            total_usuarios, usuarios_ativos = usuarios_service.user_counts(cur)
 
         if request.method == 'POST':
             message_text = request.form.get('message_text')
@@ -1475,7 +1375,7 @@ def send_broadcast():
 
             if not message_text:
                 flash('O texto da mensagem é obrigatório para o broadcast!', 'danger')
-                return render_template('send_broadcast.html', active_users=active_users, message_text_val=message_text, image_url_val=image_url)
+                return render_template('send_broadcast.html', total_usuarios=total_usuarios, usuarios_ativos=usuarios_ativos, message_text_val=message_text, image_url_val=image_url)
 
             sent_count = 0
             failed_count = 0
@@ -1483,16 +1383,12 @@ def send_broadcast():
             cur_conn_send = get_db_connection()
             if cur_conn_send is None:
                 flash('Erro de conexão com o banco de dados.', 'danger')
-                return render_template('send_broadcast.html', active_users=active_users, message_text_val=message_text, image_url_val=image_url)
+                return render_template('send_broadcast.html', total_usuarios=total_usuarios, usuarios_ativos=usuarios_ativos, message_text_val=message_text, image_url_val=image_url)
 
             try:
                 with cur_conn_send:
                     cur_send = cur_conn_send.cursor()
-                    if is_sqlite:
-                        cur_send.execute("SELECT id FROM users WHERE is_active = 1")
-                    else:
-                        cur_send.execute("SELECT id FROM users WHERE is_active = TRUE")
-                    users_to_send = cur_send.fetchall()
+                    users_to_send = fetch_all(cur_send, "SELECT id FROM users WHERE is_active = {true}")
 
                     for user_data in users_to_send:
                         user_id = user_data['id']
@@ -1508,14 +1404,11 @@ def send_broadcast():
                                 print(f"AVISO: Usuário {user_id} blocked/not found during broadcast. Deactivating...")
                                 temp_conn_update = get_db_connection()
                                 if temp_conn_update:
-                                    temp_is_sqlite = isinstance(temp_conn_update, sqlite3.Connection)
                                     try:
                                         with temp_conn_update:
                                             cur_u = temp_conn_update.cursor()
-                                            if temp_is_sqlite:
-                                                cur_u.execute("UPDATE users SET is_active=0 WHERE id=?", (user_id,))
-                                            else:
-                                                cur_u.execute("UPDATE users SET is_active=FALSE WHERE id=%s", (user_id,))
+                                            execute(cur_u, "UPDATE users SET is_active={false} WHERE id=%s", (user_id,))
+                                        known_users.discard(user_id)
                                     except Exception as db_e:
                                         print(f"ERRO inactivating user {user_id} during broadcast: {db_e}")
                                         traceback.print_exc()
@@ -1532,11 +1425,11 @@ def send_broadcast():
                 print(f"ERRO SEND BROADCAST (send logic): {e}")
                 traceback.print_exc()
                 flash('Ocorreu um erro ao tentar enviar o broadcast.', 'danger')
-                return render_template('send_broadcast.html', active_users=active_users, message_text_val=message_text, image_url_val=image_url)
+                return render_template('send_broadcast.html', total_usuarios=total_usuarios, usuarios_ativos=usuarios_ativos, message_text_val=message_text, image_url_val=image_url)
             finally:
                 if cur_conn_send: cur_conn_send.close()
 
-        return render_template('send_broadcast.html', active_users=active_users)
+        return render_template('send_broadcast.html', total_usuarios=total_usuarios, usuarios_ativos=usuarios_ativos)
 
     except Exception as e:
         print(f"ERRO SEND BROADCAST (GET): Falha ao carregar usuários para o formulário: {e}")
@@ -1564,7 +1457,6 @@ def config_messages():
                 welcome_message_community=welcome_message_community
             )
 
-        is_sqlite = isinstance(conn, sqlite3.Connection)
         with conn:
             cur = conn.cursor()
             
@@ -1572,39 +1464,18 @@ def config_messages():
                 welcome_bot_message_form = request.form.get('welcome_message_bot')
                 welcome_community_message_form = request.form.get('welcome_message_community')
 
+                upsert_config = "INSERT INTO config (key, value) VALUES (%s, %s) ON CONFLICT (key) DO UPDATE SET value = excluded.value;"
                 if welcome_bot_message_form is not None:
-                    if is_sqlite:
-                        cur.execute(
-                            "INSERT INTO config (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value;",
-                            ('welcome_message_bot', welcome_bot_message_form)
-                        )
-                    else:
-                        cur.execute(
-                            "INSERT INTO config (key, value) VALUES (%s, %s) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value;",
-                            ('welcome_message_bot', welcome_bot_message_form)
-                        )
+                    execute(cur, upsert_config, ('welcome_message_bot', welcome_bot_message_form))
                 
                 if welcome_community_message_form is not None:
-                    if is_sqlite:
-                        cur.execute(
-                            "INSERT INTO config (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value;",
-                            ('welcome_message_community', welcome_community_message_form)
-                        )
-                    else:
-                        cur.execute(
-                            "INSERT INTO config (key, value) VALUES (%s, %s) ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value;",
-                            ('welcome_message_community', welcome_community_message_form)
-                        )
+                    execute(cur, upsert_config, ('welcome_message_community', welcome_community_message_form))
                 
                 flash('Configurações de mensagens atualizadas com sucesso!', 'success')
                 return redirect(url_for('config_messages')) 
 
             # Lógica para GET request (ou após POST e redirecionamento)
-            if is_sqlite:
-                cur.execute("SELECT key, value FROM config WHERE key IN (?, ?)", ('welcome_message_bot', 'welcome_message_community'))
-            else:
-                cur.execute("SELECT key, value FROM config WHERE key IN (%s, %s)", ('welcome_message_bot', 'welcome_message_community'))
-            configs_raw = cur.fetchall()
+            configs_raw = fetch_all(cur, "SELECT key, value FROM config WHERE key IN (%s, %s)", ('welcome_message_bot', 'welcome_message_community'))
             configs = {row['key']: row['value'] for row in configs_raw}
 
             welcome_message_bot = configs.get('welcome_message_bot', welcome_message_bot)
@@ -1631,6 +1502,25 @@ def config_messages():
 # ────────────────────────────────────────────────────────────────────
 # 7. WORKER de mensagens agendadas
 # ────────────────────────────────────────────────────────────────────
+def partition_maintenance_worker():
+    """
+    Cria com antecedência as partições mensais de `vendas` (PostgreSQL).
+    Roda no startup e depois a cada 12 horas; no SQLite não faz nada.
+    """
+    while True:
+        conn = None
+        try:
+            conn = get_db_connection()
+            if conn is not None:
+                partitions.ensure_partitions(conn)
+        except Exception as e:
+            print(f"ERRO WORKER DE PARTIÇÕES: {e}")
+            traceback.print_exc()
+        finally:
+            if conn:
+                conn.close()
+        time_module.sleep(12 * 3600)
+
 def scheduled_message_worker():
     print(f"DEBUG WORKER: Iniciado e aguardando para verificar mensagens...")
     while True:
@@ -1643,15 +1533,10 @@ def scheduled_message_worker():
                 continue
 
             with conn.cursor() as cur:
-                if isinstance(conn, sqlite3.Connection):
-                    cur.execute(
-                        "SELECT * FROM scheduled_messages WHERE status='pending' AND schedule_time <= DATETIME('now') ORDER BY schedule_time"
-                    )
-                else:
-                    cur.execute(
-                        "SELECT * FROM scheduled_messages WHERE status='pending' AND schedule_time <= NOW() ORDER BY schedule_time"
-                    )
-                rows = cur.fetchall()
+                rows = fetch_all(
+                    cur,
+                    "SELECT * FROM scheduled_messages WHERE status='pending' AND schedule_time <= {now} ORDER BY schedule_time"
+                )
 
                 if rows:
                     print(f"DEBUG WORKER: Encontradas {len(rows)} mensagens para enviar.")
@@ -1663,11 +1548,7 @@ def scheduled_message_worker():
                     if row["target_chat_id"]:
                         targets.append(row["target_chat_id"])
                     else: # Se for para todos (broadcast)
-                        if isinstance(conn, sqlite3.Connection):
-                            cur.execute("SELECT id FROM users WHERE is_active = 1")
-                        else:
-                            cur.execute("SELECT id FROM users WHERE is_active = TRUE")
-                        all_users = cur.fetchall()
+                        all_users = fetch_all(cur, "SELECT id FROM users WHERE is_active = {true}")
                         targets = [u["id"] for u in all_users]
 
                     print(f"DEBUG WORKER: A mensagem {row['id']} será enviada para {len(targets)} usuários.")
@@ -1685,16 +1566,11 @@ def scheduled_message_worker():
                             traceback.print_exc()
                     
                     final_status = 'sent' if sent_successfully else 'failed'
-                    if isinstance(conn, sqlite3.Connection):
-                        cur.execute(
-                            "UPDATE scheduled_messages SET status=?, sent_at=DATETIME('now') WHERE id=?",
-                            (final_status, row["id"]),
-                        )
-                    else:
-                        cur.execute(
-                            "UPDATE scheduled_messages SET status=%s, sent_at=NOW() WHERE id=%s",
-                            (final_status, row["id"]),
-                        )
+                    execute(
+                        cur,
+                        "UPDATE scheduled_messages SET status=%s, sent_at={now} WHERE id=%s",
+                        (final_status, row["id"]),
+                    )
                     print(f"DEBUG WORKER: Mensagem ID {row['id']} atualizada para status '{final_status}'.")
             
             conn.commit()
@@ -1727,11 +1603,7 @@ def handle_new_chat_members(message: types.ChatMemberUpdated):
             conn = get_db_connection()
             with conn.cursor() as cur:
                 # Verifica no banco quem estava autorizado a usar este link
-                cur.execute(
-                    "SELECT user_id FROM user_access WHERE invite_link_used = %s",
-                    (invite_link_used,)
-                )
-                result = cur.fetchone()
+                result = fetch_one(cur, statements.ACESSO_POR_CONVITE, (invite_link_used,))
 
                 # Se o link não pertence a ninguém ou pertence a outro usuário, expulsa o intruso.
                 if not result or result['user_id'] != new_member_id:
@@ -1757,10 +1629,11 @@ def handle_new_chat_members(message: types.ChatMemberUpdated):
 def manage_community_access(user_id, community_id, should_have_access):
     """
     Adiciona ou remove um usuário de uma comunidade no Telegram.
+    Retorna True se a ação no Telegram foi concluída.
     """
     if not community_id:
         print(f"AVISO: Tentativa de gerenciar acesso para user {user_id} sem um community_id.")
-        return
+        return False
 
     try:
         if should_have_access:
@@ -1772,64 +1645,221 @@ def manage_community_access(user_id, community_id, should_have_access):
             # Remove (expulsa) o usuário do grupo/canal.
             bot.kick_chat_member(community_id, user_id)
             print(f"ACESSO REMOVIDO: User {user_id} foi removido da comunidade {community_id}.")
-            bot.send_message(user_id, "Seu passe de acesso expirou e você foi removido da comunidade. Para voltar, compre um novo passe usando o comando /passes.")
     except Exception as e:
         # Erros comuns: bot não é admin, usuário não está no grupo, etc.
         print(f"ERRO ao gerenciar acesso do user {user_id} na comunidade {community_id}: {e}")
+        return False
+
+    if not should_have_access:
+        try:
+            bot.send_message(user_id, "Seu passe de acesso expirou e você foi removido da comunidade. Para voltar, compre um novo passe usando o comando /passes.")
+        except Exception as e:
+            # A remoção já aconteceu; só o aviso ao usuário falhou.
+            print(f"AVISO: Não foi possível avisar o user {user_id} sobre a expiração: {e}")
+    return True
+
+# Worker de expiração: tamanho do lote e lease de uma reivindicação ('expiring').
+# Se o worker cair no meio de um lote, as linhas dele voltam a ser elegíveis após o lease.
+EXPIRACAO_LOTE = int(os.getenv('EXPIRACAO_LOTE', '200'))
+EXPIRACAO_LEASE_SEGUNDOS = int(os.getenv('EXPIRACAO_LEASE_SEGUNDOS', '900'))
+
+# Reivindica um lote (active -> expiring) numa única instrução. No PostgreSQL o
+# SKIP LOCKED deixa dois workers processarem lotes diferentes ao mesmo tempo.
+_REIVINDICAR_EXPIRADOS = Query(
+    """
+    UPDATE user_access SET status = 'expiring', claimed_at = NOW()
+    WHERE id IN (
+        SELECT id FROM user_access
+        WHERE (status = 'active' AND expiration_date <= NOW())
+           OR (status = 'expiring' AND claimed_at <= NOW() - %s * INTERVAL '1 second')
+        ORDER BY expiration_date
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id
+    """,
+    sqlite="""
+    UPDATE user_access SET status = 'expiring', claimed_at = DATETIME('now')
+    WHERE id IN (
+        SELECT id FROM user_access
+        WHERE (status = 'active' AND expiration_date <= DATETIME('now'))
+           OR (status = 'expiring' AND claimed_at <= DATETIME('now', '-' || %s || ' seconds'))
+        ORDER BY expiration_date
+        LIMIT %s
+    )
+    RETURNING id
+    """,
+)
+_DETALHES_LOTE = """
+    SELECT ua.id, ua.user_id, c.chat_id
+    FROM user_access ua
+    JOIN access_passes ap ON ua.pass_id = ap.id
+    LEFT JOIN comunidades c ON ap.community_id = c.id
+    WHERE {in_list:ua.id}
+"""
+_CONCLUIR_LOTE = """
+    UPDATE user_access SET status = 'expired', removed_at = {now}
+    WHERE {in_list:id} AND status = 'expiring'
+"""
+_CONCLUIR_LOTE_SEM_REMOCAO = """
+    UPDATE user_access SET status = 'expired', removed_at = NULL
+    WHERE {in_list:id} AND status = 'expiring'
+"""
+
+def expire_access_batch(limit=EXPIRACAO_LOTE):
+    """
+    Processa um lote de acessos vencidos e retorna quantos foram reivindicados.
+
+    1. Reivindica até `limit` linhas (commit): a partir daqui elas são deste worker.
+    2. Remove cada usuário da comunidade no Telegram (uma chamada por linha).
+    3. Marca o lote inteiro como 'expired' com um UPDATE por resultado (commit);
+       `removed_at` fica NULL nas linhas cuja remoção falhou.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        print("ERRO WORKER DE EXPIRAÇÃO: Sem conexão com o banco de dados.")
+        return 0
+    try:
+        with conn.cursor() as cur:
+            claimed = [row['id'] for row in fetch_all(cur, _REIVINDICAR_EXPIRADOS, (EXPIRACAO_LEASE_SEGUNDOS, limit))]
+            conn.commit()
+            if not claimed:
+                return 0
+            rows = fetch_all(cur, _DETALHES_LOTE, (claimed,))
+            conn.commit()
+
+        print(f"WORKER DE EXPIRAÇÃO: Lote de {len(claimed)} acessos reivindicado.")
+        removed, failed = [], []
+        for row in rows:
+            if manage_community_access(row['user_id'], row['chat_id'], should_have_access=False):
+                removed.append(row['id'])
+            else:
+                failed.append(row['id'])
+        # Reivindicados sem passe/comunidade (não vieram no JOIN) também expiram.
+        failed.extend(set(claimed) - {row['id'] for row in rows})
+
+        with conn.cursor() as cur:
+            if removed:
+                execute(cur, _CONCLUIR_LOTE, (removed,))
+            if failed:
+                execute(cur, _CONCLUIR_LOTE_SEM_REMOCAO, (failed,))
+        conn.commit()
+        print(f"WORKER DE EXPIRAÇÃO: {len(removed)} acessos expirados e removidos; "
+              f"{len(failed)} expirados sem remoção confirmada no Telegram.")
+        return len(claimed)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
 def access_expiration_worker():
     """
     Worker que roda em segundo plano para verificar e expirar passes de acesso.
-    VERSÃO CORRIGIDA
+
+    Processa os vencidos em lotes de EXPIRACAO_LOTE até esvaziar a fila, e
+    então espera o próximo ciclo. Cada lote é gravado ao terminar, então uma
+    onda grande de expirações sobrevive a reinícios do worker.
     """
     print("WORKER DE EXPIRAÇÃO: Iniciado. Verificando passes.")
     while True:
-        conn = None
         try:
-            conn = get_db_connection()
-            with conn.cursor() as cur:
-                # ALTERAÇÃO AQUI: A query agora busca 'c.chat_id' da tabela de comunidades.
-                # Busca todos os acessos que estão ativos mas cuja data de expiração já passou.
-                cur.execute("""
-                    SELECT ua.id, ua.user_id, c.chat_id
-                    FROM user_access ua
-                    JOIN access_passes ap ON ua.pass_id = ap.id
-                    JOIN comunidades c ON ap.community_id = c.id
-                    WHERE ua.status = 'active' AND ua.expiration_date <= NOW();
-                """)
-                expired_passes = cur.fetchall()
-
-                if expired_passes:
-                    print(f"WORKER DE EXPIRAÇÃO: Encontrados {len(expired_passes)} passes expirados para processar.")
-                    for expired_pass in expired_passes:
-                        user_id_to_remove = expired_pass['user_id']
-                        # ALTERAÇÃO AQUI: Usamos a variável com o chat_id correto do Telegram.
-                        telegram_chat_id_to_remove_from = expired_pass['chat_id']
-                        access_id_to_update = expired_pass['id']
-
-                        print(f"WORKER: Processando expiração do acesso ID {access_id_to_update} para o usuário {user_id_to_remove}.")
-
-                        # 1. Tenta remover o usuário do grupo do Telegram usando o chat_id correto.
-                        manage_community_access(user_id_to_remove, telegram_chat_id_to_remove_from, should_have_access=False)
-                        
-                        # 2. Se a remoção for bem-sucedida (ou não gerar erro), atualiza o status no banco.
-                        cur.execute("UPDATE user_access SET status = 'expired' WHERE id = %s", (access_id_to_update,))
-                        print(f"WORKER: Acesso ID {access_id_to_update} atualizado para 'expired'.")
-                    
-                    conn.commit()
-                # else:
-                    # Removi o print para não poluir os logs a cada ciclo sem expirações.
-                    # print("WORKER DE EXPIRAÇÃO: Nenhum passe expirado encontrado nesta verificação.")
-
+            while expire_access_batch() >= EXPIRACAO_LOTE:
+                pass
         except Exception as e:
             print(f"ERRO CRÍTICO no Worker de Expiração: {e}")
             traceback.print_exc()
-        finally:
-            if conn:
-                conn.close()
         
-        # Espera 1 hora (3600 segundos) antes da próxima verificação.
-        # Para testar, você pode diminuir este valor temporariamente para 60 segundos.
+        # Espera 1 minuto antes da próxima verificação.
+        time_module.sleep(60)
+
+# Vendas 'pendente' sem pagamento há mais que VENDA_EXPIRACAO_SEGUNDOS viram 'expirado'
+# (antes isso era calculado linha a linha em cada listagem).
+VENDA_EXPIRACAO_SEGUNDOS = int(os.getenv('VENDA_EXPIRACAO_SEGUNDOS', '3600'))
+VENDAS_EXPIRACAO_LOTE = int(os.getenv('VENDAS_EXPIRACAO_LOTE', '1000'))
+
+# Um lote por instrução, na ordem do índice (status, data_venda). O status é
+# conferido de novo no UPDATE: uma venda aprovada pelo webhook no meio do caminho
+# não é expirada. No PostgreSQL (id, data_venda) permite podar as partições.
+_EXPIRAR_VENDAS_PENDENTES = Query(
+    """
+    UPDATE vendas SET status = 'expirado'
+    WHERE (id, data_venda) IN (
+        SELECT id, data_venda FROM vendas
+        WHERE status = 'pendente' AND data_venda < NOW() - %s * INTERVAL '1 second'
+        ORDER BY data_venda
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    ) AND status = 'pendente'
+    """,
+    sqlite="""
+    UPDATE vendas SET status = 'expirado'
+    WHERE id IN (
+        SELECT id FROM vendas
+        WHERE status = 'pendente' AND data_venda < DATETIME('now', '-' || %s || ' seconds')
+        ORDER BY data_venda
+        LIMIT %s
+    ) AND status = 'pendente'
+    """,
+)
+
+def expire_stale_sales_batch(limit=VENDAS_EXPIRACAO_LOTE):
+    """Marca como 'expirado' um lote de vendas pendentes vencidas e retorna quantas foram."""
+    conn = get_db_connection()
+    if conn is None:
+        print("ERRO WORKER DE VENDAS PENDENTES: Sem conexão com o banco de dados.")
+        return 0
+    try:
+        with conn.cursor() as cur:
+            execute(cur, _EXPIRAR_VENDAS_PENDENTES, (VENDA_EXPIRACAO_SEGUNDOS, limit))
+            expired = cur.rowcount
+        conn.commit()
+        if expired > 0:
+            dashboard.invalidate()
+        return max(expired, 0)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def purge_dashboard_events():
+    """Apaga os eventos do painel ao vivo mais antigos que a retenção."""
+    conn = get_db_connection()
+    if conn is None:
+        return 0
+    try:
+        with conn.cursor() as cur:
+            purged = painel_eventos.purge(cur)
+        conn.commit()
+        return purged
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def pending_sales_worker():
+    """
+    Expira as vendas pendentes vencidas em lotes de VENDAS_EXPIRACAO_LOTE (cada
+    lote é um UPDATE com commit próprio), limpa os eventos antigos do painel ao
+    vivo e repete a cada minuto.
+    """
+    print("WORKER DE VENDAS PENDENTES: Iniciado.")
+    while True:
+        try:
+            total = 0
+            while True:
+                expired = expire_stale_sales_batch()
+                total += expired
+                if expired < VENDAS_EXPIRACAO_LOTE:
+                    break
+            if total:
+                print(f"WORKER DE VENDAS PENDENTES: {total} venda(s) pendente(s) marcada(s) como expirada(s).")
+            purge_dashboard_events()
+        except Exception as e:
+            print(f"ERRO WORKER DE VENDAS PENDENTES: {e}")
+            traceback.print_exc()
         time_module.sleep(60)
 
 # ────────────────────────────────────────────────────────────────────
@@ -1850,14 +1880,9 @@ def send_welcome(message):
             print(f"ERRO: Não foi possível obter conexão com o DB para carregar mensagem de boas-vindas do bot.")
             pass
         else:
-            is_sqlite = isinstance(conn, sqlite3.Connection)
             with conn:
                 cur = conn.cursor()
-                if is_sqlite:
-                    cur.execute("SELECT value FROM config WHERE key = ?", ('welcome_message_bot',))
-                else:
-                    cur.execute("SELECT value FROM config WHERE key = %s", ('welcome_message_bot',))
-                row = cur.fetchone()
+                row = fetch_one(cur, statements.CONFIG_POR_CHAVE, ('welcome_message_bot',))
                 if row and row['value']: 
                     welcome_message_text = row['value']
     except Exception as e:
@@ -1882,7 +1907,14 @@ def send_welcome(message):
 if __name__ != '__main__':
     print(f"DEBUG: Executando em modo de produção (gunicorn/Render).")
     try:
-        init_db()
+        # Só compara a versão do esquema; as migrações rodam em `python -m database.migrations upgrade`.
+        check_schema()
+        check_conn = get_db_connection()
+        if check_conn:
+            try:
+                report_missing_indexes(check_conn)
+            finally:
+                check_conn.close()
         pagamentos.init_mercadopago_sdk()
         if API_TOKEN and BASE_URL:
             webhook_url = f"{BASE_URL}/{API_TOKEN}"
@@ -1894,6 +1926,19 @@ if __name__ != '__main__':
         worker_thread.start()
         print(f"DEBUG: Worker de mensagens agendadas iniciado em background para o modo de produção.")
 
+        partition_thread = Thread(target=partition_maintenance_worker)
+        partition_thread.daemon = True
+        partition_thread.start()
+
+        pending_sales_thread = Thread(target=pending_sales_worker)
+        pending_sales_thread.daemon = True
+        pending_sales_thread.start()
+
+        # Um por worker do gunicorn: os lotes são reivindicados no banco (SKIP LOCKED), sem processar o mesmo acesso duas vezes.
+        access_expiration_thread = Thread(target=access_expiration_worker)
+        access_expiration_thread.daemon = True
+        access_expiration_thread.start()
+
         # REGISTRAR HANDLERS 
         register_chamadas_handlers(bot, get_db_connection)
         register_comunidades_handlers(bot, get_db_connection)
@@ -1909,6 +1954,10 @@ if __name__ != '__main__':
         app.register_blueprint(comunidades_bp, url_prefix='/') 
         app.register_blueprint(passes_bp)
 
+        # Arquivos estáticos com hash/pré-comprimidos e templates compilados antes da primeira requisição.
+        assets.ensure_built()
+        precompile_templates()
+
     except Exception as e:
         print(f"ERRO NA INICIALIZAÇÃO DO SERVIDOR: {e}")
         traceback.print_exc()
\ No newline at end of file
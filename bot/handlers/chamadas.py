@@ -29,27 +29,33 @@ def register_chamadas_handlers(bot, get_db_connection):
             return
 
         conn = get_db_connection()
-        with conn.cursor() as cur:
-            cur.execute(
-                "INSERT INTO chamadas_video "
-                "(titulo, link, horario, comunidade_id) "
-                "VALUES (%s,%s,%s,%s)",
-                (titulo, link, horario, comunidade_id),
-            )
-            conn.commit()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "INSERT INTO chamadas_video "
+                    "(titulo, link, horario, comunidade_id) "
+                    "VALUES (%s,%s,%s,%s)",
+                    (titulo, link, horario, comunidade_id),
+                )
+                conn.commit()
+        finally:
+            conn.close()
 
         bot.reply_to(msg, "Chamada de vídeo agendada ✅")
 
     @bot.message_handler(commands=['listar_chamadas'])
     def listar_chamadas(msg: Message):
         conn = get_db_connection()
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT id, titulo, horario "
-                "FROM chamadas_video "
-                "ORDER BY horario DESC LIMIT 20"
-            )
-            rows = cur.fetchall()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT id, titulo, horario "
+                    "FROM chamadas_video "
+                    "ORDER BY horario DESC LIMIT 20"
+                )
+                rows = cur.fetchall()
+        finally:
+            conn.close()
 
         if not rows:
             bot.reply_to(msg, "Sem chamadas agendadas.")
@@ -1,8 +1,10 @@
 import telebot
 from telebot import types
-import sqlite3 
 import traceback 
 import logging
+
+from database.query import fetch_one
+from database import statements
 # NÃO PRECISAMOS MAIS DO ComunidadeService AQUI PARA O HANDLER DE BOAS-VINDAS
 # from bot.services.comunidades import ComunidadeService 
 
@@ -60,16 +62,10 @@ def _handle_new_chat_members(message: types.Message, bot_instance: telebot.TeleB
     try:
         conn = get_db_connection_func() 
         if conn:
-            is_sqlite_conn = isinstance(conn, sqlite3.Connection)
-            
             with conn:
                 cur = conn.cursor() 
 
-                if is_sqlite_conn:
-                    cur.execute("SELECT value FROM config WHERE key = ?", ('welcome_message_community',))
-                else:
-                    cur.execute("SELECT value FROM config WHERE key = %s", ('welcome_message_community',))
-                row = cur.fetchone()
+                row = fetch_one(cur, statements.CONFIG_POR_CHAVE, ('welcome_message_community',))
                 if row and row['value']:
                     welcome_message_community = row['value']
                     logger.debug(f"Mensagem de boas-vindas do DB carregada: '{welcome_message_community}'")
@@ -512,16 +508,10 @@ def register_comunidades_handlers(bot_instance: telebot.TeleBot, get_db_connecti
         try:
             conn = get_db_connection_func() 
             if conn:
-                is_sqlite_conn = isinstance(conn, sqlite3.Connection)
-                
                 with conn:
                     cur = conn.cursor() 
 
-                    if is_sqlite_conn:
-                        cur.execute("SELECT value FROM config WHERE key = ?", ('welcome_message_community',))
-                    else:
-                        cur.execute("SELECT value FROM config WHERE key = %s", ('welcome_message_community',))
-                    row = cur.fetchone()
+                    row = fetch_one(cur, statements.CONFIG_POR_CHAVE, ('welcome_message_community',))
                     if row and row['value']:
                         welcome_message_community = row['value']
                         logger.debug(f"Mensagem de boas-vindas do DB carregada: '{welcome_message_community}'")
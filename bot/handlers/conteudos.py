@@ -19,7 +19,7 @@ def register_conteudos_handlers(bot, get_db_connection):
             return
 
         if tipo == 'text':
-            _salvar_conteudo(get_db_connection(), comunidade_id, tipo, None, titulo)
+            _salvar_conteudo(get_db_connection, comunidade_id, tipo, None, titulo)
             bot.reply_to(msg, "Conteúdo de texto salvo ✅")
         else:
             _pending_upload[msg.from_user.id] = (comunidade_id, tipo, titulo)
@@ -32,24 +32,31 @@ def register_conteudos_handlers(bot, get_db_connection):
             return  # usuário não está enviando media
         comunidade_id, tipo, titulo = state
         file_id = (msg.photo[-1].file_id if tipo == 'photo' else msg.video.file_id)
-        _salvar_conteudo(get_db_connection(), comunidade_id, tipo, file_id, titulo)
+        _salvar_conteudo(get_db_connection, comunidade_id, tipo, file_id, titulo)
         bot.reply_to(msg, "Conteúdo salvo ✅")
 
     @bot.message_handler(commands=['listar_conteudos'])
     def listar_conteudos(msg: Message):
         conn = get_db_connection()
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, titulo FROM conteudos ORDER BY criado_em DESC LIMIT 20")
-            rows = cur.fetchall()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT id, titulo FROM conteudos ORDER BY criado_em DESC LIMIT 20")
+                rows = cur.fetchall()
+        finally:
+            conn.close()
         txt = ("Sem conteúdos." if not rows
                else "Conteúdos:\n" + "\n".join(f"{r[0]} — {r[1]}" for r in rows))
         bot.reply_to(msg, txt)
 
-def _salvar_conteudo(conn, comunidade_id, tipo, file_id, titulo):
-    with conn.cursor() as cur:
-        cur.execute(
-            "INSERT INTO conteudos (titulo, arquivo_id, tipo, comunidade_id, criado_em) "
-            "VALUES (%s,%s,%s,%s,%s)",
-            (titulo, file_id, tipo, comunidade_id, datetime.utcnow())
-        )
-        conn.commit()
+def _salvar_conteudo(get_db_connection, comunidade_id, tipo, file_id, titulo):
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO conteudos (titulo, arquivo_id, tipo, comunidade_id, criado_em) "
+                "VALUES (%s,%s,%s,%s,%s)",
+                (titulo, file_id, tipo, comunidade_id, datetime.utcnow())
+            )
+            conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,62 @@
+# bot/services/known_users.py
+"""
+Cache em memória (por processo) dos usuários já registrados e ativos.
+
+O get_or_register_user roda em todo /start e callback; se o usuário está no
+cache, o upsert em `users` é pulado. O cache é um LRU limitado com TTL:
+cada worker do gunicorn tem o seu, então uma desativação feita em outro
+worker só é percebida aqui quando a entrada expira.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+KNOWN_USERS_CACHE_SIZE = int(os.getenv('KNOWN_USERS_CACHE_SIZE', '10000'))
+KNOWN_USERS_CACHE_TTL = float(os.getenv('KNOWN_USERS_CACHE_TTL', '300'))
+
+
+class KnownUsersCache:
+    def __init__(self, maxsize=KNOWN_USERS_CACHE_SIZE, ttl=KNOWN_USERS_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> instante em que expira
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._entries.get(user_id)
+            if expires_at is None or expires_at <= now:
+                if expires_at is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return False
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return True
+
+    def add(self, user_id):
+        with self._lock:
+            self._entries[user_id] = time.monotonic() + self.ttl
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        """Invalida o usuário (desativado no painel ou pelo broadcast)."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+known_users = KnownUsersCache()
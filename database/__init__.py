@@ -1,2 +1,2 @@
-from .database import get_db_connection # Expondo get_db_connection do database.py
-from .db_init import init_db           # Expondo init_db do db_init.py
\ No newline at end of file
+from .database import get_db_connection, get_pool_stats # Expondo get_db_connection do database.py
+from .db_init import init_db           # Expondo init_db do db_init.py
@@ -1,28 +1,79 @@
 # database/database.py
 import os
 import sqlite3
-import psycopg2
+import time
 from psycopg2 import Error
-from psycopg2.extras import RealDictCursor # Importado para PostgreSQL
 
-def get_db_connection():
+from .pool import get_pg_pool, get_sqlite_connection, pool_stats, PoolTimeout
+
+# Arquivo SQLite usado quando DATABASE_URL não está definida (desenvolvimento local)
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'database.db')
+# Réplicas de leitura (opcionais) para o painel e relatórios. Sem elas, as leituras
+# vão para o banco principal. Localmente, um segundo arquivo SQLite ou um segundo
+# banco PostgreSQL faz o papel de réplica.
+SQLITE_REPLICA_PATH = os.getenv('SQLITE_REPLICA_PATH')
+# Depois de uma falha da réplica, as leituras vão direto ao principal por este
+# tempo (s), em vez de cada uma esperar o timeout da réplica antes do fallback.
+DB_REPLICA_BACKOFF = float(os.getenv('DB_REPLICA_BACKOFF', '30'))
+
+_replica_state = {'down_until': 0.0}
+
+def _get_pg_replica_connection(replica_url):
+    if time.monotonic() < _replica_state['down_until']:
+        return None
+    try:
+        return get_pg_pool(replica_url, role='replica').getconn(readonly=True)
+    except (PoolTimeout, Error) as e:
+        _replica_state['down_until'] = time.monotonic() + DB_REPLICA_BACKOFF
+        print(f"AVISO DB: Réplica de leitura indisponível ({e}); usando o banco principal "
+              f"pelos próximos {DB_REPLICA_BACKOFF:g}s.")
+        return None
+
+def get_db_connection(readonly=False):
+    """
+    Retorna uma conexão emprestada do pool do processo.
+
+    O uso continua igual ao de antes (`with conn:` + `conn.close()`), mas
+    `close()` agora devolve a conexão ao pool (PostgreSQL) ou a mantém aberta
+    para a thread (SQLite) em vez de refazer o handshake a cada chamada.
+
+    `readonly=True` marca as leituras do painel e dos relatórios: a conexão
+    vem da réplica (DATABASE_REPLICA_URL / SQLITE_REPLICA_PATH) quando houver
+    uma, senão do principal, e só aceita leituras (transações READ ONLY no
+    PostgreSQL, `query_only` no SQLite). Assim o relatório não disputa o
+    principal com o webhook de pagamentos. Se a réplica falhar, as leituras
+    vão para o principal durante DB_REPLICA_BACKOFF segundos antes de ela ser
+    tentada de novo.
+    """
     database_url = os.getenv('DATABASE_URL')
 
     if database_url:
+        replica_url = os.getenv('DATABASE_REPLICA_URL')
+        if readonly and replica_url:
+            conn = _get_pg_replica_connection(replica_url)
+            if conn is not None:
+                return conn
         try:
             # Conecta ao PostgreSQL
             # Usando RealDictCursor para que as linhas se comportem como dicionários
-            conn = psycopg2.connect(database_url, cursor_factory=RealDictCursor)
-            return conn
+            return get_pg_pool(database_url).getconn(readonly=readonly)
+        except PoolTimeout as e:
+            print(f"Erro ao obter conexão do pool PostgreSQL: {e}")
+            return None
         except Error as e:
             print(f"Erro ao conectar ao banco de dados PostgreSQL: {e}")
             return None
     else:
         try:
-            # Conecta ao SQLite
-            conn = sqlite3.connect('database.db')
-            conn.row_factory = sqlite3.Row # Isso faz com que as linhas se comportem como dicionários
-            return conn
+            # Conecta ao SQLite (conexão persistente por thread, em modo WAL)
+            # row_factory = sqlite3.Row faz com que as linhas se comportem como dicionários
+            if readonly and SQLITE_REPLICA_PATH and os.path.exists(SQLITE_REPLICA_PATH):
+                return get_sqlite_connection(SQLITE_REPLICA_PATH, readonly=True)
+            return get_sqlite_connection(SQLITE_PATH, readonly=readonly)
         except sqlite3.Error as e:
             print(f"Erro ao conectar ao banco de dados SQLite: {e}")
-            return None
\ No newline at end of file
+            return None
+
+def get_pool_stats():
+    """Estatísticas dos pools de conexão deste processo."""
+    return pool_stats()
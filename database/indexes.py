@@ -0,0 +1,140 @@
+# database/indexes.py
+"""
+Índices secundários das consultas quentes (PostgreSQL e SQLite).
+
+Cada índice é declarado uma vez, com as mesmas macros de database/query.py
+(ex.: `{true}`), e traduzido para o dialeto da conexão. Tanto o PostgreSQL
+quanto o SQLite suportam índices compostos e parciais (`WHERE ...`). Quando
+a expressão indexada difere entre os bancos (ex.: classes de operador do
+PostgreSQL), `sqlite_columns` traz a versão do SQLite.
+
+INDEXES é o estado atual, usado na verificação de startup. As migrações não
+leem esta lista: cada uma congela as definições `Index` da sua versão e as
+passa a `ensure_indexes(conn, indexes=...)`, para que mudar ou remover um
+índice aqui não altere o que uma migração antiga cria.
+"""
+from collections import namedtuple
+
+from .query import Query, dialect_of, fetch_all, SQLITE, POSTGRES
+
+Index = namedtuple('Index', ['name', 'table', 'columns', 'where', 'reason', 'sqlite_columns'], defaults=(None,))
+
+INDEXES = [
+    # index(), get_sales_data() e /vendas: somas de vendas aprovadas por intervalo de data.
+    # (data_venda, preco) cobre o SUM sem ler a tabela.
+    Index('idx_vendas_aprovadas_data', 'vendas', 'data_venda, preco', "status = 'aprovado'",
+          "Métricas do dashboard por período"),
+    # /vendas com filtro de status + data.
+    Index('idx_vendas_status_data', 'vendas', 'status, data_venda', None,
+          "Filtro de status/data em /vendas"),
+    # Pesquisa de /vendas: vendas dos usuários/produtos encontrados, já na ordem do keyset.
+    Index('idx_vendas_usuario', 'vendas', 'user_id, id', None,
+          "Vendas por usuário (pesquisa em /vendas)"),
+    Index('idx_vendas_produto', 'vendas', 'produto_id, id', None,
+          "Vendas por produto (pesquisa e filtro em /vendas)"),
+    # scheduled_message_worker: pendentes com horário vencido.
+    Index('idx_scheduled_pendentes', 'scheduled_messages', 'schedule_time', "status = 'pending'",
+          "Worker de mensagens agendadas"),
+    # access_expiration_worker: acessos ativos com expiração vencida.
+    Index('idx_user_access_ativos_expiracao', 'user_access', 'expiration_date', "status = 'active'",
+          "Worker de expiração de passes"),
+    # access_expiration_worker: lotes reivindicados cujo lease venceu (worker caiu no meio).
+    Index('idx_user_access_expirando', 'user_access', 'claimed_at', "status = 'expiring'",
+          "Retomada de lotes do worker de expiração"),
+    Index('idx_user_access_status_expiracao', 'user_access', 'status, expiration_date', None,
+          "Consultas de acesso por status/expiração"),
+    # handle_new_chat_members: quem pode usar o link de convite.
+    Index('idx_user_access_convite', 'user_access', 'invite_link_used', None,
+          "Vigia de links de convite"),
+    # /usuarios: keyset por (data_registro, id), do mais recente para o mais antigo.
+    Index('idx_users_registro_id', 'users', 'data_registro DESC, id DESC', None,
+          "Listagem paginada de usuários"),
+    # /usuarios: busca por prefixo, sem diferenciar maiúsculas. No PostgreSQL o LIKE 'abc%'
+    # sobre lower(col) usa o índice com text_pattern_ops; no SQLite o LIKE (que já ignora
+    # caixa) só usa índice em coluna com COLLATE NOCASE.
+    Index('idx_users_username_prefixo', 'users', 'lower(username) text_pattern_ops', None,
+          "Busca de usuários por @username", 'username COLLATE NOCASE'),
+    Index('idx_users_first_name_prefixo', 'users', 'lower(first_name) text_pattern_ops', None,
+          "Busca de usuários por nome", 'first_name COLLATE NOCASE'),
+    # Contagem de ativos no dashboard e lista de destinatários de broadcast.
+    Index('idx_users_ativos', 'users', 'id', "is_active = {true}",
+          "Usuários ativos (dashboard/broadcast)"),
+    # pending_sales_worker: limpeza dos eventos do painel ao vivo mais antigos que a retenção.
+    Index('idx_painel_eventos_criado_em', 'painel_eventos', 'criado_em', None,
+          "Limpeza dos eventos do painel"),
+]
+
+_LIST_TABLES = {
+    SQLITE: Query("SELECT name FROM sqlite_master WHERE type = 'table'"),
+    POSTGRES: Query("SELECT tablename AS name FROM pg_tables WHERE schemaname = current_schema()"),
+}
+_LIST_INDEXES = {
+    SQLITE: Query("SELECT name FROM sqlite_master WHERE type = 'index'"),
+    POSTGRES: Query("SELECT indexname AS name FROM pg_indexes WHERE schemaname = current_schema()"),
+}
+
+
+def create_index_sql(index, dialect, concurrently=False):
+    """DDL do índice no dialeto informado."""
+    where = f" WHERE {index.where}" if index.where else ""
+    columns = index.sqlite_columns if dialect == SQLITE and index.sqlite_columns else index.columns
+    modifier = " CONCURRENTLY" if concurrently and dialect != SQLITE else ""
+    return Query(
+        f"CREATE INDEX{modifier} IF NOT EXISTS {index.name} ON {index.table} ({columns}){where}"
+    ).sql(dialect)
+
+
+def _names(cur, queries, dialect):
+    return {row['name'] if hasattr(row, 'keys') else row[0] for row in fetch_all(cur, queries[dialect])}
+
+
+def missing_indexes(conn, indexes=INDEXES):
+    """
+    Retorna (faltando, tabelas_ausentes): os índices de `indexes` que não
+    existem e as tabelas deles que ainda não foram criadas neste banco.
+    """
+    dialect = dialect_of(conn)
+    cur = conn.cursor()
+    try:
+        tables = _names(cur, _LIST_TABLES, dialect)
+        existing = _names(cur, _LIST_INDEXES, dialect)
+    finally:
+        cur.close()
+    missing = [ix for ix in indexes if ix.table in tables and ix.name not in existing]
+    absent_tables = sorted({ix.table for ix in indexes if ix.table not in tables})
+    return missing, absent_tables
+
+
+def ensure_indexes(conn, concurrently=False, indexes=INDEXES):
+    """
+    Cria os índices de `indexes` que faltam e retorna os nomes criados.
+
+    As migrações passam a sua própria lista congelada (ver docstring do módulo).
+    `concurrently=True` usa CREATE INDEX CONCURRENTLY no PostgreSQL (não trava
+    escritas em tabelas grandes), mas exige a conexão em autocommit.
+    """
+    dialect = dialect_of(conn)
+    missing, _ = missing_indexes(conn, indexes)
+    created = []
+    cur = conn.cursor()
+    try:
+        for index in missing:
+            cur.execute(create_index_sql(index, dialect, concurrently))
+            created.append(index.name)
+            print(f"DEBUG DB INDEX: Índice '{index.name}' criado em '{index.table}' ({index.reason}).")
+    finally:
+        cur.close()
+    return created
+
+
+def report_missing_indexes(conn):
+    """Verificação de startup: imprime um aviso para cada índice ausente."""
+    missing, absent_tables = missing_indexes(conn)
+    for index in missing:
+        print(f"AVISO DB INDEX: Índice '{index.name}' ausente em '{index.table}' ({index.reason}). "
+              f"Essa consulta fará full scan até o índice ser criado.")
+    for table in absent_tables:
+        print(f"AVISO DB INDEX: Tabela '{table}' não existe; índices dela não foram verificados.")
+    if not missing:
+        print(f"DEBUG DB INDEX: Todos os índices declarados das tabelas existentes estão presentes.")
+    return missing
@@ -1,119 +1,281 @@
+import csv
+import io
 import sqlite3
+import sys
+import time
 
 # --- CONFIGURAÇÃO ---
-# Nomes dos arquivos de banco de dados SQLite para a migração.
-# O OLD_DB_NAME é o banco de dados com a estrutura antiga (ou de backup).
-# O NEW_DB_NAME é o banco de dados com a estrutura nova (ou recém-criada por db_init.py).
+# Origem: sempre um arquivo SQLite (banco antigo ou de backup).
+# Destino: outro arquivo SQLite ou uma URL do PostgreSQL (postgres://... / postgresql://...).
+# O destino já deve ter o esquema criado: rode `python -m database.migrations upgrade`
+# apontando para ele (SQLITE_PATH ou DATABASE_URL) antes de migrar os dados.
 OLD_DB_NAME = 'dashboard_old.db' # Ex: seu DB antes das alterações de esquema
 NEW_DB_NAME = 'dashboard.db'     # Ex: seu DB com o esquema atualizado
+CHUNK_SIZE = 5000                # Linhas lidas/gravadas por lote (limita o uso de memória)
 
-def migrate_data():
+# Tabelas na ordem das chaves estrangeiras.
+# - 'keyset': lida em lotes por `pk > último id` e retomável: o ponto de partida é o
+#   MAX(pk) já presente no destino, então uma migração interrompida continua de onde parou.
+# - 'upsert': tabelas pequenas com chave natural; o destino pode já ter linhas
+#   (ex.: o admin padrão criado pelas migrações), então a origem sobrescreve pela chave.
+TABLES = [
+    ('users', 'keyset', 'id'),
+    ('produtos', 'keyset', 'id'),
+    ('admin', 'upsert', 'username'),
+    ('config', 'upsert', 'key'),
+    ('comunidades', 'keyset', 'id'),
+    ('membros', 'keyset', 'id'),
+    ('ofertas', 'keyset', 'id'),
+    ('conteudos', 'keyset', 'id'),
+    ('chamadas_video', 'keyset', 'id'),
+    ('access_passes', 'keyset', 'id'),
+    ('subscription_plans', 'keyset', 'id'),
+    ('scheduled_messages', 'keyset', 'id'),
+    ('vendas', 'keyset', 'id'),
+    ('user_access', 'keyset', 'id'),
+    ('user_subscriptions', 'keyset', 'id'),
+]
+
+# Colunas que o destino exige e que bancos antigos podem não ter (ou ter nulas).
+# Em 'vendas', o preço é o que o produto tinha (aproximadamente) na época da venda.
+FILL_COLUMNS = {
+    'vendas': {'preco': "(SELECT p.preco FROM produtos p WHERE p.id = t.produto_id)"},
+}
+
+
+def _is_postgres(target):
+    return target.startswith('postgres://') or target.startswith('postgresql://')
+
+
+def _sqlite_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+class _SQLiteTarget:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def columns(self, table):
+        return _sqlite_columns(self.conn, table)
+
+    def max_pk(self, table, pk):
+        return self.conn.execute(f"SELECT MAX({pk}) FROM {table}").fetchone()[0]
+
+    def load(self, table, columns, rows):
+        placeholders = ', '.join(['?'] * len(columns))
+        self.conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+    def upsert(self, table, columns, key, rows):
+        placeholders = ', '.join(['?'] * len(columns))
+        updates = ', '.join(f"{c} = excluded.{c}" for c in columns if c != key) or f"{key} = excluded.{key}"
+        self.conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({key}) DO UPDATE SET {updates}",
+            rows
+        )
+
+    def reset_sequence(self, table, pk):
+        pass  # AUTOINCREMENT do SQLite já acompanha o maior id inserido.
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+
+class _PostgresTarget:
+    def __init__(self, url):
+        import psycopg2
+        self.conn = psycopg2.connect(url)
+
+    def columns(self, table):
+        with self.conn.cursor() as cur:
+            cur.execute(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = %s ORDER BY ordinal_position",
+                (table,)
+            )
+            return [row[0] for row in cur.fetchall()]
+
+    def max_pk(self, table, pk):
+        with self.conn.cursor() as cur:
+            cur.execute(f"SELECT MAX({pk}) FROM {table}")
+            return cur.fetchone()[0]
+
+    def load(self, table, columns, rows):
+        # COPY em CSV: strings entre aspas e None como campo vazio sem aspas (= NULL).
+        buf = io.StringIO()
+        csv.writer(buf, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n').writerows(rows)
+        buf.seek(0)
+        with self.conn.cursor() as cur:
+            cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+    def upsert(self, table, columns, key, rows):
+        from psycopg2.extras import execute_values
+        updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in columns if c != key) or f"{key} = EXCLUDED.{key}"
+        with self.conn.cursor() as cur:
+            execute_values(
+                cur,
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s ON CONFLICT ({key}) DO UPDATE SET {updates}",
+                rows
+            )
+
+    def reset_sequence(self, table, pk):
+        # Sem isso o próximo INSERT do app tentaria reutilizar ids copiados.
+        with self.conn.cursor() as cur:
+            cur.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, %s), COALESCE(MAX({pk}), 1), MAX({pk}) IS NOT NULL) "
+                f"FROM {table}",
+                (table, pk)
+            )
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+
+def _select_list(table, source_columns, columns):
+    fills = FILL_COLUMNS.get(table, {})
+    exprs = []
+    for col in columns:
+        if col in fills:
+            exprs.append(f"COALESCE(t.{col}, {fills[col]})" if col in source_columns else fills[col])
+        else:
+            exprs.append(f"t.{col}")
+    return ', '.join(exprs)
+
+
+def _copy_keyset(source, target, table, pk, columns, select_list, chunk_size):
+    last_id = target.max_pk(table, pk)
+    if last_id is None:
+        last_id = source.execute(f"SELECT MIN({pk}) - 1 FROM {table}").fetchone()[0]
+        if last_id is None:
+            print(f"Nenhum registro encontrado em '{table}'.")
+            return 0
+    else:
+        print(f"'{table}': retomando após {pk} = {last_id}.")
+
+    remaining = source.execute(f"SELECT COUNT(*) FROM {table} WHERE {pk} > ?", (last_id,)).fetchone()[0]
+    pk_pos = columns.index(pk)
+    sql = f"SELECT {select_list} FROM {table} t WHERE t.{pk} > ? ORDER BY t.{pk} LIMIT ?"
+
+    copied = 0
+    started = time.perf_counter()
+    while True:
+        rows = source.execute(sql, (last_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        target.load(table, columns, rows)
+        target.commit()  # cada lote é durável: uma interrupção retoma do último lote gravado
+        last_id = rows[-1][pk_pos]
+        copied += len(rows)
+        elapsed = time.perf_counter() - started
+        print(f"  '{table}': {copied}/{remaining} registros ({copied / elapsed:.0f} linhas/s)")
+
+    target.reset_sequence(table, pk)
+    target.commit()
+    return copied
+
+
+def _copy_upsert(source, target, table, key, columns, select_list, chunk_size):
+    cur = source.execute(f"SELECT {select_list} FROM {table} t")
+    copied = 0
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        target.upsert(table, columns, key, rows)
+        copied += len(rows)
+    target.commit()
+    return copied
+
+
+def migrate_data(source_path=OLD_DB_NAME, target=NEW_DB_NAME, chunk_size=CHUNK_SIZE):
     """
-    Este script copia os dados de um banco de dados SQLite antigo para um novo
-    que possui uma estrutura de tabelas atualizada.
-    É útil para migrar dados de desenvolvimento local entre versões do esquema DB.
-    
+    Copia os dados de um banco SQLite para outro SQLite ou para o PostgreSQL,
+    em lotes de `chunk_size` linhas (a tabela nunca fica inteira na memória).
+
+    Só as colunas existentes nos dois lados são copiadas. A migração pode ser
+    interrompida e executada de novo: cada tabela continua a partir do maior
+    id já presente no destino.
+
     ATENÇÃO: Use com cautela! Faça um backup dos seus bancos de dados antes de executar.
     """
-    old_conn = None
-    new_conn = None
+    source = None
+    dest = None
+    totals = {}
+    started = time.perf_counter()
     try:
-        # Conecta ao banco de dados antigo
-        old_conn = sqlite3.connect(OLD_DB_NAME)
-        # Permite acessar colunas por nome no DB antigo (ex: row['id'])
-        old_conn.row_factory = sqlite3.Row 
-
-        # Conecta ao novo banco de dados. Este DB deve ter sido inicializado
-        # com a nova estrutura via db_init.py antes de rodar a migração.
-        new_conn = sqlite3.connect(NEW_DB_NAME)
-        
-        old_cursor = old_conn.cursor()
-        new_cursor = new_conn.cursor()
-
-        print(f"Iniciando a migração de '{OLD_DB_NAME}' para '{NEW_DB_NAME}'...")
-
-        # --- Tabelas a serem migradas generlamente ---
-        # Lista as tabelas que podem ser copiadas diretamente (desde que as colunas existam)
-        tables_to_migrate = ['users', 'produtos', 'admin', 'config', 'comunidades', 'scheduled_messages'] 
-        # Adicione 'comunidades' e 'scheduled_messages' aqui se quiser migrar seus dados também.
-        # Certifique-se de que os esquemas da nova tabela são compatíveis.
-
-        for table in tables_to_migrate:
-            print(f"Migrando dados da tabela '{table}'...")
+        source = sqlite3.connect(source_path)
+        dest = _PostgresTarget(target) if _is_postgres(target) else _SQLiteTarget(target)
+        print(f"Iniciando a migração de '{source_path}' para "
+              f"'{'PostgreSQL' if _is_postgres(target) else target}' (lotes de {chunk_size})...")
+
+        for table, mode, key in TABLES:
+            source_columns = _sqlite_columns(source, table)
+            target_columns = dest.columns(table)
+            if not source_columns or not target_columns:
+                print(f"[AVISO] Tabela '{table}' não existe na origem ou no destino. Pulando.")
+                continue
+
+            fills = FILL_COLUMNS.get(table, {})
+            columns = [c for c in target_columns if c in source_columns or c in fills]
+            if mode == 'upsert':
+                # O id dessas tabelas não é referenciado; manter o do destino evita colisões.
+                columns = [c for c in columns if c != 'id']
+            if key not in columns:
+                print(f"[AVISO] Tabela '{table}' sem a coluna '{key}' na origem. Pulando.")
+                continue
+            select_list = _select_list(table, source_columns, columns)
+
+            table_started = time.perf_counter()
             try:
-                old_cursor.execute(f"SELECT * FROM {table}")
-                rows = old_cursor.fetchall()
-                
-                if rows:
-                    # Pega os nomes das colunas da tabela antiga para garantir a ordem correta na inserção
-                    columns = [description[0] for description in old_cursor.description]
-                    # Cria placeholders para a query INSERT
-                    placeholders = ', '.join(['?'] * len(columns))
-                    
-                    # Converte as linhas (do tipo Row) em tuplas para serem usadas com executemany
-                    data_tuples = [tuple(row) for row in rows]
-
-                    # Insere os dados na nova tabela
-                    new_cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", data_tuples)
-                    print(f"{len(rows)} registros inseridos em '{table}'.")
-                else:
-                    print(f"Nenhum registro encontrado em '{table}'.")
-            except sqlite3.OperationalError as e:
-                print(f"[AVISO] Tabela '{table}' não encontrada no DB antigo ou erro de esquema: {e}. Pulando migração desta tabela.")
+                copy = _copy_keyset if mode == 'keyset' else _copy_upsert
+                copied = copy(source, dest, table, key, columns, select_list, chunk_size)
             except Exception as e:
-                print(f"[ERRO] Falha ao migrar tabela '{table}': {e}")
-                # import traceback; traceback.exc_info() # Descomente para ver o stack trace
-
-        # --- Migração especial para a tabela 'vendas' ---
-        # Esta é uma migração mais complexa porque 'vendas' pode ter uma coluna 'preco' nova
-        # que precisa ser preenchida com base nos produtos.
-        print("Migrando dados da tabela 'vendas'...")
-        try:
-            # Esta query busca os dados da venda antiga e FAZ UM JOIN com a tabela de produtos
-            # para obter o preço que o produto tinha (aproximadamente) na época da venda.
-            # Assume que a nova tabela 'vendas' tem a coluna 'preco'.
-            old_cursor.execute('''
-                SELECT v.id, v.user_id, v.produto_id, p.preco, v.payment_id, v.status, v.data_venda, v.payer_name, v.payer_email
-                FROM vendas v
-                LEFT JOIN produtos p ON v.produto_id = p.id
-            ''')
-            vendas_data = old_cursor.fetchall()
-
-            if vendas_data:
-                # Converte as linhas em tuplas
-                data_tuples = [tuple(row) for row in vendas_data]
-                
-                # Insere os dados nas colunas correspondentes da nova tabela, incluindo o preço.
-                # A ordem das colunas e dos placeholders é crucial.
-                new_cursor.executemany(
-                    "INSERT INTO vendas (id, user_id, produto_id, preco, payment_id, status, data_venda, payer_name, payer_email) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                    data_tuples
-                )
-                print(f"{len(vendas_data)} registros inseridos em 'vendas'.")
-            else:
-                print("Nenhum registro encontrado em 'vendas'.")
-
-        except sqlite3.OperationalError as e:
-            print(f"\n[AVISO] Não foi possível migrar a tabela 'vendas'. Erro: {e}. Verifique o esquema da tabela 'vendas' no novo DB.")
-        except Exception as e:
-            print(f"[ERRO] Falha crítica na migração da tabela 'vendas': {e}")
-            # import traceback; traceback.exc_info()
-
-        # Salva (commita) as alterações no novo banco de dados
-        new_conn.commit()
-        print("\nMigração de dados concluída com sucesso!")
-
-    except sqlite3.Error as e:
-        print(f"\nOcorreu um erro geral durante a migração: {e}")
-        # import traceback; traceback.print_exc()
+                dest.rollback()
+                print(f"[ERRO] Falha ao migrar a tabela '{table}': {e}")
+                print("Os lotes anteriores foram gravados; rode a migração de novo para retomar.")
+                raise
+            elapsed = time.perf_counter() - table_started
+            totals[table] = copied
+            rate = copied / elapsed if elapsed > 0 else 0
+            print(f"{copied} registros migrados em '{table}' ({elapsed:.1f}s, {rate:.0f} linhas/s).")
+
+        total = sum(totals.values())
+        elapsed = time.perf_counter() - started
+        print(f"\nMigração de dados concluída: {total} registros em {elapsed:.1f}s "
+              f"({total / elapsed if elapsed > 0 else 0:.0f} linhas/s).")
+        if totals.get('vendas'):
+            # O agregado do painel não é copiado: é derivado de `vendas`.
+            print("Rode 'python -m database.rollup rebuild' no destino para recalcular o painel de vendas.")
+        return totals
+
     finally:
         # Garante que as conexões sejam sempre fechadas, mesmo em caso de erro
-        if old_conn:
-            old_conn.close()
-        if new_conn:
-            new_conn.close()
+        if source:
+            source.close()
+        if dest:
+            dest.close()
         print("Conexões com os bancos de dados foram fechadas.")
 
+
 if __name__ == '__main__':
-    # Este bloco é executado apenas quando o script é rodado diretamente.
-    migrate_data()
\ No newline at end of file
+    # Uso: python database/migrate_db.py [origem.db] [destino.db | postgresql://...] [linhas_por_lote]
+    args = sys.argv[1:]
+    migrate_data(
+        args[0] if len(args) > 0 else OLD_DB_NAME,
+        args[1] if len(args) > 1 else NEW_DB_NAME,
+        int(args[2]) if len(args) > 2 else CHUNK_SIZE,
+    )
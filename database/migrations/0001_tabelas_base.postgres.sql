@@ -0,0 +1,51 @@
+-- === Tabelas base do bot e do painel (antes criadas em db_init.py a cada boot) ===
+
+CREATE TABLE IF NOT EXISTS users (
+    id BIGINT PRIMARY KEY,
+    username VARCHAR(255),
+    first_name VARCHAR(255),
+    last_name VARCHAR(255),
+    is_active BOOLEAN DEFAULT TRUE,
+    data_registro TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS admin (
+    id SERIAL PRIMARY KEY,
+    username VARCHAR(255) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS produtos (
+    id SERIAL PRIMARY KEY,
+    nome VARCHAR(255) NOT NULL,
+    preco NUMERIC(10, 2) NOT NULL,
+    link TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS vendas (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL REFERENCES users(id),
+    produto_id INTEGER NOT NULL REFERENCES produtos(id),
+    preco NUMERIC(10, 2) NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    data_venda TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    payment_id VARCHAR(255),
+    payer_name VARCHAR(255),
+    payer_email VARCHAR(255)
+);
+
+CREATE TABLE IF NOT EXISTS scheduled_messages (
+    id SERIAL PRIMARY KEY,
+    message_text TEXT NOT NULL,
+    target_chat_id BIGINT, -- NULL para todos os usuários
+    image_url TEXT,
+    schedule_time TIMESTAMP WITH TIME ZONE NOT NULL,
+    status VARCHAR(50) DEFAULT 'pending',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE TABLE IF NOT EXISTS config (
+    key VARCHAR(255) PRIMARY KEY,
+    value TEXT
+);
@@ -0,0 +1,42 @@
+-- === Tabelas extras: Comunidades, Membros, Ofertas, Conteúdos, Chamadas de vídeo ===
+
+CREATE TABLE IF NOT EXISTS comunidades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome TEXT UNIQUE NOT NULL,
+    descricao TEXT,
+    data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS membros (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    telegram_id INTEGER NOT NULL,
+    comunidade_id INTEGER REFERENCES comunidades(id),
+    nivel TEXT DEFAULT 'free'        -- free | vip | externo
+);
+
+CREATE TABLE IF NOT EXISTS ofertas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    titulo TEXT NOT NULL,
+    descricao TEXT,
+    link TEXT,
+    data_inicio DATETIME DEFAULT CURRENT_TIMESTAMP,
+    data_fim DATETIME,
+    comunidade_id INTEGER REFERENCES comunidades(id)
+);
+
+CREATE TABLE IF NOT EXISTS conteudos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    titulo TEXT,
+    arquivo_id TEXT,                 -- file_id do Telegram ou URL
+    tipo TEXT,                       -- text | photo | video
+    comunidade_id INTEGER REFERENCES comunidades(id),
+    criado_em DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS chamadas_video (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    titulo TEXT,
+    link TEXT,
+    horario DATETIME,
+    comunidade_id INTEGER REFERENCES comunidades(id)
+);
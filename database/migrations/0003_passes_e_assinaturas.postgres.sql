@@ -0,0 +1,43 @@
+-- === Passes de acesso às comunidades e planos de assinatura ===
+
+CREATE TABLE IF NOT EXISTS access_passes (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    price NUMERIC(10, 2) NOT NULL,
+    duration_days INTEGER NOT NULL,
+    community_id INTEGER REFERENCES comunidades(id),
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS user_access (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL REFERENCES users(id),
+    pass_id INTEGER NOT NULL REFERENCES access_passes(id),
+    status VARCHAR(50) NOT NULL DEFAULT 'active',   -- active | expired
+    start_date TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    expiration_date TIMESTAMP WITH TIME ZONE NOT NULL,
+    payment_id VARCHAR(255),
+    invite_link_used TEXT
+);
+
+CREATE TABLE IF NOT EXISTS subscription_plans (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    price NUMERIC(10, 2) NOT NULL,
+    frequency INTEGER NOT NULL DEFAULT 1,
+    frequency_type VARCHAR(20) NOT NULL DEFAULT 'months',
+    is_active BOOLEAN DEFAULT TRUE
+);
+
+CREATE TABLE IF NOT EXISTS user_subscriptions (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL REFERENCES users(id),
+    plan_id INTEGER NOT NULL REFERENCES subscription_plans(id),
+    status VARCHAR(50) NOT NULL,
+    start_date TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    expiration_date TIMESTAMP WITH TIME ZONE,
+    last_payment_date TIMESTAMP WITH TIME ZONE
+);
@@ -0,0 +1,43 @@
+-- === Passes de acesso às comunidades e planos de assinatura ===
+
+CREATE TABLE IF NOT EXISTS access_passes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    price REAL NOT NULL,
+    duration_days INTEGER NOT NULL,
+    community_id INTEGER REFERENCES comunidades(id),
+    is_active BOOLEAN DEFAULT 1,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS user_access (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    pass_id INTEGER NOT NULL REFERENCES access_passes(id),
+    status TEXT NOT NULL DEFAULT 'active',          -- active | expired
+    start_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    expiration_date DATETIME NOT NULL,
+    payment_id TEXT,
+    invite_link_used TEXT
+);
+
+CREATE TABLE IF NOT EXISTS subscription_plans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    price REAL NOT NULL,
+    frequency INTEGER NOT NULL DEFAULT 1,
+    frequency_type TEXT NOT NULL DEFAULT 'months',
+    is_active BOOLEAN DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS user_subscriptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    plan_id INTEGER NOT NULL REFERENCES subscription_plans(id),
+    status TEXT NOT NULL,
+    start_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    expiration_date DATETIME,
+    last_payment_date DATETIME
+);
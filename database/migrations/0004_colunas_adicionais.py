@@ -0,0 +1,15 @@
+"""
+Colunas acrescentadas depois da criação das tabelas e que o código já usa:
+comunidades.chat_id (vínculo com o grupo do Telegram) e produtos.descricao.
+"""
+from database.migrations import add_columns
+
+COLUNAS = [
+    # (tabela, coluna, tipo PostgreSQL, tipo SQLite)
+    ('comunidades', 'chat_id', 'BIGINT', 'INTEGER'),
+    ('produtos', 'descricao', 'TEXT', 'TEXT'),
+]
+
+
+def upgrade(conn, dialect):
+    add_columns(conn, dialect, COLUNAS)
@@ -0,0 +1,31 @@
+"""
+Índices secundários das consultas quentes.
+
+As definições ficam congeladas aqui como eram nesta versão (database/indexes.py
+guarda só o estado atual; idx_users_data_registro, por exemplo, é removido
+pela 0010).
+"""
+from database.indexes import Index, ensure_indexes
+
+INDICES = [
+    Index('idx_vendas_aprovadas_data', 'vendas', 'data_venda, preco', "status = 'aprovado'",
+          "Métricas do dashboard por período"),
+    Index('idx_vendas_status_data', 'vendas', 'status, data_venda', None,
+          "Filtro de status/data em /vendas"),
+    Index('idx_scheduled_pendentes', 'scheduled_messages', 'schedule_time', "status = 'pending'",
+          "Worker de mensagens agendadas"),
+    Index('idx_user_access_ativos_expiracao', 'user_access', 'expiration_date', "status = 'active'",
+          "Worker de expiração de passes"),
+    Index('idx_user_access_status_expiracao', 'user_access', 'status, expiration_date', None,
+          "Consultas de acesso por status/expiração"),
+    Index('idx_user_access_convite', 'user_access', 'invite_link_used', None,
+          "Vigia de links de convite"),
+    Index('idx_users_data_registro', 'users', 'data_registro DESC', None,
+          "Listagem de usuários"),
+    Index('idx_users_ativos', 'users', 'id', "is_active = {true}",
+          "Usuários ativos (dashboard/broadcast)"),
+]
+
+
+def upgrade(conn, dialect):
+    ensure_indexes(conn, indexes=INDICES)
@@ -0,0 +1,25 @@
+"""
+Cria o administrador padrão (admin / admin123) apenas se ele ainda não existir.
+
+Antes o init_db() recalculava o hash (PBKDF2, lento de propósito) e
+sobrescrevia a senha do admin a cada boot de worker; agora o hash só é
+gerado uma vez, e uma senha trocada no painel não volta a ser 'admin123'.
+"""
+from werkzeug.security import generate_password_hash
+
+from database.query import fetch_one, execute
+
+DEFAULT_ADMIN_USERNAME = 'admin'
+DEFAULT_ADMIN_PASSWORD = 'admin123'
+
+
+def upgrade(conn, dialect):
+    cur = conn.cursor()
+    try:
+        if fetch_one(cur, "SELECT id FROM admin WHERE username = %s", (DEFAULT_ADMIN_USERNAME,)):
+            return
+        execute(cur, "INSERT INTO admin (username, password_hash) VALUES (%s, %s)",
+                (DEFAULT_ADMIN_USERNAME, generate_password_hash(DEFAULT_ADMIN_PASSWORD)))
+        print(f"DEBUG DB MIGRATION: Usuário admin padrão '{DEFAULT_ADMIN_USERNAME}' criado.")
+    finally:
+        cur.close()
@@ -0,0 +1,24 @@
+"""
+Controle por linha do worker de expiração de passes (access_expiration_worker).
+
+- claimed_at: quando o lote reivindicou a linha (status 'expiring'); se o
+  worker cair, a linha é reivindicada de novo depois do lease.
+- removed_at: quando a remoção no Telegram foi confirmada; fica NULL em
+  acessos expirados cuja remoção falhou (bot sem permissão, usuário já saiu...).
+"""
+from database.indexes import Index, ensure_indexes
+from database.migrations import add_columns
+
+COLUNAS = [
+    ('user_access', 'claimed_at', 'TIMESTAMP WITH TIME ZONE', 'DATETIME'),
+    ('user_access', 'removed_at', 'TIMESTAMP WITH TIME ZONE', 'DATETIME'),
+]
+INDICES = [
+    Index('idx_user_access_expirando', 'user_access', 'claimed_at', "status = 'expiring'",
+          "Retomada de lotes do worker de expiração"),
+]
+
+
+def upgrade(conn, dialect):
+    add_columns(conn, dialect, COLUNAS)
+    ensure_indexes(conn, indexes=INDICES)
@@ -0,0 +1,74 @@
+"""
+Converte `vendas` em tabela particionada por mês (RANGE em data_venda).
+
+Roda numa única transação (a tabela fica bloqueada durante a cópia):
+renomeia a tabela atual para `vendas_legado`, cria a nova `vendas`
+particionada com as mesmas colunas e a mesma sequência de ids, cria uma
+partição por mês com vendas (mais os próximos meses e uma DEFAULT), copia os
+dados e remove a tabela antiga.
+
+A chave primária passa a ser (id, data_venda), porque no PostgreSQL a chave
+de uma tabela particionada precisa conter a coluna de partição; os ids
+continuam vindo da mesma sequência.
+
+Só PostgreSQL: no SQLite `vendas` continua uma tabela comum.
+"""
+from datetime import date
+
+from database.indexes import Index, ensure_indexes
+from database.partitions import (
+    VENDAS_PARTICOES_FUTURAS, add_months, create_month_partitions, is_partitioned, month_start
+)
+
+VENDAS_INDICES = [
+    Index('idx_vendas_aprovadas_data', 'vendas', 'data_venda, preco', "status = 'aprovado'",
+          "Métricas do dashboard por período"),
+    Index('idx_vendas_status_data', 'vendas', 'status, data_venda', None,
+          "Filtro de status/data em /vendas"),
+]
+
+
+def upgrade(conn, dialect):
+    if is_partitioned(conn, 'vendas'):
+        return
+
+    cur = conn.cursor()
+    try:
+        cur.execute("LOCK TABLE vendas IN ACCESS EXCLUSIVE MODE")
+        cur.execute("UPDATE vendas SET data_venda = CURRENT_TIMESTAMP WHERE data_venda IS NULL")
+
+        cur.execute("ALTER TABLE vendas RENAME TO vendas_legado")
+        cur.execute("ALTER TABLE vendas_legado RENAME CONSTRAINT vendas_pkey TO vendas_legado_pkey")
+        cur.execute("SELECT pg_get_serial_sequence('vendas_legado', 'id') AS seq")
+        sequence = cur.fetchone()['seq']
+
+        # LIKE copia colunas, NOT NULL e defaults (inclusive o nextval da sequência de ids).
+        cur.execute("""
+            CREATE TABLE vendas (LIKE vendas_legado INCLUDING DEFAULTS)
+            PARTITION BY RANGE (data_venda)
+        """)
+        cur.execute("ALTER TABLE vendas ALTER COLUMN data_venda SET NOT NULL")
+        cur.execute("ALTER TABLE vendas ADD CONSTRAINT vendas_pkey PRIMARY KEY (id, data_venda)")
+        cur.execute("ALTER TABLE vendas ADD CONSTRAINT vendas_user_id_fkey FOREIGN KEY (user_id) REFERENCES users(id)")
+        cur.execute(
+            "ALTER TABLE vendas ADD CONSTRAINT vendas_produto_id_fkey FOREIGN KEY (produto_id) REFERENCES produtos(id)"
+        )
+
+        cur.execute("SELECT MIN(data_venda) AS first FROM vendas_legado")
+        first = cur.fetchone()['first']
+        this_month = month_start(date.today())
+        first_month = month_start(first.date()) if first else this_month
+        create_month_partitions(cur, 'vendas', min(first_month, this_month),
+                                add_months(this_month, VENDAS_PARTICOES_FUTURAS))
+        cur.execute("CREATE TABLE IF NOT EXISTS vendas_default PARTITION OF vendas DEFAULT")
+
+        cur.execute("INSERT INTO vendas SELECT * FROM vendas_legado")
+        if sequence:
+            # A sequência pertence à coluna antiga; sem isso o DROP levaria ela junto.
+            cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY vendas.id")
+        cur.execute("DROP TABLE vendas_legado")
+    finally:
+        cur.close()
+
+    # Índices criados na tabela-mãe valem para todas as partições (atuais e futuras).
+    ensure_indexes(conn, indexes=VENDAS_INDICES)
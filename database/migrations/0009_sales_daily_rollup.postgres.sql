@@ -0,0 +1,18 @@
+-- === Agregado diário de vendas aprovadas (lido pelo dashboard) ===
+-- Mantido incrementalmente pelo webhook do Mercado Pago (database/rollup.py);
+-- `python -m database.rollup rebuild` recalcula tudo a partir de `vendas`.
+
+CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+    dia DATE NOT NULL,
+    produto_id INTEGER NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    receita NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, produto_id)
+);
+
+INSERT INTO sales_daily_rollup (dia, produto_id, quantidade, receita)
+SELECT DATE(data_venda), produto_id, COUNT(*), COALESCE(SUM(preco), 0)
+FROM vendas
+WHERE status = 'aprovado'
+GROUP BY DATE(data_venda), produto_id
+ON CONFLICT (dia, produto_id) DO NOTHING;
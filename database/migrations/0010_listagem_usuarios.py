@@ -0,0 +1,29 @@
+"""
+Índices da listagem paginada de /usuarios.
+
+- idx_users_registro_id substitui idx_users_data_registro: a paginação por
+  keyset ordena por (data_registro, id), e o id desempata registros no mesmo
+  instante.
+- idx_users_username_prefixo / idx_users_first_name_prefixo: busca por prefixo
+  sem diferenciar maiúsculas (lower(...) text_pattern_ops no PostgreSQL,
+  COLLATE NOCASE no SQLite).
+"""
+from database.indexes import Index, ensure_indexes
+
+INDICES = [
+    Index('idx_users_registro_id', 'users', 'data_registro DESC, id DESC', None,
+          "Listagem paginada de usuários"),
+    Index('idx_users_username_prefixo', 'users', 'lower(username) text_pattern_ops', None,
+          "Busca de usuários por @username", 'username COLLATE NOCASE'),
+    Index('idx_users_first_name_prefixo', 'users', 'lower(first_name) text_pattern_ops', None,
+          "Busca de usuários por nome", 'first_name COLLATE NOCASE'),
+]
+
+
+def upgrade(conn, dialect):
+    cur = conn.cursor()
+    try:
+        cur.execute("DROP INDEX IF EXISTS idx_users_data_registro")
+    finally:
+        cur.close()
+    ensure_indexes(conn, indexes=INDICES)
@@ -0,0 +1,99 @@
+"""
+Índices da pesquisa de /vendas (username, first_name e nome do produto).
+
+- Os dois bancos: idx_vendas_usuario / idx_vendas_produto, para ir dos
+  usuários e produtos encontrados às suas vendas.
+- PostgreSQL: extensão pg_trgm e índices GIN de trigramas, que atendem o
+  ILIKE '%termo%' sem varrer as tabelas.
+- SQLite: tabelas FTS5 com o tokenizador trigram (busca por substring, sem
+  diferenciar maiúsculas), de conteúdo externo e mantidas por triggers.
+
+Se o banco não oferecer pg_trgm (sem permissão para CREATE EXTENSION) ou
+FTS5/trigram (SQLite < 3.34), a migração só avisa: a pesquisa continua
+funcionando com LIKE/ILIKE, apenas sem índice.
+"""
+import sqlite3
+
+from database.indexes import Index, ensure_indexes
+from database.query import SQLITE
+
+INDICES = [
+    Index('idx_vendas_usuario', 'vendas', 'user_id, id', None,
+          "Vendas por usuário (pesquisa em /vendas)"),
+    Index('idx_vendas_produto', 'vendas', 'produto_id, id', None,
+          "Vendas por produto (pesquisa e filtro em /vendas)"),
+]
+
+TRGM_INDICES = [
+    ('idx_users_username_trgm', 'users', 'username'),
+    ('idx_users_first_name_trgm', 'users', 'first_name'),
+    ('idx_produtos_nome_trgm', 'produtos', 'nome'),
+]
+
+FTS_TABELAS = [
+    # (tabela FTS, tabela de conteúdo, colunas)
+    ('users_fts', 'users', ['username', 'first_name']),
+    ('produtos_fts', 'produtos', ['nome']),
+]
+
+
+def _postgres(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute("SAVEPOINT busca_trgm")
+        try:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except Exception as e:
+            cur.execute("ROLLBACK TO SAVEPOINT busca_trgm")
+            print(f"AVISO DB MIGRATION: pg_trgm indisponível ({e}); pesquisa de vendas seguirá sem índice.")
+            return
+        cur.execute("RELEASE SAVEPOINT busca_trgm")
+        for name, table, column in TRGM_INDICES:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)")
+    finally:
+        cur.close()
+
+
+def _sqlite(conn):
+    cur = conn.cursor()
+    try:
+        for fts, table, columns in FTS_TABELAS:
+            cols = ', '.join(columns)
+            new_values = ', '.join(f"new.{c}" for c in columns)
+            old_values = ', '.join(f"old.{c}" for c in columns)
+            try:
+                cur.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                    f"{cols}, content='{table}', content_rowid='id', tokenize='trigram')"
+                )
+            except sqlite3.OperationalError as e:
+                print(f"AVISO DB MIGRATION: FTS5/trigram indisponível ({e}); pesquisa de vendas seguirá sem índice.")
+                return
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_values});
+                END
+            """)
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+                END
+            """)
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+                    INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+                    INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_values});
+                END
+            """)
+            # Indexa as linhas que já existem.
+            cur.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    finally:
+        cur.close()
+
+
+def upgrade(conn, dialect):
+    ensure_indexes(conn, indexes=INDICES)
+    if dialect == SQLITE:
+        _sqlite(conn)
+    else:
+        _postgres(conn)
@@ -0,0 +1,12 @@
+-- === Eventos do painel ao vivo (/api/eventos) ===
+-- Gravados pelo webhook do Mercado Pago na mesma transação da aprovação
+-- (database/painel_eventos.py), seguidos de NOTIFY painel_eventos.
+
+CREATE TABLE IF NOT EXISTS painel_eventos (
+    id BIGSERIAL PRIMARY KEY,
+    tipo VARCHAR(50) NOT NULL,
+    payload TEXT NOT NULL,
+    criado_em TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_painel_eventos_criado_em ON painel_eventos (criado_em);
@@ -0,0 +1,13 @@
+-- === Eventos do painel ao vivo (/api/eventos) ===
+-- Gravados pelo webhook do Mercado Pago na mesma transação da aprovação
+-- (database/painel_eventos.py). AUTOINCREMENT: um id nunca é reutilizado
+-- depois da limpeza, já que os navegadores retomam pelo último id recebido.
+
+CREATE TABLE IF NOT EXISTS painel_eventos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    criado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_painel_eventos_criado_em ON painel_eventos (criado_em);
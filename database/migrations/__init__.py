@@ -0,0 +1,238 @@
+# database/migrations/__init__.py
+"""
+Migrações versionadas do esquema (PostgreSQL e SQLite).
+
+Cada arquivo desta pasta é uma migração, aplicada em ordem pelo número do
+prefixo e registrada na tabela `schema_version`:
+
+    NNNN_nome.postgres.sql   SQL só para o PostgreSQL
+    NNNN_nome.sqlite.sql     SQL só para o SQLite
+    NNNN_nome.sql            SQL igual para os dois dialetos
+    NNNN_nome.py             módulo com `upgrade(conn, dialect)`
+
+Cada migração roda na sua própria transação, junto com o INSERT em
+`schema_version`; se falhar, nada dela fica aplicado.
+
+As migrações são aplicadas fora do boot dos workers:
+
+    python -m database.migrations            # status
+    python -m database.migrations upgrade    # aplica as pendentes
+
+No startup o app só chama `check_schema()`, que lê a versão atual (uma
+consulta) e avisa se há migrações pendentes.
+"""
+import importlib.util
+import os
+import re
+from collections import namedtuple
+
+from ..database import get_db_connection
+from ..query import Query, dialect_of, execute, fetch_value, SQLITE, POSTGRES
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Com DB_AUTO_MIGRATE=1 o check_schema() do startup aplica as pendentes (útil no SQLite local).
+DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', '0') == '1'
+# Chave do advisory lock que impede duas execuções simultâneas no PostgreSQL.
+_PG_LOCK_KEY = 72_640_005
+
+Migration = namedtuple('Migration', ['version', 'name', 'path', 'kind'])
+
+_FILE_RE = re.compile(r'^(\d{4})_(\w+?)(?:\.(postgres|sqlite))?\.(sql|py)$')
+
+_CREATE_VERSION_TABLE = {
+    POSTGRES: """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    SQLITE: """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+}
+_VERSION_TABLE_EXISTS = Query(
+    "SELECT 1 FROM information_schema.tables WHERE table_schema = current_schema() AND table_name = 'schema_version'",
+    sqlite="SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'",
+)
+_CURRENT_VERSION = Query("SELECT MAX(version) FROM schema_version")
+_RECORD_VERSION = Query("INSERT INTO schema_version (version, name) VALUES (%s, %s)")
+
+
+class MigrationError(Exception):
+    """Falha ao descobrir ou aplicar uma migração."""
+
+
+def add_columns(conn, dialect, columns):
+    """
+    Helper das migrações: adiciona colunas que ainda não existem.
+    `columns` é uma lista de (tabela, coluna, tipo PostgreSQL, tipo SQLite).
+    """
+    cur = conn.cursor()
+    try:
+        for table, column, pg_type, sqlite_type in columns:
+            if dialect == SQLITE:
+                # SQLite não tem ADD COLUMN IF NOT EXISTS.
+                cur.execute(f"PRAGMA table_info({table})")
+                existing = {row[1] for row in cur.fetchall()}
+                if column not in existing:
+                    cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {sqlite_type}")
+            else:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {pg_type}")
+    finally:
+        cur.close()
+
+
+def discover(dialect):
+    """Migrações disponíveis para o dialeto, ordenadas pela versão."""
+    found = {}
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        m = _FILE_RE.match(filename)
+        if not m:
+            continue
+        version, name, only_dialect, kind = int(m.group(1)), m.group(2), m.group(3), m.group(4)
+        if only_dialect and only_dialect != dialect:
+            continue
+        if version in found:
+            raise MigrationError(
+                f"Versão {version:04d} duplicada: {os.path.basename(found[version].path)} e {filename}."
+            )
+        found[version] = Migration(version, name, os.path.join(MIGRATIONS_DIR, filename), kind)
+    return [found[v] for v in sorted(found)]
+
+
+def current_version(conn):
+    """Versão aplicada no banco (0 se `schema_version` ainda não existe)."""
+    cur = conn.cursor()
+    try:
+        if fetch_value(cur, _VERSION_TABLE_EXISTS) is None:
+            return 0
+        return int(fetch_value(cur, _CURRENT_VERSION, default=0))
+    finally:
+        cur.close()
+        if dialect_of(conn) == POSTGRES:
+            conn.rollback()
+
+
+def pending(conn):
+    version = current_version(conn)
+    return [mig for mig in discover(dialect_of(conn)) if mig.version > version]
+
+
+def _load_module(migration):
+    spec = importlib.util.spec_from_file_location(f"database.migrations._m{migration.version:04d}", migration.path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, 'upgrade'):
+        raise MigrationError(f"{os.path.basename(migration.path)} não define upgrade(conn, dialect).")
+    return module
+
+
+def _read_sql(migration):
+    with open(migration.path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _apply(conn, migration, dialect):
+    if dialect == SQLITE and migration.kind == 'sql':
+        # executescript() não aceita parâmetros e faz COMMIT antes de começar,
+        # então o script inteiro (incluindo o registro da versão) vai num BEGIN/COMMIT explícito.
+        name = migration.name.replace("'", "''")
+        conn.executescript(
+            f"BEGIN;\n{_read_sql(migration)}\n;\n"
+            f"INSERT INTO schema_version (version, name) VALUES ({migration.version}, '{name}');\nCOMMIT;"
+        )
+        return
+
+    if dialect == SQLITE and not conn.in_transaction:
+        # O sqlite3 só abre transação sozinho antes de DML; DDL também precisa ser atômico.
+        conn.execute("BEGIN")
+    cur = conn.cursor()
+    try:
+        if migration.kind == 'sql':
+            cur.execute(_read_sql(migration))
+        else:
+            _load_module(migration).upgrade(conn, dialect)
+        execute(cur, _RECORD_VERSION, (migration.version, migration.name))
+    finally:
+        cur.close()
+    conn.commit()
+
+
+def upgrade(conn=None, target=None):
+    """
+    Aplica as migrações pendentes (até `target`, se informado) e retorna as aplicadas.
+    Sem `conn`, usa uma conexão do pool.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+        if conn is None:
+            raise MigrationError("Não foi possível conectar ao banco de dados.")
+    dialect = dialect_of(conn)
+    applied = []
+    try:
+        cur = conn.cursor()
+        try:
+            cur.execute(_CREATE_VERSION_TABLE[dialect])
+            if dialect == POSTGRES:
+                cur.execute("SELECT pg_advisory_lock(%s)", (_PG_LOCK_KEY,))
+        finally:
+            cur.close()
+        conn.commit()
+        try:
+            for migration in pending(conn):
+                if target is not None and migration.version > target:
+                    break
+                print(f"DEBUG DB MIGRATION: Aplicando {migration.version:04d}_{migration.name} ({dialect})...")
+                try:
+                    _apply(conn, migration, dialect)
+                except Exception as e:
+                    conn.rollback()
+                    raise MigrationError(
+                        f"Falha na migração {migration.version:04d}_{migration.name}: {e}"
+                    ) from e
+                applied.append(migration)
+        finally:
+            if dialect == POSTGRES and not conn.closed:
+                cur = conn.cursor()
+                try:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (_PG_LOCK_KEY,))
+                finally:
+                    cur.close()
+                conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+    return applied
+
+
+def check_schema(auto_upgrade=DB_AUTO_MIGRATE):
+    """
+    Verificação de startup: compara a versão do banco com a última migração.
+
+    Retorna True se o esquema está em dia. Com `auto_upgrade` aplica as
+    pendentes; caso contrário só imprime o aviso.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        print("AVISO DB MIGRATION: Sem conexão com o banco; versão do esquema não verificada.")
+        return False
+    try:
+        waiting = pending(conn)
+        if not waiting:
+            print(f"DEBUG DB MIGRATION: Esquema na versão {current_version(conn)} (em dia).")
+            return True
+        if auto_upgrade:
+            upgrade(conn)
+            return True
+        names = ', '.join(f"{m.version:04d}_{m.name}" for m in waiting)
+        print(f"AVISO DB MIGRATION: {len(waiting)} migração(ões) pendente(s): {names}. "
+              f"Execute 'python -m database.migrations upgrade'.")
+        return False
+    finally:
+        conn.close()
@@ -0,0 +1,51 @@
+# database/migrations/__main__.py
+"""
+Linha de comando das migrações.
+
+    python -m database.migrations [status]          # versão atual e pendentes
+    python -m database.migrations upgrade [versao]  # aplica as pendentes (até `versao`)
+"""
+import sys
+
+from ..database import get_db_connection
+from ..query import dialect_of
+from . import MigrationError, current_version, pending, upgrade
+
+
+def status():
+    conn = get_db_connection()
+    if conn is None:
+        print("ERRO: Não foi possível conectar ao banco de dados.")
+        return 1
+    try:
+        print(f"Dialeto: {dialect_of(conn)}")
+        print(f"Versão atual: {current_version(conn)}")
+        waiting = pending(conn)
+        if not waiting:
+            print("Nenhuma migração pendente.")
+        for migration in waiting:
+            print(f"  pendente: {migration.version:04d}_{migration.name} ({migration.kind})")
+    finally:
+        conn.close()
+    return 0
+
+
+def main(argv):
+    command = argv[0] if argv else 'status'
+    if command == 'status':
+        return status()
+    if command == 'upgrade':
+        target = int(argv[1]) if len(argv) > 1 else None
+        try:
+            applied = upgrade(target=target)
+        except MigrationError as e:
+            print(f"ERRO: {e}")
+            return 1
+        print(f"{len(applied)} migração(ões) aplicada(s).")
+        return 0
+    print(__doc__)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
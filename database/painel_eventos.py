@@ -0,0 +1,93 @@
+# database/painel_eventos.py
+"""
+Eventos do painel ao vivo: `painel_eventos` (id, tipo, payload, criado_em),
+criada pela migração 0012.
+
+O webhook do Mercado Pago chama `publish()` no mesmo cursor/transação em que
+aprova a venda ou registra o passe, então o evento só existe se a aprovação
+foi gravada. No PostgreSQL `publish()` também emite `NOTIFY painel_eventos`,
+que o banco só entrega no commit; quem escuta (web/services/live_feed.py, um
+por worker do gunicorn) lê então as linhas novas por id. Como a tabela é a
+fonte, qualquer worker enxerga os eventos gravados por qualquer outro.
+
+Tipos:
+    venda_aprovada  {id, user_id, username, first_name, produto, preco, data_venda, dia, status}
+    acesso_ativado  {user_id, username, first_name, passe, preco, expiracao}
+"""
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from .query import Query, dialect_of, execute, fetch_all, fetch_one, fetch_value, POSTGRES
+
+CANAL = 'painel_eventos'
+# Eventos mais antigos que isto são apagados (só servem para o painel aberto).
+PAINEL_EVENTOS_RETENCAO_HORAS = int(os.getenv('PAINEL_EVENTOS_RETENCAO_HORAS', '24'))
+
+_INSERIR = Query("INSERT INTO painel_eventos (tipo, payload) VALUES (%s, %s)", prepare='painel_evento_inserir')
+_DEPOIS_DE = Query("""
+    SELECT id, tipo, payload FROM painel_eventos
+    WHERE id > %s
+    ORDER BY id
+    LIMIT %s
+""")
+_ULTIMO_ID = Query("SELECT MAX(id) FROM painel_eventos")
+_LIMPAR = Query("DELETE FROM painel_eventos WHERE criado_em < %s")
+_VENDA = Query("""
+    SELECT v.id, v.user_id, u.username, u.first_name, p.nome AS produto, v.preco, v.data_venda, v.status
+    FROM vendas v
+    JOIN users u ON v.user_id = u.id
+    JOIN produtos p ON v.produto_id = p.id
+    WHERE v.id = %s
+""")
+_USUARIO = Query("SELECT username, first_name FROM users WHERE id = %s")
+
+
+def publish(cur, tipo, dados):
+    """Grava o evento na transação do cursor (e avisa os ouvintes no commit, no PostgreSQL)."""
+    execute(cur, _INSERIR, (tipo, json.dumps(dados, default=str)))
+    if dialect_of(cur) == POSTGRES:
+        cur.execute(f"NOTIFY {CANAL}")
+
+
+def publish_approved_sale(cur, venda_id):
+    """Evento 'venda_aprovada' com o que a tabela de vendas recentes do painel exibe."""
+    venda = fetch_one(cur, _VENDA, (venda_id,))
+    if not venda:
+        return
+    dados = dict(venda)
+    dados['preco'] = float(dados['preco'] or 0)
+    dados['dia'] = str(dados['data_venda'])[:10]
+    publish(cur, 'venda_aprovada', dados)
+
+
+def publish_access_granted(cur, user_id, pass_item, expiration_date):
+    """Evento 'acesso_ativado' para um passe de acesso recém-concedido."""
+    usuario = fetch_one(cur, _USUARIO, (user_id,))
+    usuario = dict(usuario) if usuario else {}
+    publish(cur, 'acesso_ativado', {
+        'user_id': user_id,
+        'username': usuario.get('username'),
+        'first_name': usuario.get('first_name'),
+        'passe': pass_item['name'],
+        'preco': float(pass_item['price'] or 0),
+        'expiracao': expiration_date,
+    })
+
+
+def events_after(cur, last_id, limit=200):
+    """Eventos com id maior que `last_id`, em ordem: [{'id', 'tipo', 'dados'}]."""
+    return [
+        {'id': row['id'], 'tipo': row['tipo'], 'dados': json.loads(row['payload'])}
+        for row in fetch_all(cur, _DEPOIS_DE, (last_id, limit))
+    ]
+
+
+def last_event_id(cur):
+    return int(fetch_value(cur, _ULTIMO_ID, default=0))
+
+
+def purge(cur, retention_hours=PAINEL_EVENTOS_RETENCAO_HORAS):
+    """Apaga os eventos mais antigos que a retenção e retorna quantos foram."""
+    execute(cur, _LIMPAR, (datetime.now(timezone.utc) - timedelta(hours=retention_hours),))
+    return max(cur.rowcount, 0)
@@ -0,0 +1,217 @@
+# database/partitions.py
+"""
+Particionamento mensal de `vendas` no PostgreSQL (PARTITION BY RANGE (data_venda)).
+
+A conversão da tabela existente é a migração 0008. Daqui em diante:
+
+- `ensure_partitions()` cria as partições do mês atual e dos próximos
+  VENDAS_PARTICOES_FUTURAS meses (o app chama no startup e depois a cada 12
+  horas); vendas fora de qualquer faixa caem na partição DEFAULT. Se a
+  DEFAULT já tiver vendas do mês que vai ganhar partição (o PostgreSQL
+  recusaria o CREATE ... PARTITION OF), elas são movidas para a partição nova
+  na mesma transação. As que sobram na DEFAULT (meses fora da janela, ex.:
+  datas muito no futuro ou de meses já desanexados) geram um AVISO por mês
+  no log, porque lá elas não são podadas pelas consultas por período.
+- `detach_old_partitions()` desanexa os meses mais antigos que N meses: a
+  tabela `vendas_AAAA_MM` continua existindo (para arquivo ou DROP), mas sai
+  das consultas do painel. É uma operação só de catálogo, sem reescrever dados.
+
+As consultas do painel filtram `data_venda` por faixas (BETWEEN / >= e <), o
+que permite ao PostgreSQL podar as partições fora do intervalo.
+
+No SQLite nada disso se aplica e as funções não fazem nada.
+
+    python -m database.partitions ensure
+    python -m database.partitions detach <meses_a_manter>
+"""
+import os
+import sys
+from datetime import date
+
+from .query import dialect_of, fetch_all, fetch_value, POSTGRES
+
+# Meses à frente com partição já criada.
+VENDAS_PARTICOES_FUTURAS = int(os.getenv('VENDAS_PARTICOES_FUTURAS', '3'))
+
+_IS_PARTITIONED = """
+    SELECT 1 FROM pg_partitioned_table pt
+    JOIN pg_class c ON c.oid = pt.partrelid
+    WHERE c.relname = %s AND c.relnamespace = current_schema()::regnamespace
+"""
+_DEFAULT_NO_PERIODO = """
+    SELECT COUNT(*) FROM {default} WHERE data_venda >= %s AND data_venda < %s
+"""
+_DEFAULT_POR_MES = """
+    SELECT CAST(date_trunc('month', data_venda) AS DATE) AS mes, COUNT(*) AS total
+    FROM {default}
+    GROUP BY 1
+    ORDER BY 1
+"""
+_PARTITIONS = """
+    SELECT child.relname AS name
+    FROM pg_inherits i
+    JOIN pg_class parent ON parent.oid = i.inhparent
+    JOIN pg_class child ON child.oid = i.inhrelid
+    WHERE parent.relname = %s AND parent.relnamespace = current_schema()::regnamespace
+"""
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    index = day.year * 12 + (day.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def is_partitioned(conn, table='vendas'):
+    if dialect_of(conn) != POSTGRES:
+        return False
+    cur = conn.cursor()
+    try:
+        return fetch_value(cur, _IS_PARTITIONED, (table,)) is not None
+    finally:
+        cur.close()
+
+
+def create_month_partitions(cur, table, first_month, last_month):
+    """Cria (se faltarem) as partições mensais de `first_month` até `last_month`, inclusive."""
+    created = []
+    month = month_start(first_month)
+    while month <= last_month:
+        name = partition_name(table, month)
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        )
+        created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+def _move_default_rows(cur, table, default, month):
+    """
+    Cria a partição de `month` com as vendas desse mês que estão na DEFAULT:
+    a tabela nasce avulsa, recebe as linhas (apagadas da DEFAULT) e só então é
+    anexada, o que o PostgreSQL aceita porque a DEFAULT já não tem linhas da faixa.
+    """
+    name = partition_name(table, month)
+    # Segura novas vendas do mês na DEFAULT até o ATTACH (leituras continuam liberadas).
+    cur.execute(f"LOCK TABLE {default} IN EXCLUSIVE MODE")
+    cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)")
+    cur.execute(
+        f"WITH movidas AS ("
+        f"DELETE FROM {default} WHERE data_venda >= %s AND data_venda < %s RETURNING *"
+        f") INSERT INTO {name} SELECT * FROM movidas",
+        (month, add_months(month, 1)),
+    )
+    moved = cur.rowcount
+    cur.execute(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+    return moved
+
+
+def report_default_rows(cur, table='vendas'):
+    """Avisa (um AVISO por mês) quando a partição DEFAULT guarda vendas; retorna {mês: quantidade}."""
+    default = default_partition_name(table)
+    rows = {row['mes']: int(row['total']) for row in fetch_all(cur, _DEFAULT_POR_MES.format(default=default))}
+    for month, total in rows.items():
+        print(f"AVISO DB PARTITION: {total} venda(s) de {month:%m/%Y} na partição '{default}' "
+              f"(sem partição do mês; essas linhas não são podadas nas consultas por período).")
+    return rows
+
+
+def ensure_partitions(conn, table='vendas', months_ahead=VENDAS_PARTICOES_FUTURAS):
+    """
+    Garante as partições do mês atual e dos próximos `months_ahead` meses,
+    movendo para elas as vendas que estavam na DEFAULT (commit incluso).
+    """
+    if not is_partitioned(conn, table):
+        return []
+    this_month = month_start(date.today())
+    default = default_partition_name(table)
+    cur = conn.cursor()
+    try:
+        existing = {row['name'] for row in fetch_all(cur, _PARTITIONS, (table,))}
+        wanted = [add_months(this_month, i) for i in range(months_ahead + 1)]
+        missing = [m for m in wanted if partition_name(table, m) not in existing]
+        has_default = default in existing
+        for month in missing:
+            in_default = has_default and fetch_value(
+                cur, _DEFAULT_NO_PERIODO.format(default=default), (month, add_months(month, 1)), default=0
+            )
+            if in_default:
+                moved = _move_default_rows(cur, table, default, month)
+                print(f"DEBUG DB PARTITION: Partição '{partition_name(table, month)}' criada com "
+                      f"{moved} venda(s) movida(s) de '{default}'.")
+            else:
+                create_month_partitions(cur, table, month, month)
+                print(f"DEBUG DB PARTITION: Partição '{partition_name(table, month)}' criada.")
+        if has_default:
+            report_default_rows(cur, table)
+        conn.commit()
+        return [partition_name(table, m) for m in missing]
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def detach_old_partitions(conn, keep_months, table='vendas'):
+    """Desanexa as partições mensais anteriores aos últimos `keep_months` meses."""
+    if not is_partitioned(conn, table):
+        return []
+    cutoff = add_months(month_start(date.today()), -keep_months)
+    cur = conn.cursor()
+    try:
+        detached = []
+        for row in fetch_all(cur, _PARTITIONS, (table,)):
+            name = row['name']
+            suffix = name[len(table) + 1:]
+            try:
+                year, month = (int(part) for part in suffix.split('_'))
+            except ValueError:
+                continue  # partição DEFAULT ou fora do padrão
+            if date(year, month, 1) < cutoff:
+                cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                detached.append(name)
+                print(f"DEBUG DB PARTITION: Partição '{name}' desanexada de '{table}'.")
+        conn.commit()
+        return detached
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+if __name__ == '__main__':
+    from .database import get_db_connection
+
+    args = sys.argv[1:]
+    conn = get_db_connection()
+    if conn is None:
+        print("ERRO: Não foi possível conectar ao banco de dados.")
+        sys.exit(1)
+    try:
+        if args and args[0] == 'detach' and len(args) == 2:
+            print(f"{len(detach_old_partitions(conn, int(args[1])))} partição(ões) desanexada(s).")
+        elif not args or args[0] == 'ensure':
+            print(f"{len(ensure_partitions(conn))} partição(ões) criada(s).")
+        else:
+            print(__doc__)
+            sys.exit(2)
+    finally:
+        conn.close()
@@ -0,0 +1,445 @@
+# database/pool.py
+"""
+Pool de conexões do processo.
+
+- PostgreSQL: um pool thread-safe por processo (ou seja, por worker do
+  gunicorn), criado sob demanda. As conexões são subclasses de
+  `psycopg2.extensions.connection`, então `isinstance`, `with conn:` e
+  `conn.cursor()` continuam funcionando nos call sites; apenas `close()`
+  passa a devolver a conexão ao pool em vez de fechar o socket.
+- SQLite: uma conexão persistente por thread (e por modo: leitura/escrita ou
+  somente leitura). `close()` apenas descarta a transação pendente quando o
+  último usuário da thread a devolve. As conexões são abertas em modo WAL,
+  então os leitores (painel) não bloqueiam o escritor (bot, workers) e
+  vice-versa; o busy timeout faz as escritas concorrentes esperarem pelo
+  lock em vez de falharem com "database is locked".
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+
+from .query_stats import record
+
+# Configuração do pool (por processo / worker do gunicorn)
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+# Threads de fundo do app que usam o pool (mensagens agendadas, partições,
+# vendas pendentes, expiração de acessos).
+_BACKGROUND_WORKERS = 4
+# Por padrão, uma conexão para cada thread do gunicorn (ver Procfile) mais os workers de fundo.
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', str(int(os.getenv('GUNICORN_THREADS', '16')) + _BACKGROUND_WORKERS)))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+# Conexões ociosas há mais tempo que isso recebem um "SELECT 1" antes de serem reutilizadas.
+DB_POOL_PING_AFTER = float(os.getenv('DB_POOL_PING_AFTER', '30'))
+# Tamanho do cache de statements compilados de cada conexão SQLite persistente.
+SQLITE_CACHED_STATEMENTS = int(os.getenv('SQLITE_CACHED_STATEMENTS', '256'))
+# Ajustes do SQLite (aplicados por PRAGMA a cada conexão nova).
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Nenhuma conexão ficou livre dentro de DB_POOL_TIMEOUT segundos."""
+
+
+class TimedRealDictCursor(RealDictCursor):
+    """RealDictCursor que registra duração, linhas e local de cada execução (database/query_stats.py)."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            record(query, vars, time.perf_counter() - started, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            record(query, None, time.perf_counter() - started, self.rowcount)
+
+
+class PooledPgConnection(psycopg2.extensions.connection):
+    """
+    Conexão PostgreSQL que volta para o pool ao ser fechada.
+
+    Só `close()` devolve a conexão: `with conn:` apenas faz commit/rollback,
+    como no psycopg2. Se o call site esquecer o `close()`, a vaga é liberada
+    quando a conexão for coletada pelo garbage collector (`__del__`), com um
+    aviso no log, em vez de ficar presa até o pool esgotar.
+    """
+
+    def close(self):
+        pool = getattr(self, '_pool', None)
+        if pool is None:
+            return super().close()
+        pool.putconn(self)
+
+    def __del__(self):
+        pool = getattr(self, '_pool', None)
+        if pool is not None:
+            pool.forget(self)
+
+    def close_physical(self):
+        """Fecha de fato o socket (usado pelo próprio pool)."""
+        self._pool = None
+        if not self.closed:
+            super().close()
+
+
+class PgConnectionPool:
+    """Pool thread-safe com espera limitada e estatísticas de uso."""
+
+    def __init__(self, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT, role='primary',
+                 **connect_kwargs):
+        self.dsn = dsn
+        self.role = role
+        self.minconn = max(0, minconn)
+        self.maxconn = max(1, maxconn, self.minconn)
+        self.timeout = timeout
+        self.connect_kwargs = connect_kwargs
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle = []  # pilha (LIFO): reaproveita a conexão mais "quente"
+        self._size = 0
+        self._in_use = 0
+
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._leaks = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+        for _ in range(self.minconn):
+            self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                self._size -= 1
+                raise
+            conn._idle_since = time.monotonic()
+            self._idle.append(conn)
+
+    def _connect(self):
+        conn = psycopg2.connect(
+            self.dsn,
+            connection_factory=PooledPgConnection,
+            cursor_factory=TimedRealDictCursor,
+            **self.connect_kwargs
+        )
+        conn.autocommit = False
+        conn._pool = None
+        # Nomes dos prepared statements já criados nesta sessão (ver database/query.py).
+        conn.prepared_statements = set()
+        return conn
+
+    def _usable(self, conn):
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - getattr(conn, '_idle_since', 0) > DB_POOL_PING_AFTER:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute('SELECT 1')
+                conn.rollback()
+            except Exception:
+                return False
+        return True
+
+    def _discard(self, conn):
+        self._size -= 1
+        try:
+            conn.close_physical()
+        except Exception:
+            pass
+
+    def _checkout(self, conn, started_at):
+        waited = time.monotonic() - started_at
+        self._checkouts += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        conn._pool = self
+
+    def getconn(self, readonly=False):
+        """
+        Empresta uma conexão. Com `readonly=True` as transações dela abrem como
+        `BEGIN READ ONLY` (o psycopg2 aplica na próxima transação, sem ida extra
+        ao servidor) até a conexão voltar ao pool.
+        """
+        conn = self._getconn()
+        if readonly:
+            conn.readonly = True
+        return conn
+
+    def _getconn(self):
+        started_at = time.monotonic()
+        deadline = started_at + self.timeout
+        waited = False
+        while True:
+            conn = None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        conn = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        self._in_use += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"Pool esgotado: {self._in_use}/{self.maxconn} conexões em uso após {self.timeout}s."
+                        )
+                    if not waited:
+                        waited = True
+                        self._waits += 1
+                    self._cond.wait(remaining)
+
+            # Validação e handshake acontecem fora do lock para não bloquear as outras threads.
+            if conn is not None:
+                if self._usable(conn):
+                    with self._cond:
+                        self._checkout(conn, started_at)
+                    return conn
+                with self._cond:
+                    self._in_use -= 1
+                    self._discard(conn)
+                    self._cond.notify()
+                continue
+
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._checkout(conn, started_at)
+            return conn
+
+    def putconn(self, conn):
+        if getattr(conn, '_pool', None) is not self:
+            return  # close() chamado duas vezes: ignora
+        conn._pool = None
+
+        keep = True
+        try:
+            if conn.closed:
+                keep = False
+            else:
+                status = conn.get_transaction_status()
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    keep = False
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    # Mesmo comportamento de fechar sem commit: descarta a transação.
+                    conn.rollback()
+                if keep and conn.autocommit:
+                    conn.autocommit = False
+                if keep and conn.readonly is not None:
+                    conn.readonly = None  # volta ao padrão do servidor
+        except Exception:
+            keep = False
+
+        with self._cond:
+            self._in_use -= 1
+            if keep and os.getpid() == self.pid:
+                conn._idle_since = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self._discard(conn)
+            self._cond.notify()
+
+    def forget(self, conn):
+        """Libera a vaga de uma conexão emprestada que foi descartada sem `close()`."""
+        if getattr(conn, '_pool', None) is not self:
+            return
+        conn._pool = None
+        with self._cond:
+            self._in_use -= 1
+            self._size -= 1
+            self._leaks += 1
+            self._cond.notify()
+        # O socket é fechado pelo próprio psycopg2 ao desalocar a conexão (e o servidor desfaz a transação).
+        print(f"AVISO DB: Conexão do pool '{self.role}' descartada sem close(); vaga liberada.")
+
+    def closeall(self):
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+
+    def stats(self):
+        with self._cond:
+            return {
+                'backend': 'postgresql',
+                'role': self.role,
+                'pid': self.pid,
+                'size': self._size,
+                'max_size': self.maxconn,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'leaks': self._leaks,
+                'wait_time_total_ms': round(self._total_wait * 1000, 3),
+                'wait_time_avg_ms': round(self._total_wait * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                'wait_time_max_ms': round(self._max_wait * 1000, 3),
+            }
+
+
+_pg_pools = {}
+_pg_pools_lock = threading.Lock()
+
+
+def get_pg_pool(dsn, role='primary'):
+    """Retorna o pool deste processo para o DSN, criando-o na primeira chamada.
+
+    O pool é indexado pelo PID: depois de um fork (gunicorn), o worker cria o
+    seu próprio pool em vez de herdar sockets do processo pai.
+    """
+    key = (os.getpid(), dsn)
+    pool = _pg_pools.get(key)
+    if pool is None:
+        with _pg_pools_lock:
+            pool = _pg_pools.get(key)
+            if pool is None:
+                pool = PgConnectionPool(dsn, role=role)
+                _pg_pools[key] = pool
+                print(f"DEBUG DB: Pool PostgreSQL '{role}' criado (pid {pool.pid}, min={pool.minconn}, max={pool.maxconn}).")
+    return pool
+
+
+# ────────────────────────────────────────────────────────────────────
+# SQLite: uma conexão persistente por thread
+# ────────────────────────────────────────────────────────────────────
+class ContextCursor(sqlite3.Cursor):
+    """
+    Cursor SQLite que aceita `with conn.cursor() as cur:` como no psycopg2 e
+    registra cada execução em database/query_stats.py.
+    """
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record(sql, parameters, time.perf_counter() - started, self.rowcount)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record(sql, None, time.perf_counter() - started, self.rowcount)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class PersistentSQLiteConnection(sqlite3.Connection):
+    """
+    Conexão SQLite reutilizada pela thread; `close()` não fecha o arquivo.
+
+    Checkouts aninhados na mesma thread (uma função que abre conexão chamada
+    dentro de outra que já tem uma aberta) recebem o MESMO objeto e, portanto,
+    a mesma transação: o `close()` interno não faz rollback enquanto o externo
+    estiver aberto, e um `commit()` interno grava também o que o externo já
+    fez. Isso é intencional: uma segunda conexão de escrita na mesma thread
+    ficaria esperando o lock que a primeira segura (até o busy timeout). Quem
+    precisa de uma transação independente deve rodá-la fora do checkout
+    externo.
+    """
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or ContextCursor)
+
+    def close(self):
+        self._checkouts = max(0, getattr(self, '_checkouts', 0) - 1)
+        if self._checkouts == 0 and self.in_transaction:
+            # Mesmo comportamento de fechar sem commit: descarta a transação.
+            self.rollback()
+
+    def close_physical(self):
+        super().close()
+
+
+_sqlite_local = threading.local()
+_sqlite_stats_lock = threading.Lock()
+_sqlite_stats = {'connections_opened': 0, 'readonly_connections_opened': 0, 'checkouts': 0}
+
+
+def _tune_sqlite(conn, readonly):
+    """PRAGMAs do modo de produção do SQLite."""
+    if not readonly:
+        # WAL é persistente no arquivo; basta a primeira conexão de escrita ativá-lo.
+        conn.execute("PRAGMA journal_mode=WAL")
+    # Em WAL, NORMAL só faz fsync no checkpoint: seguro contra corrupção, bem mais rápido que FULL.
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")  # negativo = KiB
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    if readonly:
+        conn.execute("PRAGMA query_only=ON")
+
+
+def get_sqlite_connection(db_path, readonly=False):
+    """
+    Retorna a conexão SQLite persistente da thread atual para `db_path`.
+
+    Com `readonly=True` retorna uma conexão separada com `query_only`, usada
+    pelas páginas do painel que só leem.
+    """
+    conns = getattr(_sqlite_local, 'conns', None)
+    if conns is None or getattr(_sqlite_local, 'pid', None) != os.getpid():
+        conns = _sqlite_local.conns = {}
+        _sqlite_local.pid = os.getpid()
+
+    key = (db_path, bool(readonly))
+    conn = conns.get(key)
+    if conn is None:
+        conn = sqlite3.connect(
+            db_path,
+            factory=PersistentSQLiteConnection,
+            cached_statements=SQLITE_CACHED_STATEMENTS,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+        )
+        conn.row_factory = sqlite3.Row
+        _tune_sqlite(conn, readonly)
+        conn.readonly = bool(readonly)
+        conn._checkouts = 0
+        conns[key] = conn
+        with _sqlite_stats_lock:
+            _sqlite_stats['readonly_connections_opened' if readonly else 'connections_opened'] += 1
+
+    conn._checkouts += 1
+    with _sqlite_stats_lock:
+        _sqlite_stats['checkouts'] += 1
+    return conn
+
+
+def pool_stats():
+    """Estatísticas dos pools deste processo (em uso, ociosas, tempo de espera)."""
+    pid = os.getpid()
+    stats = [pool.stats() for (pool_pid, _), pool in list(_pg_pools.items()) if pool_pid == pid]
+    with _sqlite_stats_lock:
+        if _sqlite_stats['connections_opened'] or _sqlite_stats['readonly_connections_opened']:
+            stats.append(dict(_sqlite_stats, backend='sqlite', pid=pid))
+    return stats
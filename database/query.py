@@ -0,0 +1,235 @@
+# database/query.py
+"""
+Camada de consultas neutra em relação ao dialeto (PostgreSQL / SQLite).
+
+As instruções são escritas uma única vez no estilo do psycopg2 (`%s` para
+parâmetros, `%%` para um `%` literal) e podem usar as macros abaixo, que são
+traduzidas para cada banco:
+
+    {now}    NOW()              | DATETIME('now')
+    {true}   TRUE               | 1
+    {false}  FALSE              | 0
+    {like}   ILIKE              | LIKE      (LIKE do SQLite já ignora caixa)
+    {seconds_since:col}   segundos decorridos desde o timestamp `col`
+    {in_list:col}         `col` pertence à lista passada num único `%s`
+                          (= ANY(array) | IN (SELECT value FROM json_each(json)))
+
+Cada instrução é compilada uma vez por dialeto e o SQL resultante fica em
+cache, então os handlers não fazem mais `replace('%s', '?')` nem mantêm duas
+versões da mesma consulta. Para os raros casos que não cabem nas macros, use
+`Query(sql, sqlite=..., postgres=...)` com o texto específico de cada banco.
+
+Consultas muito frequentes podem receber `prepare='nome'`: no PostgreSQL elas
+são preparadas (PREPARE) uma vez por conexão do pool e depois executadas pelo
+nome (EXECUTE), sem re-parse nem re-planejamento. No SQLite o próprio cache de
+statements da conexão persistente da thread cumpre esse papel.
+"""
+import json
+import re
+import sqlite3
+from functools import lru_cache
+
+SQLITE = 'sqlite'
+POSTGRES = 'postgres'
+
+_MACROS = {
+    POSTGRES: {'now': 'NOW()', 'true': 'TRUE', 'false': 'FALSE', 'like': 'ILIKE'},
+    SQLITE: {'now': "DATETIME('now')", 'true': '1', 'false': '0', 'like': 'LIKE'},
+}
+_PARAMETRIC_MACROS = {
+    POSTGRES: {
+        'seconds_since': "EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC' - {0}))",
+        'in_list': "{0} = ANY(%s)",
+    },
+    SQLITE: {
+        'seconds_since': "(strftime('%%s', 'now') - strftime('%%s', {0}))",
+        'in_list': "{0} IN (SELECT value FROM json_each(%s))",
+    },
+}
+_MACRO_RE = re.compile(r'\{(now|true|false|like)\}|\{(seconds_since|in_list):([\w.]+)\}')
+_PARAM_RE = re.compile(r'%(%|s)')
+_PREPARED_NAME_RE = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+
+def dialect_of(conn_or_cursor):
+    """Retorna 'sqlite' ou 'postgres' para uma conexão ou cursor."""
+    if isinstance(conn_or_cursor, (sqlite3.Connection, sqlite3.Cursor)):
+        return SQLITE
+    return POSTGRES
+
+
+def _compile(text, dialect):
+    """Traduz uma instrução lógica para o dialeto; retorna (sql, n_parametros)."""
+    macros = _MACROS[dialect]
+    parametric = _PARAMETRIC_MACROS[dialect]
+
+    def expand(m):
+        if m.group(1):
+            return macros[m.group(1)]
+        return parametric[m.group(2)].format(m.group(3))
+
+    sql = _MACRO_RE.sub(expand, text)
+    n_params = len([m for m in _PARAM_RE.finditer(sql) if m.group(1) == 's'])
+    if dialect == SQLITE:
+        sql = _PARAM_RE.sub(lambda m: '%' if m.group(1) == '%' else '?', sql)
+    elif n_params == 0:
+        # Sem parâmetros o psycopg2 não interpreta '%%', então já entregamos o '%' literal.
+        sql = sql.replace('%%', '%')
+    return sql, n_params
+
+
+class Query:
+    """Instrução SQL lógica, compilada sob demanda e guardada por dialeto."""
+
+    __slots__ = ('text', 'prepare', '_overrides', '_compiled')
+
+    def __init__(self, text, sqlite=None, postgres=None, prepare=None):
+        if prepare is not None and not _PREPARED_NAME_RE.match(prepare):
+            raise ValueError(f"Nome de prepared statement inválido: {prepare!r}")
+        self.text = text
+        self.prepare = prepare
+        self._overrides = {SQLITE: sqlite, POSTGRES: postgres}
+        self._compiled = {}
+
+    def compiled(self, dialect):
+        """Retorna (sql, n_parametros) para o dialeto, compilando na primeira vez."""
+        compiled = self._compiled.get(dialect)
+        if compiled is None:
+            compiled = _compile(self._overrides[dialect] or self.text, dialect)
+            self._compiled[dialect] = compiled
+        return compiled
+
+    def sql(self, dialect):
+        return self.compiled(dialect)[0]
+
+    def returning(self, dialect, pk):
+        """Versão `INSERT ... RETURNING <pk>` (PostgreSQL), também guardada em cache."""
+        key = (dialect, 'returning', pk)
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            sql, n_params = self.compiled(dialect)
+            compiled = (f"{sql.rstrip().rstrip(';')} RETURNING {pk}", n_params)
+            self._compiled[key] = compiled
+        return compiled
+
+    def prepared(self):
+        """Retorna (sql_prepare, sql_execute, n_parametros) para o PostgreSQL."""
+        key = (POSTGRES, 'prepared')
+        compiled = self._compiled.get(key)
+        if compiled is None:
+            sql, n_params = self.compiled(POSTGRES)
+            counter = iter(range(1, n_params + 1))
+            body = _PARAM_RE.sub(lambda m: '%' if m.group(1) == '%' else f"${next(counter)}", sql)
+            prepare_sql = f"PREPARE {self.prepare} AS {body.strip().rstrip(';')}"
+            if n_params:
+                execute_sql = f"EXECUTE {self.prepare} ({', '.join(['%s'] * n_params)})"
+            else:
+                execute_sql = f"EXECUTE {self.prepare}"
+            compiled = (prepare_sql, execute_sql, n_params)
+            self._compiled[key] = compiled
+        return compiled
+
+    def __repr__(self):
+        return f"Query({' '.join(self.text.split())[:60]!r})"
+
+
+@lru_cache(maxsize=512)
+def _query_for_text(text):
+    return Query(text)
+
+
+def as_query(query):
+    """Aceita um `Query` ou uma string (que ganha um `Query` em cache)."""
+    return query if isinstance(query, Query) else _query_for_text(query)
+
+
+def _execute_prepared(cur, q, params, prepared_names):
+    prepare_sql, execute_sql, n_params = q.prepared()
+    if q.prepare not in prepared_names:
+        cur.execute(prepare_sql)
+        prepared_names.add(q.prepare)
+    if n_params:
+        cur.execute(execute_sql, tuple(params))
+    else:
+        cur.execute(execute_sql)
+    return cur
+
+
+def execute(cur, query, params=None):
+    """Executa a instrução lógica no cursor, no dialeto da conexão dele."""
+    q = as_query(query)
+    dialect = dialect_of(cur)
+    if q.prepare and dialect == POSTGRES:
+        # Só conexões do pool guardam quais statements já foram preparados nelas.
+        prepared_names = getattr(cur.connection, 'prepared_statements', None)
+        if prepared_names is not None:
+            return _execute_prepared(cur, q, params, prepared_names)
+    sql, n_params = q.compiled(dialect)
+    if n_params:
+        if dialect == SQLITE:
+            # Listas (usadas com {in_list:col}) viram JSON; o psycopg2 já as envia como array.
+            params = [json.dumps(p) if isinstance(p, list) else p for p in params]
+        cur.execute(sql, tuple(params))
+    else:
+        cur.execute(sql)
+    return cur
+
+
+def fetch_one(cur, query, params=None):
+    return execute(cur, query, params).fetchone()
+
+
+def fetch_all(cur, query, params=None):
+    return execute(cur, query, params).fetchall()
+
+
+def fetch_value(cur, query, params=None, default=None):
+    """Primeira coluna da primeira linha (funciona com linhas dict ou tupla)."""
+    row = fetch_one(cur, query, params)
+    if row is None:
+        return default
+    value = row[next(iter(row.keys()))] if hasattr(row, 'keys') else row[0]
+    return default if value is None else value
+
+
+def streaming_cursor(conn, name):
+    """
+    Cursor para percorrer resultados grandes sem trazê-los inteiros para a
+    memória: no PostgreSQL um cursor nomeado (server-side, exige transação
+    aberta, que o pool já usa); no SQLite um cursor comum, lido com fetchmany.
+    """
+    if dialect_of(conn) == POSTGRES:
+        return conn.cursor(name=name)
+    return conn.cursor()
+
+
+def fetch_chunks(cur, query, params=None, size=1000):
+    """Executa a consulta e gera as linhas em listas de até `size` (use com streaming_cursor)."""
+    execute(cur, query, params)
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        yield rows
+
+
+def insert_returning_id(cur, query, params=None, pk='id'):
+    """
+    Executa um INSERT e retorna a chave primária gerada.
+
+    PostgreSQL usa `RETURNING <pk>`; SQLite usa `cursor.lastrowid`.
+    """
+    q = as_query(query)
+    dialect = dialect_of(cur)
+    if dialect == SQLITE:
+        execute(cur, q, params)
+        return cur.lastrowid
+    sql, n_params = q.returning(dialect, pk)
+    if n_params:
+        cur.execute(sql, tuple(params))
+    else:
+        cur.execute(sql)
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return row[pk] if hasattr(row, 'keys') else row[0]
@@ -0,0 +1,134 @@
+# database/query_stats.py
+"""
+Estatísticas por instrução SQL e log de consultas lentas.
+
+Os cursores do pool (database/pool.py) chamam `record()` a cada execute:
+a duração, o número de linhas e o local da chamada (primeiro frame fora de
+database/) são agregados por instrução normalizada, ou seja, com literais e
+parâmetros trocados por `?`. Execuções acima de SLOW_QUERY_MS vão para o log
+junto com o formato dos parâmetros (tipos, nunca os valores).
+
+`top_statements()` alimenta o endpoint /api/query_stats do painel.
+"""
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from functools import lru_cache
+
+# Execuções acima deste tempo (ms) são logadas como lentas.
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '500'))
+# QUERY_STATS=0 desliga a coleta (o log de lentas continua).
+QUERY_STATS_ENABLED = os.getenv('QUERY_STATS', '1') == '1'
+# Limite de instruções distintas guardadas; as excedentes entram em OVERFLOW_KEY.
+MAX_STATEMENTS = int(os.getenv('QUERY_STATS_MAX_STATEMENTS', '500'))
+OVERFLOW_KEY = '<outras instruções>'
+
+_DATABASE_DIR = os.path.dirname(os.path.abspath(__file__))
+_PROJECT_DIR = os.path.dirname(_DATABASE_DIR)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'(?<![\w$])-?\d+(?:\.\d+)?\b')
+_PARAM_RE = re.compile(r'%s|\?|\$\d+|%\(\w+\)s')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+_lock = threading.Lock()
+_stats = {}
+
+
+@lru_cache(maxsize=2048)
+def normalize(sql):
+    """Forma canônica da instrução: literais e parâmetros viram `?`, espaços colapsados."""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PARAM_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(?, ...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip().rstrip(';')
+
+
+def params_shape(params):
+    """Tipos dos parâmetros, ex.: '(int, str, datetime)' (os valores não são logados)."""
+    if params is None:
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f"{k}: {type(v).__name__}" for k, v in params.items()) + '}'
+    try:
+        return '(' + ', '.join(type(v).__name__ for v in params) + ')'
+    except TypeError:
+        return type(params).__name__
+
+
+def call_site():
+    """Primeiro frame da pilha fora de database/ e das bibliotecas: 'app.py:123 (index)'."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not filename.startswith(_DATABASE_DIR) and filename.startswith(_PROJECT_DIR) \
+                and 'site-packages' not in filename:
+            return f"{os.path.relpath(filename, _PROJECT_DIR)}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return '<desconhecido>'
+
+
+def record(sql, params, elapsed, rowcount):
+    """Registra uma execução (elapsed em segundos; rowcount < 0 = desconhecido)."""
+    elapsed_ms = elapsed * 1000
+    slow = elapsed_ms >= SLOW_QUERY_MS
+    if not QUERY_STATS_ENABLED and not slow:
+        return
+
+    statement = normalize(sql if isinstance(sql, (str, bytes)) else str(sql))
+    site = call_site()
+    if slow:
+        print(f"AVISO SLOW QUERY: {elapsed_ms:.1f} ms em {site}: {statement[:500]} "
+              f"params={params_shape(params)} linhas={rowcount if rowcount >= 0 else '?'}")
+    if not QUERY_STATS_ENABLED:
+        return
+
+    with _lock:
+        entry = _stats.get(statement)
+        if entry is None:
+            if len(_stats) >= MAX_STATEMENTS:
+                statement = OVERFLOW_KEY
+                entry = _stats.get(statement)
+            if entry is None:
+                entry = _stats[statement] = {
+                    'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'slow_calls': 0, 'call_sites': Counter(),
+                }
+        entry['calls'] += 1
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+        if rowcount > 0:
+            entry['rows'] += rowcount
+        if slow:
+            entry['slow_calls'] += 1
+        entry['call_sites'][site] += 1
+
+
+def top_statements(n=20, order_by='total_ms'):
+    """As `n` instruções com maior `order_by` (total_ms, max_ms, avg_ms ou calls)."""
+    with _lock:
+        items = [
+            {
+                'statement': statement,
+                'calls': entry['calls'],
+                'total_ms': round(entry['total_ms'], 3),
+                'avg_ms': round(entry['total_ms'] / entry['calls'], 3),
+                'max_ms': round(entry['max_ms'], 3),
+                'rows': entry['rows'],
+                'slow_calls': entry['slow_calls'],
+                'call_sites': dict(entry['call_sites'].most_common(5)),
+            }
+            for statement, entry in _stats.items()
+        ]
+    items.sort(key=lambda item: item[order_by], reverse=True)
+    return items[:n]
+
+
+def reset():
+    with _lock:
+        _stats.clear()
@@ -0,0 +1,121 @@
+# database/rollup.py
+"""
+Agregado diário das vendas aprovadas: `sales_daily_rollup` (dia, produto_id,
+quantidade, receita), criado pela migração 0009.
+
+O painel (index() e /api/sales_data) lê só esta tabela, que tem no máximo
+uma linha por produto por dia, em vez de somar `vendas` a cada acesso.
+
+- `record_approved_sale()` é chamada pelo webhook do Mercado Pago no mesmo
+  cursor/transação do UPDATE que muda a venda para 'aprovado': ou as duas
+  gravações entram, ou nenhuma.
+- `rebuild()` recalcula a tabela inteira a partir de `vendas` (backfill, ou
+  depois de alterar vendas por fora do webhook, ex.: database/migrate_db.py).
+
+`data_version()` dá a versão do agregado num período, usada pelo
+/api/sales_data como ETag para responder 304 sem refazer as somas: o número
+de linhas e a soma das quantidades do período (cada venda somada aumenta a
+soma) mais o contador `config['rollup_versao']`, que só o `rebuild()`
+incrementa. O webhook não grava nada além da própria linha do agregado, então
+aprovações simultâneas não disputam uma linha de contador até o commit; e,
+por ler só dados já gravados, a versão muda junto com o que o leitor enxerga.
+
+    python -m database.rollup rebuild
+"""
+import sys
+
+from .query import Query, dialect_of, execute, fetch_one, fetch_value, SQLITE
+
+# O dia é o DATE(data_venda) da própria venda, o mesmo critério do rebuild.
+_REGISTRAR_VENDA = Query("""
+    INSERT INTO sales_daily_rollup (dia, produto_id, quantidade, receita)
+    SELECT DATE(data_venda), produto_id, 1, COALESCE(preco, 0)
+    FROM vendas
+    WHERE id = %s AND status = 'aprovado'
+    ON CONFLICT (dia, produto_id) DO UPDATE SET
+        quantidade = sales_daily_rollup.quantidade + excluded.quantidade,
+        receita = sales_daily_rollup.receita + excluded.receita
+""", prepare='rollup_registrar_venda')
+
+_LIMPAR = Query("DELETE FROM sales_daily_rollup")
+_RECALCULAR = Query("""
+    INSERT INTO sales_daily_rollup (dia, produto_id, quantidade, receita)
+    SELECT DATE(data_venda), produto_id, COUNT(*), COALESCE(SUM(preco), 0)
+    FROM vendas
+    WHERE status = 'aprovado'
+    GROUP BY DATE(data_venda), produto_id
+""")
+_CONTAR = Query("SELECT COUNT(*) FROM sales_daily_rollup")
+
+# Incrementado só pelo rebuild(): o recálculo pode manter as quantidades e mudar a receita.
+VERSION_KEY = 'rollup_versao'
+_INCREMENTAR_VERSAO = Query("""
+    INSERT INTO config (key, value) VALUES (%s, '1')
+    ON CONFLICT (key) DO UPDATE SET value = CAST(CAST(config.value AS INTEGER) + 1 AS TEXT)
+""")
+_VERSAO = Query("SELECT value FROM config WHERE key = %s")
+_RESUMO_PERIODO = Query("""
+    SELECT COUNT(*) AS linhas, COALESCE(SUM(quantidade), 0) AS vendas
+    FROM sales_daily_rollup
+    WHERE dia >= %s AND dia <= %s
+""")
+
+
+def _bump_version(cur):
+    execute(cur, _INCREMENTAR_VERSAO, (VERSION_KEY,))
+
+
+def data_version(cur, start_date, end_date):
+    """Versão do agregado de `start_date` a `end_date`: muda a cada venda somada nele e a cada rebuild."""
+    rebuilds = fetch_value(cur, _VERSAO, (VERSION_KEY,), default='0')
+    resumo = fetch_one(cur, _RESUMO_PERIODO, (start_date.isoformat(), end_date.isoformat()))
+    return f"{rebuilds}.{resumo['linhas']}.{resumo['vendas']}"
+
+
+def record_approved_sale(cur, venda_id):
+    """
+    Soma a venda `venda_id` (já 'aprovado') no agregado do seu dia/produto.
+    Deve ser chamada uma única vez por venda, na transação que a aprovou; quem
+    chama garante isso (o webhook só chama quando o UPDATE mudou a linha).
+    """
+    execute(cur, _REGISTRAR_VENDA, (venda_id,))
+    return cur.rowcount
+
+
+def rebuild(conn):
+    """Recalcula `sales_daily_rollup` a partir de `vendas` (commit incluso). Retorna o nº de linhas."""
+    if dialect_of(conn) == SQLITE and not conn.in_transaction:
+        conn.execute("BEGIN")
+    cur = conn.cursor()
+    try:
+        if dialect_of(conn) != SQLITE:
+            # Impede que um webhook some uma venda entre o DELETE e o INSERT.
+            cur.execute("LOCK TABLE sales_daily_rollup IN EXCLUSIVE MODE")
+        execute(cur, _LIMPAR)
+        execute(cur, _RECALCULAR)
+        _bump_version(cur)
+        total = int(fetch_value(cur, _CONTAR, default=0))
+        conn.commit()
+        return total
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+if __name__ == '__main__':
+    from .database import get_db_connection
+
+    args = sys.argv[1:]
+    if args != ['rebuild']:
+        print(__doc__)
+        sys.exit(2)
+    conn = get_db_connection()
+    if conn is None:
+        print("ERRO: Não foi possível conectar ao banco de dados.")
+        sys.exit(1)
+    try:
+        print(f"sales_daily_rollup recalculada: {rebuild(conn)} linha(s).")
+    finally:
+        conn.close()
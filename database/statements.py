@@ -0,0 +1,37 @@
+# database/statements.py
+"""
+Consultas quentes do bot: rodam em praticamente todo update do Telegram.
+
+Todas usam `prepare=...`, então no PostgreSQL são preparadas uma única vez em
+cada conexão do pool e depois executadas pelo nome (ver database/query.py).
+"""
+from .query import Query
+
+# get_or_register_user (/start e callbacks)
+# Registra o usuário ou o reativa, numa única ida ao banco. O WHERE evita
+# reescrever a linha de quem já está ativo (rowcount 0 nesse caso).
+REGISTRAR_USUARIO = Query(
+    """
+    INSERT INTO users (id, username, first_name, last_name, is_active) VALUES (%s, %s, %s, %s, {true})
+    ON CONFLICT (id) DO UPDATE SET is_active = {true} WHERE users.is_active = {false}
+    """,
+    prepare='bot_registrar_usuario'
+)
+
+# send_welcome / boas-vindas das comunidades
+CONFIG_POR_CHAVE = Query(
+    "SELECT value FROM config WHERE key = %s",
+    prepare='bot_config_por_chave'
+)
+
+# generar_cobranca
+PRODUTO_POR_ID = Query(
+    "SELECT id, nome, preco, link FROM produtos WHERE id = %s",
+    prepare='bot_produto_por_id'
+)
+
+# handle_new_chat_members (vigia de links de convite)
+ACESSO_POR_CONVITE = Query(
+    "SELECT user_id FROM user_access WHERE invite_link_used = %s",
+    prepare='bot_acesso_por_convite'
+)
@@ -0,0 +1,135 @@
+"""
+Microbenchmark das consultas quentes do bot (database/statements.py).
+
+Simula o trabalho de banco de um update típico do Telegram (/start +
+compra + vigia de convite) e compara a execução "texto puro" com a execução
+por prepared statement.
+
+- Com DATABASE_URL: usa tabelas TEMPORÁRIAS na sessão (não toca nos dados reais)
+  e compara `cur.execute(sql)` com PREPARE/EXECUTE.
+- Sem DATABASE_URL: usa um SQLite temporário e compara uma conexão sem cache de
+  statements (`cached_statements=0`) com a conexão persistente do pool.
+
+Uso: python scripts/bench_prepared_statements.py [iteracoes]
+"""
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import statements
+from database.query import execute, POSTGRES, SQLITE
+
+SCHEMA = [
+    "CREATE {temp} TABLE users (id BIGINT PRIMARY KEY, username TEXT, first_name TEXT, last_name TEXT, is_active BOOLEAN)",
+    "CREATE {temp} TABLE config (key TEXT PRIMARY KEY, value TEXT)",
+    "CREATE {temp} TABLE produtos (id INTEGER PRIMARY KEY, nome TEXT, preco NUMERIC(10, 2), link TEXT)",
+    "CREATE {temp} TABLE user_access (id INTEGER PRIMARY KEY, user_id BIGINT, invite_link_used TEXT)",
+]
+N_USERS = 2000
+
+
+def _seed(conn, temp):
+    cur = conn.cursor()
+    for ddl in SCHEMA:
+        cur.execute(ddl.format(temp=temp))
+    for i in range(1, N_USERS + 1):
+        execute(cur, "INSERT INTO users (id, username, first_name, last_name, is_active) VALUES (%s, %s, %s, %s, %s)",
+                (i, f"user{i}", f"Nome {i}", None, True))
+        execute(cur, "INSERT INTO user_access (id, user_id, invite_link_used) VALUES (%s, %s, %s)",
+                (i, i, f"https://t.me/+convite{i}"))
+    for i in range(1, 21):
+        execute(cur, "INSERT INTO produtos (id, nome, preco, link) VALUES (%s, %s, %s, %s)",
+                (i, f"Produto {i}", 9.90 + i, f"https://exemplo/{i}"))
+    execute(cur, "INSERT INTO config (key, value) VALUES (%s, %s)", ('welcome_message_bot', 'Olá, {first_name}!'))
+    conn.commit()
+
+
+def _update_workload(cur, run, i):
+    """As 4 consultas quentes de um update: usuário, boas-vindas, produto e convite."""
+    user_id = (i % N_USERS) + 1
+    run(cur, statements.REGISTRAR_USUARIO, (user_id, f"user{user_id}", f"Nome {user_id}", None))
+    run(cur, statements.CONFIG_POR_CHAVE, ('welcome_message_bot',))
+    run(cur, statements.PRODUTO_POR_ID, ((i % 20) + 1,))
+    run(cur, statements.ACESSO_POR_CONVITE, (f"https://t.me/+convite{user_id}",))
+
+
+def _timed(conn, run, iterations):
+    cur = conn.cursor()
+    for i in range(min(200, iterations)):  # aquecimento
+        _update_workload(cur, run, i)
+    conn.rollback()
+    started = time.perf_counter()
+    for i in range(iterations):
+        _update_workload(cur, run, i)
+    elapsed = time.perf_counter() - started
+    conn.rollback()
+    return elapsed / iterations * 1e6  # µs por update
+
+
+def _run_plain(dialect):
+    def run(cur, query, params):
+        cur.execute(query.sql(dialect), params)
+        if cur.description:
+            cur.fetchall()
+    return run
+
+
+def _run_prepared(cur, query, params):
+    execute(cur, query, params)
+    if cur.description:
+        cur.fetchall()
+
+
+def _report(label_a, us_a, label_b, us_b):
+    print(f"{label_a:<40} {us_a:10.1f} µs/update")
+    print(f"{label_b:<40} {us_b:10.1f} µs/update")
+    print(f"{'Economia por update':<40} {us_a - us_b:10.1f} µs ({(us_a - us_b) / us_a * 100:.1f}%)")
+
+
+def bench_postgres(database_url, iterations):
+    from database.pool import PgConnectionPool
+
+    pool = PgConnectionPool(database_url, minconn=1, maxconn=1)
+    conn = pool.getconn()
+    try:
+        _seed(conn, 'TEMPORARY')
+        plain = _timed(conn, _run_plain(POSTGRES), iterations)
+        prepared = _timed(conn, _run_prepared, iterations)
+        print(f"PostgreSQL, {iterations} updates (4 consultas cada):")
+        _report("Texto puro (parse + plan a cada vez)", plain, "Prepared statements (EXECUTE)", prepared)
+    finally:
+        conn.close_physical()
+
+
+def bench_sqlite(iterations):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        seed_conn = sqlite3.connect(path)
+        _seed(seed_conn, '')
+        seed_conn.close()
+
+        from database.pool import get_sqlite_connection, PersistentSQLiteConnection
+        # Mesma classe de conexão (e de cursor instrumentado) dos dois lados: só o cache de statements muda.
+        uncached = sqlite3.connect(path, cached_statements=0, factory=PersistentSQLiteConnection)
+        cached = get_sqlite_connection(path)
+        try:
+            plain = _timed(uncached, _run_plain(SQLITE), iterations)
+            prepared = _timed(cached, _run_prepared, iterations)
+        finally:
+            uncached.close_physical()
+            cached.close_physical()
+        print(f"SQLite, {iterations} updates (4 consultas cada):")
+        _report("Sem cache de statements", plain, "Conexão persistente (statement cache)", prepared)
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    database_url = os.getenv('DATABASE_URL')
+    if database_url:
+        bench_postgres(database_url, iterations)
+    else:
+        bench_sqlite(iterations)
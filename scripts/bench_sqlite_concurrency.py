@@ -0,0 +1,129 @@
+"""
+Benchmark de concorrência do SQLite: leituras do painel x escritas do bot.
+
+Simula o cenário de produção sem DATABASE_URL: uma thread escrevendo vendas
+(webhook/worker) enquanto outras threads leem as métricas do dashboard, e
+compara:
+
+- Antes: conexão nova a cada operação, journal padrão (DELETE), sem ajustes.
+- Depois: conexões persistentes por thread do pool (database/pool.py), em WAL,
+  synchronous=NORMAL, busy timeout, cache e mmap; leitores em modo somente leitura.
+
+Uso: python scripts/bench_sqlite_concurrency.py [segundos] [leitores]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.pool import get_sqlite_connection
+
+SCHEMA = """
+    CREATE TABLE vendas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        produto_id INTEGER NOT NULL,
+        preco REAL NOT NULL,
+        status TEXT NOT NULL,
+        data_venda DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX idx_vendas_status_data ON vendas (status, data_venda);
+"""
+N_SEED = 20000
+READ_SQL = "SELECT COUNT(id), SUM(preco) FROM vendas WHERE status = 'aprovado' AND data_venda >= DATETIME('now', '-30 days')"
+WRITE_SQL = "INSERT INTO vendas (user_id, produto_id, preco, status) VALUES (?, ?, ?, 'aprovado')"
+
+
+def _seed(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany(
+        "INSERT INTO vendas (user_id, produto_id, preco, status, data_venda) "
+        "VALUES (?, ?, ?, ?, DATETIME('now', ?))",
+        [(i, i % 20, 9.9, 'aprovado' if i % 3 else 'pendente', f'-{i % 60} days') for i in range(N_SEED)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def _run(duration, readers, open_writer, open_reader, release):
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def writer():
+        i = 0
+        while time.monotonic() < stop:
+            conn = open_writer()
+            try:
+                conn.execute(WRITE_SQL, (i, i % 20, 19.9))
+                conn.commit()
+                done = 'writes'
+            except sqlite3.OperationalError:
+                conn.rollback()
+                done = 'errors'
+            finally:
+                release(conn)
+            with lock:
+                counts[done] += 1
+            i += 1
+
+    def reader():
+        while time.monotonic() < stop:
+            conn = open_reader()
+            try:
+                conn.execute(READ_SQL).fetchone()
+                done = 'reads'
+            except sqlite3.OperationalError:
+                done = 'errors'
+            finally:
+                release(conn)
+            with lock:
+                counts[done] += 1
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def _report(label, counts, duration):
+    print(f"{label:<10} leituras/s: {counts['reads'] / duration:9.1f}   "
+          f"escritas/s: {counts['writes'] / duration:8.1f}   erros 'database is locked': {counts['errors']}")
+
+
+def bench(duration, readers):
+    with tempfile.TemporaryDirectory() as tmp:
+        before_path = os.path.join(tmp, 'antes.db')
+        _seed(before_path)
+        before = _run(
+            duration, readers,
+            open_writer=lambda: sqlite3.connect(before_path),
+            open_reader=lambda: sqlite3.connect(before_path),
+            release=lambda conn: conn.close(),
+        )
+
+        after_path = os.path.join(tmp, 'depois.db')
+        _seed(after_path)
+        after = _run(
+            duration, readers,
+            open_writer=lambda: get_sqlite_connection(after_path),
+            open_reader=lambda: get_sqlite_connection(after_path, readonly=True),
+            release=lambda conn: conn.close(),
+        )
+
+    print(f"SQLite, {duration}s, 1 escritor + {readers} leitores:")
+    _report("Antes", before, duration)
+    _report("Depois", after, duration)
+
+
+if __name__ == '__main__':
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    bench(duration, readers)
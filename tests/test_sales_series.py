@@ -0,0 +1,113 @@
+# tests/test_sales_series.py
+"""
+Equivalência de web/services/dashboard.daily_sales_series com o laço antigo
+do index() e do /api/sales_data (uma consulta SUM/COUNT em `vendas` por dia),
+num banco SQLite temporário migrado do zero.
+
+    python -m pytest tests/test_sales_series.py
+"""
+import json
+import random
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from database import rollup
+from database.migrations import upgrade
+from database.pool import get_sqlite_connection
+from database.query import execute, fetch_one, insert_returning_id
+from web.services.dashboard import daily_sales_series
+
+PRECOS = (9.9, 19.9, 29.9, 47.0, 97.9)
+STATUS = ('aprovado', 'aprovado', 'aprovado', 'pendente', 'rejeitado')
+# Vendas de dez/2023 a jan/2025, incluindo os extremos de cada dia.
+PRIMEIRO_DIA = date(2023, 12, 1)
+DIAS = 428
+
+
+def reference_daily_series(cur, start_date, end_date):
+    """O laço por dia que daily_sales_series substituiu."""
+    chart_labels, chart_data_receita, chart_data_quantidade = [], [], []
+    current_day = start_date
+    while current_day <= end_date:
+        chart_labels.append(current_day.strftime('%d/%m'))
+        start_of_day_dt = datetime.combine(current_day, time.min)
+        end_of_day_dt = datetime.combine(current_day, time.max)
+
+        daily_data_row = fetch_one(
+            cur,
+            "SELECT SUM(preco) AS sum, COUNT(id) AS count FROM vendas WHERE status = %s AND data_venda BETWEEN %s AND %s",
+            ('aprovado', start_of_day_dt, end_of_day_dt)
+        )
+        daily_revenue = float(daily_data_row['sum']) if daily_data_row and 'sum' in daily_data_row.keys() and daily_data_row['sum'] is not None else 0
+        daily_quantity = int(daily_data_row['count']) if daily_data_row and 'count' in daily_data_row.keys() and daily_data_row['count'] is not None else 0
+
+        chart_data_receita.append(daily_revenue)
+        chart_data_quantidade.append(daily_quantity)
+        current_day += timedelta(days=1)
+    return chart_labels, chart_data_receita, chart_data_quantidade
+
+
+def as_displayed(series):
+    """
+    A série como o painel a exibe (receita com 2 casas). Somar os mesmos
+    floats em outra ordem pode mudar o último bit, sem mudar o valor em reais.
+    """
+    labels, receita, quantidade = series
+    return json.dumps([labels, [round(valor, 2) for valor in receita], quantidade])
+
+
+@pytest.fixture(scope='module')
+def conn(tmp_path_factory):
+    conn = get_sqlite_connection(str(tmp_path_factory.mktemp('db') / 'vendas.db'))
+    upgrade(conn)
+
+    rng = random.Random(13)
+    with conn:
+        cur = conn.cursor()
+        execute(cur, "INSERT INTO users (id, username, first_name) VALUES (%s, %s, %s)", (1, 'comprador', 'Comprador'))
+        produtos = [
+            insert_returning_id(cur, "INSERT INTO produtos (nome, preco, link) VALUES (%s, %s, %s)",
+                                (f'Produto {preco}', preco, 'https://example.com'))
+            for preco in PRECOS
+        ]
+        for _ in range(3000):
+            dia = PRIMEIRO_DIA + timedelta(days=rng.randrange(DIAS))
+            horario = rng.choice((time.min, time(23, 59, 59), time(rng.randrange(24), rng.randrange(60), rng.randrange(60))))
+            indice = rng.randrange(len(PRECOS))
+            status = rng.choice(STATUS)
+            venda_id = insert_returning_id(
+                cur,
+                "INSERT INTO vendas (user_id, produto_id, preco, status, data_venda) VALUES (%s, %s, %s, %s, %s)",
+                (1, produtos[indice], PRECOS[indice], status, datetime.combine(dia, horario).strftime('%Y-%m-%d %H:%M:%S')),
+            )
+            if status == 'aprovado':
+                # Mesmo caminho do webhook: soma a venda no agregado ao aprová-la.
+                rollup.record_approved_sale(cur, venda_id)
+    yield conn
+    conn.close_physical()
+
+
+@pytest.mark.parametrize('start_date, end_date', [
+    pytest.param(date(2023, 12, 20), date(2024, 1, 10), id='virada-do-ano'),
+    pytest.param(date(2024, 1, 1), date(2024, 12, 31), id='ano-inteiro'),
+    pytest.param(date(2024, 2, 29), date(2024, 2, 29), id='um-dia'),
+    pytest.param(date(2022, 3, 1), date(2022, 3, 31), id='sem-vendas'),
+])
+def test_daily_sales_series_matches_per_day_loop(conn, start_date, end_date):
+    cur = conn.cursor()
+    expected = reference_daily_series(cur, start_date, end_date)
+    actual = daily_sales_series(cur, start_date, end_date)
+
+    assert as_displayed(actual) == as_displayed(expected)
+    assert len(actual[0]) == (end_date - start_date).days + 1
+
+
+def test_rebuild_keeps_the_same_series(conn):
+    last_day = PRIMEIRO_DIA + timedelta(days=DIAS - 1)
+    incremental = daily_sales_series(conn.cursor(), PRIMEIRO_DIA, last_day)
+    rollup.rebuild(conn)
+    rebuilt = daily_sales_series(conn.cursor(), PRIMEIRO_DIA, last_day)
+
+    assert as_displayed(rebuilt) == as_displayed(incremental)
+    assert sum(rebuilt[2]) > 0
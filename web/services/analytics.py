@@ -0,0 +1,203 @@
+# web/services/analytics.py
+"""
+Análise dos compradores para /analytics: coortes por mês da primeira compra,
+curvas de retenção (recompra) e valor por cliente (LTV).
+
+Uma "compra" é uma venda aprovada (`vendas`) ou um passe de acesso concedido
+(`user_access`, pelo preço do passe em `access_passes`). O banco devolve só
+três colunas por compra — user_id, mês (ano * 12 + mês - 1, já calculado no
+SQL) e valor — em lotes de ANALYTICS_LOTE pelo mesmo cursor das exportações
+CSV (server-side no PostgreSQL), e cada lote vira arrays do numpy. As contas
+(primeira compra de cada usuário, usuários distintos por coorte e mês,
+somas) são feitas sobre os arrays inteiros, sem laço por linha no Python.
+
+O resultado vale para o dia: fica em cache no processo até a virada da data.
+"""
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from database.query import Query, fetch_all, fetch_chunks, streaming_cursor, SQLITE, POSTGRES
+
+ANALYTICS_LOTE = int(os.getenv('ANALYTICS_LOTE', '50000'))
+# Coortes exibidas (os últimos N meses, incluindo o atual) e meses de retenção de cada uma.
+ANALYTICS_COORTES = int(os.getenv('ANALYTICS_COORTES', '12'))
+ANALYTICS_TOP_COMPRADORES = int(os.getenv('ANALYTICS_TOP_COMPRADORES', '20'))
+
+_COMPRAS = """
+    SELECT v.user_id, {mes_venda} AS mes, COALESCE(v.preco, 0) AS valor
+    FROM vendas v
+    WHERE v.status = 'aprovado'
+    UNION ALL
+    SELECT ua.user_id, {mes_acesso} AS mes, COALESCE(ap.price, 0) AS valor
+    FROM user_access ua
+    JOIN access_passes ap ON ap.id = ua.pass_id
+"""
+_MES = {
+    POSTGRES: "CAST(EXTRACT(YEAR FROM {0}) * 12 + EXTRACT(MONTH FROM {0}) - 1 AS INTEGER)",
+    SQLITE: "(CAST(strftime('%%Y', {0}) AS INTEGER) * 12 + CAST(strftime('%%m', {0}) AS INTEGER) - 1)",
+}
+_COMPRAS_POR_DIALETO = Query(
+    _COMPRAS.format(mes_venda=_MES[POSTGRES].format('v.data_venda'),
+                    mes_acesso=_MES[POSTGRES].format('ua.start_date')),
+    sqlite=_COMPRAS.format(mes_venda=_MES[SQLITE].format('v.data_venda'),
+                           mes_acesso=_MES[SQLITE].format('ua.start_date')),
+)
+_NOMES = "SELECT id, username, first_name FROM users WHERE {in_list:id}"
+
+_cache_lock = threading.Lock()
+_cache = {'key': None, 'value': None}
+
+
+def _month_index(day):
+    return day.year * 12 + day.month - 1
+
+
+def _month_label(index):
+    return f"{index % 12 + 1:02d}/{index // 12}"
+
+
+def load_purchases(conn):
+    """
+    (user_ids, meses, valores) de todas as compras, como arrays do numpy.
+    Deve rodar dentro de `with conn:` (o cursor server-side exige transação).
+    """
+    users, months, values = [], [], []
+    cur = streaming_cursor(conn, 'analytics_compras')
+    try:
+        for rows in fetch_chunks(cur, _COMPRAS_POR_DIALETO, None, ANALYTICS_LOTE):
+            n = len(rows)
+            users.append(np.fromiter((row['user_id'] for row in rows), dtype=np.int64, count=n))
+            months.append(np.fromiter((row['mes'] for row in rows), dtype=np.int64, count=n))
+            values.append(np.fromiter((row['valor'] for row in rows), dtype=np.float64, count=n))
+    finally:
+        cur.close()
+    if not users:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64)
+    return np.concatenate(users), np.concatenate(months), np.concatenate(values)
+
+
+def cohort_table(inverse, first_month, months, values, current_month, n_cohorts):
+    """
+    Coortes dos últimos `n_cohorts` meses até `current_month`. Para cada uma:
+    tamanho, % dos compradores que compraram de novo em cada mês desde a
+    primeira compra e LTV médio acumulado. Meses que ainda não aconteceram
+    ficam como None. Retorna (coortes, retencao_media_por_mes).
+    """
+    span = n_cohorts
+    base = current_month - (span - 1)
+    sale_cohort = first_month[inverse] - base
+    age = months - first_month[inverse]
+    mask = (sale_cohort >= 0) & (months <= current_month)
+
+    # Cada par (usuário, mês com compra) conta uma vez, por mais compras que tenha no mês.
+    user_months = np.unique(inverse[mask] * span + age[mask])
+    active_user, active_age = np.divmod(user_months, span)
+    active = np.bincount(
+        (first_month[active_user] - base) * span + active_age, minlength=span * span
+    ).reshape(span, span)
+    revenue = np.bincount(
+        sale_cohort[mask] * span + age[mask], weights=values[mask], minlength=span * span
+    ).reshape(span, span)
+
+    user_cohort = first_month - base
+    sizes = np.bincount(user_cohort[(user_cohort >= 0) & (user_cohort < span)], minlength=span)
+    # Coorte c tem meses 0..(span - 1 - c) já decorridos.
+    elapsed = np.arange(span)[None, :] <= (span - 1 - np.arange(span))[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        retention = np.where(elapsed, active / sizes[:, None] * 100, np.nan)
+        ltv = np.where(elapsed, np.cumsum(revenue, axis=1) / sizes[:, None], np.nan)
+        average = (active * elapsed).sum(axis=0) / (sizes[:, None] * elapsed).sum(axis=0) * 100
+
+    def as_list(row):
+        return [None if np.isnan(value) else round(float(value), 2) for value in row]
+
+    cohorts = [
+        {
+            'mes': _month_label(base + c),
+            'tamanho': int(sizes[c]),
+            'retencao': as_list(retention[c]) if sizes[c] else [None] * span,
+            'ltv': as_list(ltv[c]) if sizes[c] else [None] * span,
+        }
+        for c in range(span)
+    ]
+    return cohorts, as_list(average)
+
+
+def buyer_analytics(cur, user_ids, months, values, today,
+                    n_cohorts=ANALYTICS_COORTES, top_n=ANALYTICS_TOP_COMPRADORES):
+    """Resumo, coortes, retenção média e maiores compradores a partir dos arrays de compras."""
+    result = {
+        'resumo': {'compradores': 0, 'compras': 0, 'receita': 0.0, 'ltv_medio': 0.0,
+                   'ltv_mediano': 0.0, 'ltv_p90': 0.0, 'taxa_recompra': 0.0},
+        'coortes': [], 'retencao_media': [], 'top_compradores': [],
+        'meses': list(range(n_cohorts)), 'gerado_em': datetime.now(),
+    }
+    if user_ids.size == 0:
+        return result
+
+    buyers, inverse = np.unique(user_ids, return_inverse=True)
+    first_month = np.full(buyers.size, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(first_month, inverse, months)
+    orders = np.bincount(inverse, minlength=buyers.size)
+    ltv = np.bincount(inverse, weights=values, minlength=buyers.size)
+
+    result['resumo'] = {
+        'compradores': int(buyers.size),
+        'compras': int(user_ids.size),
+        'receita': float(values.sum()),
+        'ltv_medio': float(ltv.mean()),
+        'ltv_mediano': float(np.median(ltv)),
+        'ltv_p90': float(np.percentile(ltv, 90)),
+        'taxa_recompra': float((orders > 1).mean() * 100),
+    }
+    result['coortes'], result['retencao_media'] = cohort_table(
+        inverse, first_month, months, values, _month_index(today), n_cohorts
+    )
+
+    k = min(top_n, buyers.size)
+    top = np.argpartition(-ltv, k - 1)[:k]
+    top = top[np.argsort(-ltv[top], kind='stable')]
+    top_ids = [int(user_id) for user_id in buyers[top]]
+    names = {row['id']: row for row in fetch_all(cur, _NOMES, (top_ids,))}
+    result['top_compradores'] = [
+        {
+            'id': user_id,
+            'username': names[user_id]['username'] if user_id in names else None,
+            'first_name': names[user_id]['first_name'] if user_id in names else None,
+            'compras': int(orders[i]),
+            'valor': float(ltv[i]),
+            'primeira_compra': _month_label(int(first_month[i])),
+        }
+        for user_id, i in zip(top_ids, top)
+    ]
+    return result
+
+
+def _load(get_connection, today):
+    conn = get_connection(readonly=True)
+    if conn is None:
+        return None
+    try:
+        with conn:
+            user_ids, months, values = load_purchases(conn)
+            print(f"DEBUG ANALYTICS: {user_ids.size} compras carregadas.")
+            return buyer_analytics(conn.cursor(), user_ids, months, values, today)
+    finally:
+        conn.close()
+
+
+def analytics_snapshot(get_connection, today):
+    """
+    Análise do dia `today`, calculada na primeira chamada do dia e reutilizada
+    nas seguintes. Retorna None se a conexão falhar.
+    """
+    with _cache_lock:
+        if _cache['key'] == today:
+            return _cache['value']
+        snapshot = _load(get_connection, today)
+        if snapshot is not None:
+            _cache.update(key=today, value=snapshot)
+        return snapshot
@@ -0,0 +1,211 @@
+# web/services/assets.py
+"""
+Arquivos estáticos do painel com nome por conteúdo (fingerprint) e versões
+pré-comprimidas.
+
+`build()` copia cada arquivo de ASSET_SOURCES (web/static) para
+web/static/dist/ como `nome.<hash>.ext`, grava ao lado as versões .gz e .br
+(compressão máxima, feita uma vez só) e o manifest.json com o nome lógico ->
+nome final. Não acessa a rede.
+
+Chart.js e Day.js ficam versionados no repositório, em web/static/vendor/.
+Para trocar de versão, ajuste a URL e o sha256 em VENDOR e rode `vendor`: o
+arquivo só é gravado se o conteúdo baixado bater com o sha256 fixado (um CDN
+fora do ar ou uma resposta adulterada não chega ao disco). Sem sha256
+fixado, o comando não grava nada e só mostra o hash obtido, para ser
+conferido com o da versão publicada e fixado em VENDOR.
+
+    python -m web.services.assets vendor   # manutenção: baixa e confere os vendors
+    python -m web.services.assets build    # etapa de build do deploy
+
+O build roda na etapa de build do deploy (bin/post_compile no buildpack
+Python; no Render, no build command depois do `pip install`), nunca na
+subida do dyno web. Na subida do app, `ensure_built()` apenas carrega o
+manifest: se ele faltar ou estiver mais velho que algum arquivo de origem
+(ex.: desenvolvimento local sem rodar o build), avisa no log e as páginas
+usam os arquivos de /static.
+
+Nos templates, `asset_url('css/layout.css')` aponta para /assets/<nome com
+hash>; `send_asset()` entrega o .br ou o .gz conforme o Accept-Encoding,
+com cache de um ano (`immutable`): mudou o conteúdo, muda o nome. Um vendor
+que não está em web/static/vendor/ cai no CDN de origem, com um AVISO na
+subida.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+from collections import namedtuple
+
+import brotli
+import requests
+from flask import abort, request, send_file, url_for
+from werkzeug.security import safe_join
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+Vendor = namedtuple('Vendor', ['url', 'sha256'])
+
+# sha256 do arquivo publicado; None = ainda não conferido (o `vendor` não grava).
+VENDOR = {
+    'vendor/chart.umd.min.js': Vendor('https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js', None),
+    'vendor/dayjs.min.js': Vendor('https://cdn.jsdelivr.net/npm/dayjs@1.10.7/dayjs.min.js', None),
+}
+ASSET_SOURCES = ['css/layout.css', 'js/layout.js'] + list(VENDOR)
+# Abaixo disso a versão comprimida não compensa o cabeçalho extra.
+_COMPRESS_MIN_BYTES = 512
+_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest = {}
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def fetch_vendors():
+    """
+    Baixa os vendors de VENDOR e grava os que batem com o sha256 fixado.
+    Retorna a lista dos gravados; nada é gravado em caso de divergência.
+    """
+    written = []
+    for name, vendor in VENDOR.items():
+        try:
+            response = requests.get(vendor.url, timeout=30)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            print(f"ERRO ASSETS: Não foi possível baixar {vendor.url} ({e}).")
+            continue
+        digest = _sha256(response.content)
+        if vendor.sha256 is None:
+            print(f"AVISO ASSETS: {name} sem sha256 fixado em VENDOR; não gravado. "
+                  f"Conteúdo baixado: sha256={digest} (confira com a versão publicada).")
+            continue
+        if digest != vendor.sha256:
+            print(f"ERRO ASSETS: sha256 de {vendor.url} não confere "
+                  f"(esperado {vendor.sha256}, recebido {digest}); não gravado.")
+            continue
+        path = os.path.join(STATIC_DIR, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, response.content)
+        written.append(name)
+    return written
+
+
+def _write_atomic(path, data):
+    # Grava num temporário e troca o arquivo de uma vez: um worker que esteja
+    # subindo nunca lê um manifest ou arquivo pela metade.
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build():
+    """Gera web/static/dist (arquivos com hash, .gz, .br e manifest.json) e retorna o manifest."""
+    os.makedirs(DIST_DIR, exist_ok=True)
+    manifest = {}
+    for name in ASSET_SOURCES:
+        source = os.path.join(STATIC_DIR, name)
+        if not os.path.exists(source):
+            if name in VENDOR:
+                print(f"AVISO ASSETS: {name} não está em web/static/vendor/; a página usará o CDN.")
+            continue
+        with open(source, 'rb') as f:
+            data = f.read()
+        pinned = VENDOR[name].sha256 if name in VENDOR else None
+        if pinned and _sha256(data) != pinned:
+            print(f"ERRO ASSETS: {name} não confere com o sha256 fixado em VENDOR; ficou fora do build.")
+            continue
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{_sha256(data)[:12]}{ext}"
+        target = os.path.join(DIST_DIR, hashed)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _write_atomic(target, data)
+            if len(data) >= _COMPRESS_MIN_BYTES:
+                _write_atomic(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                _write_atomic(target + '.br', brotli.compress(data, quality=11))
+        manifest[name] = hashed
+    _write_atomic(MANIFEST_PATH, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    _manifest.clear()
+    _manifest.update(manifest)
+    return manifest
+
+
+def _stale():
+    if not os.path.exists(MANIFEST_PATH):
+        return True
+    built_at = os.path.getmtime(MANIFEST_PATH)
+    return any(
+        os.path.getmtime(os.path.join(STATIC_DIR, name)) > built_at
+        for name in ASSET_SOURCES
+        if os.path.exists(os.path.join(STATIC_DIR, name))
+    )
+
+
+def ensure_built():
+    """
+    Carrega o manifest gerado por `build()`. Ausente ou desatualizado, fica
+    vazio: `asset_url()` cai no /static e no CDN, com um aviso no log.
+    """
+    _manifest.clear()
+    if _stale():
+        print("AVISO ASSETS: Manifest ausente ou desatualizado; servindo /static e CDN sem hash. "
+              "Rode `python -m web.services.assets build`.")
+        return
+    with open(MANIFEST_PATH, encoding='utf-8') as f:
+        _manifest.update(json.load(f))
+    for name in VENDOR:
+        if name not in _manifest:
+            print(f"AVISO ASSETS: {name} fora do build; servido pelo CDN ({VENDOR[name].url}).")
+
+
+def asset_url(name):
+    """URL do arquivo com hash (Jinja: `{{ asset_url('js/layout.js') }}`)."""
+    hashed = _manifest.get(name)
+    if hashed:
+        return url_for('send_asset', filename=hashed)
+    if name in VENDOR:
+        return VENDOR[name].url
+    return url_for('static', filename=name)
+
+
+def send_asset(filename):
+    """Entrega um arquivo de web/static/dist, pré-comprimido quando o navegador aceita."""
+    path = safe_join(DIST_DIR, filename)
+    if path is None or filename.endswith(('.gz', '.br', '.json')) or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for name, suffix in _ENCODINGS:
+        if name in request.accept_encodings and os.path.isfile(path + suffix):
+            encoding, path = name, path + suffix
+            break
+
+    response = send_file(path, mimetype=mimetype, max_age=ASSETS_MAX_AGE, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+if __name__ == '__main__':
+    command = sys.argv[1:]
+    if command == ['vendor']:
+        written = fetch_vendors()
+        print(f"{len(written)}/{len(VENDOR)} vendor(s) gravado(s) em web/static/vendor/.")
+        sys.exit(0 if len(written) == len(VENDOR) else 1)
+    if command != ['build']:
+        print(__doc__)
+        sys.exit(2)
+    for name, hashed in build().items():
+        print(f"{name} -> dist/{hashed}")
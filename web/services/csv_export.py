@@ -0,0 +1,60 @@
+# web/services/csv_export.py
+"""
+Exportações CSV em streaming (/vendas/export.csv e /usuarios/export.csv).
+
+As linhas saem do banco em lotes de EXPORT_LOTE por um cursor server-side
+(PostgreSQL) ou por fetchmany (SQLite) e cada lote vira um pedaço da
+resposta, então a memória usada não depende do tamanho da tabela.
+"""
+import csv
+import io
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+from database.query import fetch_chunks, streaming_cursor
+
+EXPORT_LOTE = int(os.getenv('EXPORT_LOTE', '2000'))
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def stream_csv(conn, query, params, columns, cursor_name):
+    """
+    Gera o CSV (cabeçalho + linhas) em pedaços de texto. `columns` é uma lista
+    de (cabeçalho, coluna). A conexão não é fechada aqui: quem monta a
+    resposta a fecha ao final (Response.call_on_close).
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+
+    def take():
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    # BOM para o Excel abrir acentos corretamente.
+    buffer.write('\ufeff')
+    writer.writerow([header for header, _ in columns])
+    yield take()
+
+    cur = streaming_cursor(conn, cursor_name)
+    try:
+        for rows in fetch_chunks(cur, query, params, EXPORT_LOTE):
+            writer.writerows([_cell(row[key]) for _, key in columns] for row in rows)
+            yield take()
+    finally:
+        cur.close()
@@ -0,0 +1,249 @@
+# web/services/dashboard.py
+"""
+Métricas de vendas do painel (index() e /api/sales_data).
+
+Tudo é lido de `sales_daily_rollup` (database/rollup.py), que já guarda a
+quantidade e a receita das vendas aprovadas por dia e produto; `vendas` não é
+varrida. Os dias sem vendas são preenchidos com zero aqui, no Python.
+
+Os indicadores do index() (usuários, produtos, receita total, mês atual e
+anterior) saem de uma única consulta, e o painel montado fica em cache no
+processo por DASHBOARD_CACHE_TTL segundos. `invalidate()` descarta o cache
+quando uma venda é aprovada ou um produto é criado/removido; como cada worker
+do gunicorn tem o seu cache, nos outros workers a mudança aparece quando o TTL
+vence.
+
+No /api/sales_data a série pode vir por dia, semana (começando na segunda)
+ou mês: a granularidade é escolhida pelo tamanho do período (até
+SALES_CHART_MAX_DAILY dias por dia, até SALES_CHART_MAX_WEEKLY dias por
+semana, acima disso por mês) ou pedida explicitamente, e o agrupamento é
+feito no banco, então o número de pontos fica limitado qualquer que seja o
+período.
+
+As datas vão como texto 'AAAA-MM-DD', que compara certo com a coluna DATE
+do PostgreSQL e com o texto gravado no SQLite.
+"""
+import os
+import threading
+import time as time_module
+from datetime import timedelta
+
+from database.query import Query, fetch_all, fetch_one
+
+DASHBOARD_CACHE_TTL = float(os.getenv('DASHBOARD_CACHE_TTL', '30'))
+# Dias do gráfico do index() (terminando hoje).
+DASHBOARD_CHART_DAYS = 7
+
+# Acima destes tamanhos (em dias) a granularidade automática passa a semana / mês.
+SALES_CHART_MAX_DAILY = int(os.getenv('SALES_CHART_MAX_DAILY', '92'))
+SALES_CHART_MAX_WEEKLY = int(os.getenv('SALES_CHART_MAX_WEEKLY', '730'))
+
+DAY = 'day'
+WEEK = 'week'
+MONTH = 'month'
+GRANULARITIES = (DAY, WEEK, MONTH)
+
+_VENDAS_POR_PERIODO = """
+    SELECT {bucket} AS periodo, SUM(receita) AS sum, SUM(quantidade) AS count
+    FROM sales_daily_rollup
+    WHERE dia >= %s AND dia <= %s
+    GROUP BY {bucket}
+"""
+# Início do período de cada dia: a segunda-feira da semana ou o dia 1 do mês.
+_INICIO_PERIODO = {
+    DAY: ("dia", "dia"),
+    WEEK: (
+        "CAST(date_trunc('week', dia) AS DATE)",
+        "date(dia, '-' || ((CAST(strftime('%%w', dia) AS INTEGER) + 6) %% 7) || ' days')",
+    ),
+    MONTH: ("CAST(date_trunc('month', dia) AS DATE)", "strftime('%%Y-%%m-01', dia)"),
+}
+_SERIE_POR_GRANULARIDADE = {
+    granularity: Query(
+        _VENDAS_POR_PERIODO.format(bucket=postgres), sqlite=_VENDAS_POR_PERIODO.format(bucket=sqlite)
+    )
+    for granularity, (postgres, sqlite) in _INICIO_PERIODO.items()
+}
+_ROTULO = {DAY: '%d/%m', WEEK: '%d/%m/%y', MONTH: '%m/%Y'}
+# Subconsultas escalares para as contagens e agregados condicionais para os dois
+# meses: uma ida ao banco só, e uma única passada no agregado diário.
+_INDICADORES = """
+    SELECT
+        (SELECT COUNT(id) FROM users WHERE is_active = {true}) AS total_usuarios,
+        (SELECT COUNT(id) FROM produtos) AS total_produtos,
+        SUM(receita) AS receita_total,
+        SUM(CASE WHEN dia >= %s AND dia <= %s THEN quantidade ELSE 0 END) AS atual_quantidade,
+        SUM(CASE WHEN dia >= %s AND dia <= %s THEN receita ELSE 0 END) AS atual_valor,
+        SUM(CASE WHEN dia >= %s AND dia <= %s THEN quantidade ELSE 0 END) AS anterior_quantidade,
+        SUM(CASE WHEN dia >= %s AND dia <= %s THEN receita ELSE 0 END) AS anterior_valor
+    FROM sales_daily_rollup
+"""
+_VENDAS_RECENTES = """
+    SELECT v.id, u.username, u.first_name, p.nome, v.preco, v.data_venda, p.id AS produto_id, v.status
+    FROM vendas v JOIN users u ON v.user_id = u.id JOIN produtos p ON v.produto_id = p.id
+    ORDER BY v.id DESC LIMIT 5
+"""
+
+_cache_lock = threading.Lock()
+_cache = {'key': None, 'expires_at': 0.0, 'value': None}
+
+
+def _day_key(value):
+    # PostgreSQL devolve `date`; SQLite, o texto 'AAAA-MM-DD'.
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)[:10]
+
+
+def _int(value):
+    return int(value) if value is not None else 0
+
+
+def _float(value):
+    return float(value) if value is not None else 0.0
+
+
+def _variation(current, previous):
+    if previous > 0:
+        return ((current - previous) / previous) * 100
+    return 100.0 if current > 0 else 0.0
+
+
+def month_ranges(today):
+    """((início, fim) do mês de `today`, (início, fim) do mês anterior), como datas."""
+    start_current = today.replace(day=1)
+    if today.month == 12:
+        end_current = today.replace(day=31)
+    else:
+        end_current = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
+    end_previous = start_current - timedelta(days=1)
+    return (start_current, end_current), (end_previous.replace(day=1), end_previous)
+
+
+def choose_granularity(start_date, end_date, requested=None):
+    """
+    Granularidade da série de `start_date` a `end_date`: a pedida, se houver,
+    ou a automática pelo tamanho do período. Levanta ValueError se
+    `requested` não for 'day', 'week' ou 'month'.
+    """
+    if requested:
+        if requested not in GRANULARITIES:
+            raise ValueError(f"Granularidade inválida: {requested!r}")
+        return requested
+    days = (end_date - start_date).days + 1
+    if days <= SALES_CHART_MAX_DAILY:
+        return DAY
+    if days <= SALES_CHART_MAX_WEEKLY:
+        return WEEK
+    return MONTH
+
+
+def _period_start(day, granularity):
+    if granularity == WEEK:
+        return day - timedelta(days=day.weekday())
+    if granularity == MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def _next_period(day, granularity):
+    if granularity == WEEK:
+        return day + timedelta(days=7)
+    if granularity == MONTH:
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def sales_series(cur, start_date, end_date, granularity=DAY):
+    """
+    Retorna (labels, receita, quantidade) de `start_date` a `end_date`
+    (inclusive), um ponto por dia, semana ou mês, com zero nos períodos sem
+    vendas aprovadas. A primeira e a última semana/mês contam só os dias
+    dentro do intervalo.
+    """
+    rows = fetch_all(
+        cur, _SERIE_POR_GRANULARIDADE[granularity], (start_date.isoformat(), end_date.isoformat())
+    )
+    by_period = {_day_key(row['periodo']): row for row in rows}
+
+    labels, receita, quantidade = [], [], []
+    period = _period_start(start_date, granularity)
+    while period <= end_date:
+        row = by_period.get(period.isoformat())
+        labels.append(period.strftime(_ROTULO[granularity]))
+        receita.append(float(row['sum']) if row and row['sum'] is not None else 0)
+        quantidade.append(int(row['count']) if row and row['count'] is not None else 0)
+        period = _next_period(period, granularity)
+    return labels, receita, quantidade
+
+
+def daily_sales_series(cur, start_date, end_date):
+    """Série diária de `start_date` a `end_date` (o gráfico inicial do index())."""
+    return sales_series(cur, start_date, end_date, DAY)
+
+
+def dashboard_kpis(cur, today):
+    """Indicadores do index() para o dia `today`, numa única consulta."""
+    (start_current, end_current), (start_previous, end_previous) = month_ranges(today)
+    row = fetch_one(cur, _INDICADORES, (
+        start_current.isoformat(), end_current.isoformat(),
+        start_current.isoformat(), end_current.isoformat(),
+        start_previous.isoformat(), end_previous.isoformat(),
+        start_previous.isoformat(), end_previous.isoformat(),
+    ))
+    row = dict(row) if row else {}
+    kpis = {
+        'total_usuarios': _int(row.get('total_usuarios')),
+        'total_produtos': _int(row.get('total_produtos')),
+        'receita_total': _float(row.get('receita_total')),
+        'periodo_atual_vendas_quantidade': _int(row.get('atual_quantidade')),
+        'periodo_atual_vendas_valor': _float(row.get('atual_valor')),
+        'periodo_anterior_vendas_quantidade': _int(row.get('anterior_quantidade')),
+        'periodo_anterior_vendas_valor': _float(row.get('anterior_valor')),
+    }
+    kpis['variacao_vendas_quantidade'] = _variation(
+        kpis['periodo_atual_vendas_quantidade'], kpis['periodo_anterior_vendas_quantidade']
+    )
+    kpis['variacao_vendas_valor'] = _variation(
+        kpis['periodo_atual_vendas_valor'], kpis['periodo_anterior_vendas_valor']
+    )
+    return kpis
+
+
+def _load_snapshot(get_connection, today):
+    conn = get_connection(readonly=True)
+    if conn is None:
+        return None
+    try:
+        with conn:
+            cur = conn.cursor()
+            snapshot = dashboard_kpis(cur, today)
+            snapshot['vendas_recentes'] = fetch_all(cur, _VENDAS_RECENTES)
+            labels, receita, quantidade = daily_sales_series(
+                cur, today - timedelta(days=DASHBOARD_CHART_DAYS - 1), today
+            )
+            snapshot.update(chart_labels=labels, chart_data_receita=receita, chart_data_quantidade=quantidade)
+            return snapshot
+    finally:
+        conn.close()
+
+
+def dashboard_snapshot(get_connection, today):
+    """
+    Dados do index() para o dia `today` (indicadores, vendas recentes e
+    gráfico), do cache se ainda válido. `get_connection` é chamado só quando
+    é preciso ir ao banco; retorna None se a conexão falhar.
+    """
+    # Serializa as recargas: com vários admins abertos, só um vai ao banco quando o TTL vence.
+    with _cache_lock:
+        now = time_module.monotonic()
+        if _cache['key'] == today and _cache['expires_at'] > now:
+            return _cache['value']
+        snapshot = _load_snapshot(get_connection, today)
+        if snapshot is not None:
+            _cache.update(key=today, expires_at=now + DASHBOARD_CACHE_TTL, value=snapshot)
+        return snapshot
+
+
+def invalidate():
+    """Descarta o painel em cache (venda aprovada, produto criado ou removido)."""
+    with _cache_lock:
+        _cache.update(key=None, expires_at=0.0, value=None)
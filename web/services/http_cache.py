@@ -0,0 +1,37 @@
+# web/services/http_cache.py
+"""
+GET condicional (ETag / If-None-Match) para os endpoints JSON do painel.
+
+A ETag vem de um marcador de versão barato (ex.: rollup.data_version(), uma
+contagem no agregado diário do período), consultado antes das consultas
+pesadas: se o navegador já tem aquela versão, a resposta é um 304 sem corpo.
+
+`max_age` None = "private, no-cache" (o navegador guarda, mas revalida a
+cada uso, o que custa só o 304); com `max_age`, o navegador reutiliza a
+resposta sem perguntar durante esse tempo.
+"""
+import hashlib
+
+from flask import Response, request
+
+
+def make_etag(*parts):
+    """ETag forte a partir das partes que identificam o conteúdo."""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def apply_cache_headers(response, etag, max_age=None):
+    response.set_etag(etag)
+    response.cache_control.private = True
+    if max_age:
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(etag, max_age=None):
+    """304 para o cliente que já tem `etag`, ou None se for preciso responder com o corpo."""
+    if etag not in request.if_none_match:
+        return None
+    return apply_cache_headers(Response(status=304), etag, max_age)
@@ -0,0 +1,177 @@
+# web/services/live_feed.py
+"""
+Painel ao vivo (/api/eventos): Server-Sent Events com as vendas aprovadas e
+os passes ativados, lidos de `painel_eventos` (database/painel_eventos.py).
+
+Cada worker do gunicorn tem uma única thread ouvinte, iniciada na primeira
+conexão de um navegador:
+
+- PostgreSQL: uma conexão própria (fora do pool) em LISTEN painel_eventos,
+  acordada pelo NOTIFY que o webhook emite no commit;
+- SQLite: consulta a tabela a cada PAINEL_EVENTOS_POLL segundos.
+
+Nos dois casos a thread lê as linhas novas por id e as guarda num buffer em
+memória (os últimos PAINEL_EVENTOS_BUFFER eventos); as conexões SSE só
+esperam numa Condition e leem do buffer, então nenhum navegador aberto
+segura conexão do pool, e o custo no banco é o mesmo com 1 ou 50 abas.
+
+Como o id é gerado no INSERT e não no commit, uma transação mais lenta pode
+gravar um id menor que outro já lido: a thread relê sempre os últimos
+_RELEITURA ids e descarta os que já viu.
+
+Cada conexão SSE dura no máximo PAINEL_EVENTOS_MAX_CONEXAO segundos (libera a
+thread do gunicorn); o navegador reconecta sozinho e envia Last-Event-ID, e o
+que ainda estiver no buffer é reenviado.
+
+Como cada conexão aberta ocupa uma thread do worker, no máximo
+PAINEL_EVENTOS_MAX_STREAMS ficam abertas ao mesmo tempo por worker (por
+padrão um quarto de GUNICORN_THREADS); acima disso /api/eventos responde 503
+com `retry:` e o painel tenta de novo depois, sem tirar threads das páginas.
+"""
+import json
+import os
+import select
+import threading
+import time as time_module
+import traceback
+from collections import deque
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+
+from database import get_db_connection
+from database import painel_eventos
+
+PAINEL_EVENTOS_POLL = float(os.getenv('PAINEL_EVENTOS_POLL', '2'))
+PAINEL_EVENTOS_HEARTBEAT = float(os.getenv('PAINEL_EVENTOS_HEARTBEAT', '15'))
+PAINEL_EVENTOS_MAX_CONEXAO = float(os.getenv('PAINEL_EVENTOS_MAX_CONEXAO', '300'))
+PAINEL_EVENTOS_BUFFER = int(os.getenv('PAINEL_EVENTOS_BUFFER', '200'))
+PAINEL_EVENTOS_MAX_STREAMS = int(os.getenv(
+    'PAINEL_EVENTOS_MAX_STREAMS', str(max(1, int(os.getenv('GUNICORN_THREADS', '16')) // 4))
+))
+# Espera (ms) sugerida ao navegador antes de reconectar.
+RETRY_MS = int(PAINEL_EVENTOS_POLL * 1000)
+_RELEITURA = 50
+
+_streams = threading.BoundedSemaphore(PAINEL_EVENTOS_MAX_STREAMS)
+
+_cond = threading.Condition()
+# (seq, evento): seq é local ao processo e só cresce, mesmo quando um id chega fora de ordem.
+_buffer = deque(maxlen=PAINEL_EVENTOS_BUFFER)
+_state = {'seq': 0, 'last_id': None, 'seen': set(), 'thread': None}
+
+
+def _read_new(cur):
+    """Lê os eventos ainda não vistos e os entrega às conexões SSE deste processo."""
+    if _state['last_id'] is None:
+        # Só o que acontecer daqui em diante: o painel acabou de carregar o resto.
+        last_id = painel_eventos.last_event_id(cur)
+        _state['seen'] = {e['id'] for e in painel_eventos.events_after(cur, max(last_id - _RELEITURA, 0))}
+        _state['last_id'] = last_id
+        return
+    floor = max(_state['last_id'] - _RELEITURA, 0)
+    new = [e for e in painel_eventos.events_after(cur, floor) if e['id'] not in _state['seen']]
+    if not new:
+        return
+    with _cond:
+        for event in new:
+            _state['seq'] += 1
+            _buffer.append((_state['seq'], event))
+            _state['seen'].add(event['id'])
+        _state['last_id'] = max(_state['last_id'], max(e['id'] for e in new))
+        _state['seen'] = {i for i in _state['seen'] if i > _state['last_id'] - _RELEITURA}
+        _cond.notify_all()
+
+
+def _listen_postgres(dsn):
+    conn = psycopg2.connect(dsn, cursor_factory=psycopg2.extras.RealDictCursor)
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {painel_eventos.CANAL}")
+            while True:
+                _read_new(cur)
+                # Sem NOTIFY, relê assim mesmo após o intervalo (cobre um aviso perdido).
+                if select.select([conn], [], [], PAINEL_EVENTOS_POLL) != ([], [], []):
+                    conn.poll()
+                    conn.notifies.clear()
+    finally:
+        conn.close()
+
+
+def _poll_sqlite():
+    while True:
+        # Banco principal, não a réplica: o evento tem de aparecer assim que o webhook grava.
+        conn = get_db_connection()
+        if conn is None:
+            print("ERRO PAINEL AO VIVO: Sem conexão com o banco de dados.")
+        else:
+            try:
+                with conn:
+                    _read_new(conn.cursor())
+            finally:
+                conn.close()
+        time_module.sleep(PAINEL_EVENTOS_POLL)
+
+
+def _listener():
+    print("PAINEL AO VIVO: Ouvinte de eventos iniciado.")
+    while True:
+        try:
+            dsn = os.getenv('DATABASE_URL')
+            if dsn:
+                _listen_postgres(dsn)
+            else:
+                _poll_sqlite()
+        except Exception as e:
+            print(f"ERRO PAINEL AO VIVO: {e}")
+            traceback.print_exc()
+        time_module.sleep(PAINEL_EVENTOS_POLL)
+
+
+def _ensure_listener():
+    with _cond:
+        if _state['thread'] is None:
+            _state['thread'] = threading.Thread(target=_listener, name='painel-eventos', daemon=True)
+            _state['thread'].start()
+
+
+def acquire_stream():
+    """Reserva uma das PAINEL_EVENTOS_MAX_STREAMS vagas de conexão SSE; False se estão todas ocupadas."""
+    return _streams.acquire(blocking=False)
+
+
+def release_stream():
+    _streams.release()
+
+
+def _frame(event):
+    return f"id: {event['id']}\nevent: {event['tipo']}\ndata: {json.dumps(event['dados'])}\n\n"
+
+
+def stream(last_event_id=None):
+    """
+    Gera o texto SSE de uma conexão: os eventos do buffer posteriores a
+    `last_event_id` (reconexão) e depois os novos, com um comentário de
+    keep-alive a cada PAINEL_EVENTOS_HEARTBEAT segundos sem eventos.
+    """
+    _ensure_listener()
+    with _cond:
+        seq = _state['seq']
+        if last_event_id is not None:
+            missed = [s for s, event in _buffer if event['id'] > last_event_id]
+            if missed:
+                seq = missed[0] - 1
+
+    yield f"retry: {RETRY_MS}\n\n"
+    deadline = time_module.monotonic() + PAINEL_EVENTOS_MAX_CONEXAO
+    while time_module.monotonic() < deadline:
+        with _cond:
+            _cond.wait_for(lambda: _state['seq'] > seq, timeout=PAINEL_EVENTOS_HEARTBEAT)
+            pending = [(s, event) for s, event in _buffer if s > seq]
+        if not pending:
+            yield ": keep-alive\n\n"
+            continue
+        seq = pending[-1][0]
+        yield ''.join(_frame(event) for _, event in pending)
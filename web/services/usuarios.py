@@ -0,0 +1,118 @@
+# web/services/usuarios.py
+"""
+Listagem paginada de /usuarios e contagens da página de broadcast.
+
+A listagem é por keyset em (data_registro, id), do mais recente para o mais
+antigo: o cursor da próxima página é o par da última linha exibida, então
+nenhuma página faz OFFSET nem conta a tabela inteira.
+
+A pesquisa é por prefixo (`ana` acha "Ana Maria" e "@anabela"), sem
+diferenciar maiúsculas, em username e first_name, usando os índices
+idx_users_username_prefixo / idx_users_first_name_prefixo. Um termo numérico
+também procura o id do Telegram.
+"""
+import os
+
+from database.query import dialect_of, fetch_all, fetch_one, SQLITE, POSTGRES
+
+USUARIOS_POR_PAGINA = int(os.getenv('USUARIOS_POR_PAGINA', '50'))
+
+_USUARIOS_BASE = """
+    SELECT u.id, u.username, u.first_name, u.last_name, u.data_registro, u.is_active
+    FROM users u
+"""
+# Colunas do CSV de /usuarios/export.csv: (cabeçalho, coluna do SELECT).
+EXPORT_COLUMNS = [
+    ('id', 'id'), ('username', 'username'), ('first_name', 'first_name'), ('last_name', 'last_name'),
+    ('data_registro', 'data_registro'), ('ativo', 'is_active'),
+]
+_CONTAGENS = """
+    SELECT COUNT(*) AS total, SUM(CASE WHEN is_active = {true} THEN 1 ELSE 0 END) AS ativos
+    FROM users
+"""
+# No SQLite o LIKE já ignora caixa e só usa o índice COLLATE NOCASE se a coluna
+# aparecer sem função em volta; no PostgreSQL o índice é sobre lower(col).
+_PREFIXO = {
+    SQLITE: "(u.username LIKE %s ESCAPE '\\' OR u.first_name LIKE %s ESCAPE '\\')",
+    POSTGRES: "(lower(u.username) LIKE %s ESCAPE '\\' OR lower(u.first_name) LIKE %s ESCAPE '\\')",
+}
+_CURSOR_SEP = '|'
+
+
+def _like_prefix(term):
+    escaped = term.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
+
+def encode_cursor(row):
+    return f"{row['data_registro']}{_CURSOR_SEP}{row['id']}"
+
+
+def decode_cursor(cursor):
+    """(data_registro, id) do cursor; levanta ValueError se ele não for válido."""
+    data_registro, _, user_id = cursor.rpartition(_CURSOR_SEP)
+    if not data_registro:
+        raise ValueError(f"Cursor inválido: {cursor!r}")
+    return data_registro, int(user_id)
+
+
+def user_filters(cur, pesquisa=None, status=None):
+    """Condições e parâmetros da pesquisa por prefixo e do filtro ativo/inativo."""
+    conditions = []
+    params = []
+
+    termo = (pesquisa or '').strip().lstrip('@')
+    if termo:
+        condition = _PREFIXO[dialect_of(cur)]
+        params.extend([_like_prefix(termo)] * 2)
+        if termo.isdigit():
+            condition = f"({condition} OR u.id = %s)"
+            params.append(int(termo))
+        conditions.append(condition)
+    if status == 'ativo':
+        conditions.append("u.is_active = {true}")
+    elif status == 'inativo':
+        conditions.append("u.is_active = {false}")
+    return conditions, params
+
+
+def users_page(cur, pesquisa=None, status=None, cursor=None, limit=USUARIOS_POR_PAGINA):
+    """
+    Uma página da listagem: retorna (usuarios, proximo_cursor), com
+    `proximo_cursor` None na última página. `status` é 'ativo', 'inativo' ou vazio.
+    """
+    conditions, params = user_filters(cur, pesquisa, status)
+    if cursor:
+        data_registro, user_id = decode_cursor(cursor)
+        conditions.append("(u.data_registro < %s OR (u.data_registro = %s AND u.id < %s))")
+        params.extend([data_registro, data_registro, user_id])
+
+    sql = _USUARIOS_BASE
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    # Uma linha a mais só para saber se existe a próxima página.
+    sql += " ORDER BY u.data_registro DESC, u.id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    rows = fetch_all(cur, sql, params)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def export_query(cur, pesquisa=None, status=None):
+    """(sql, params) da exportação CSV, com os mesmos filtros da listagem."""
+    conditions, params = user_filters(cur, pesquisa, status)
+    sql = _USUARIOS_BASE
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    return sql + " ORDER BY u.data_registro DESC, u.id DESC", params
+
+
+def user_counts(cur):
+    """Retorna (total, ativos) de `users`."""
+    row = fetch_one(cur, _CONTAGENS)
+    if not row:
+        return 0, 0
+    return int(row['total'] or 0), int(row['ativos'] or 0)
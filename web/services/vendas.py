@@ -0,0 +1,210 @@
+# web/services/vendas.py
+"""
+Listagem paginada de /vendas (e do endpoint JSON /api/vendas).
+
+Paginação por keyset em `v.id DESC`: cada página traz as vendas com id menor
+que o cursor recebido (o id da última linha da página anterior), então o
+custo de uma página não depende de quantas vieram antes (sem OFFSET) e uma
+venda nova não desloca as páginas já carregadas.
+
+Todos os filtros da tela (período, pesquisa, produto e status) entram no
+mesmo WHERE junto com o cursor.
+
+A pesquisa procura o termo (substring, sem diferenciar maiúsculas) em
+username, first_name e no nome do produto, mas primeiro nas tabelas de
+usuários e produtos, por índice, e só depois nas vendas deles
+(idx_vendas_usuario / idx_vendas_produto):
+
+- PostgreSQL: ILIKE '%termo%' atendido pelos índices GIN de pg_trgm;
+- SQLite: MATCH nas tabelas FTS5 (tokenizador trigram) users_fts e
+  produtos_fts. Termos com menos de 3 letras, ou bancos sem essas tabelas,
+  caem no LIKE sem índice (migração 0011).
+
+Com pesquisa, os resultados vêm por relevância (0 = igual ao termo,
+1 = começa com o termo, 2 = contém) e, dentro de cada faixa, por `v.id DESC`;
+o cursor passa a ser 'faixa:id'.
+"""
+import os
+from datetime import datetime, timedelta
+
+from database.query import dialect_of, fetch_all, fetch_value, SQLITE
+
+VENDAS_POR_PAGINA = int(os.getenv('VENDAS_POR_PAGINA', '50'))
+VENDAS_POR_PAGINA_MAX = 200
+# O tokenizador trigram do FTS5 só encontra termos a partir de 3 caracteres.
+FTS_TRIGRAM_MIN = 3
+
+_VENDAS_COLUNAS = """
+    SELECT
+        v.id,
+        u.username,
+        u.first_name,
+        p.nome AS nome_produto,
+        v.preco,
+        v.data_venda,
+        v.payment_id,
+        v.payer_name,
+        v.payer_email,
+        v.status"""
+_VENDAS_FROM = """
+    FROM vendas v
+    JOIN users u ON v.user_id = u.id
+    JOIN produtos p ON v.produto_id = p.id
+"""
+# Colunas do CSV de /vendas/export.csv: (cabeçalho, coluna do SELECT).
+EXPORT_COLUMNS = [
+    ('id', 'id'), ('data_venda', 'data_venda'), ('status', 'status'), ('preco', 'preco'),
+    ('produto_id', 'produto_id'), ('produto', 'nome_produto'),
+    ('user_id', 'user_id'), ('username', 'username'), ('first_name', 'first_name'),
+    ('payment_id', 'payment_id'), ('payer_name', 'payer_name'), ('payer_email', 'payer_email'),
+]
+_EXPORTACAO = """
+    SELECT v.id, v.data_venda, v.status, v.preco, v.produto_id, p.nome AS nome_produto,
+           v.user_id, u.username, u.first_name, v.payment_id, v.payer_name, v.payer_email"""
+# Um IN sobre a UNION (e não um OR entre tabelas do JOIN) deixa cada ramo usar os
+# seus índices: usuários/produtos encontrados -> vendas deles -> busca pelo id.
+_PESQUISA_LIKE = """v.id IN (
+        SELECT s.id FROM vendas s WHERE s.user_id IN (
+            SELECT id FROM users WHERE username {like} %s ESCAPE '\\' OR first_name {like} %s ESCAPE '\\')
+        UNION
+        SELECT s.id FROM vendas s WHERE s.produto_id IN (
+            SELECT id FROM produtos WHERE nome {like} %s ESCAPE '\\')
+    )"""
+_PESQUISA_FTS = """v.id IN (
+        SELECT s.id FROM vendas s WHERE s.user_id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH %s)
+        UNION
+        SELECT s.id FROM vendas s WHERE s.produto_id IN (SELECT rowid FROM produtos_fts WHERE produtos_fts MATCH %s)
+    )"""
+_RELEVANCIA = """CASE
+            WHEN lower(u.username) = %s OR lower(u.first_name) = %s OR lower(p.nome) = %s THEN 0
+            WHEN lower(u.username) LIKE %s ESCAPE '\\' OR lower(u.first_name) LIKE %s ESCAPE '\\'
+                 OR lower(p.nome) LIKE %s ESCAPE '\\' THEN 1
+            ELSE 2
+        END"""
+_FTS_TABELAS = ('users_fts', 'produtos_fts')
+_FTS_EXISTE = (
+    "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN "
+    "('" + "', '".join(_FTS_TABELAS) + "')"
+)
+_fts_ok = False
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _fts_available(cur):
+    # Só o resultado positivo fica em cache: a migração 0011 pode rodar com o app no ar.
+    global _fts_ok
+    if not _fts_ok:
+        _fts_ok = fetch_value(cur, _FTS_EXISTE) == len(_FTS_TABELAS)
+    return _fts_ok
+
+
+def _search_condition(cur, term):
+    """Condição da pesquisa: ids das vendas de usuários ou produtos que contêm `term`."""
+    if dialect_of(cur) == SQLITE and len(term) >= FTS_TRIGRAM_MIN and _fts_available(cur):
+        phrase = '"' + term.replace('"', '""') + '"'
+        return _PESQUISA_FTS, [phrase, phrase]
+    pattern = f"%{_escape_like(term)}%"
+    return _PESQUISA_LIKE, [pattern, pattern, pattern]
+
+
+def _relevance(term):
+    """Expressão da faixa de relevância e seus parâmetros."""
+    exact = term.lower()
+    prefix = _escape_like(exact) + '%'
+    return _RELEVANCIA, [exact, exact, exact, prefix, prefix, prefix]
+
+
+def search_term(args):
+    return (args.get('pesquisa') or '').strip()
+
+
+def sales_filters(cur, args):
+    """
+    Condições e parâmetros dos filtros da tela a partir de `request.args`.
+    Levanta ValueError se uma data não estiver em AAAA-MM-DD.
+    """
+    conditions = []
+    params = []
+
+    data_inicio_str = args.get('data_inicio')
+    data_fim_str = args.get('data_fim')
+    pesquisa_str = search_term(args)
+    produto_id_str = args.get('produto_id')
+    status_str = args.get('status')
+
+    # Faixas direto na coluna (sem DATE(...)) para usar o índice e a poda de partições.
+    if data_inicio_str:
+        conditions.append("v.data_venda >= %s")
+        params.append(datetime.strptime(data_inicio_str, '%Y-%m-%d'))
+    if data_fim_str:
+        conditions.append("v.data_venda < %s")
+        params.append(datetime.strptime(data_fim_str, '%Y-%m-%d') + timedelta(days=1))
+    if pesquisa_str:
+        condition, search_params = _search_condition(cur, pesquisa_str)
+        conditions.append(condition)
+        params.extend(search_params)
+    if produto_id_str:
+        conditions.append("v.produto_id = %s")
+        params.append(int(produto_id_str))
+    if status_str:
+        conditions.append("v.status = %s")
+        params.append(status_str)
+    return conditions, params
+
+
+def export_query(cur, args):
+    """
+    (sql, params) da exportação CSV: os mesmos filtros da tela, sem paginação
+    nem relevância, da venda mais recente para a mais antiga.
+    Levanta ValueError se um filtro for inválido.
+    """
+    conditions, params = sales_filters(cur, args)
+    sql = _EXPORTACAO + _VENDAS_FROM
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    return sql + " ORDER BY v.id DESC", params
+
+
+def sales_page(cur, args, cursor=None, limit=VENDAS_POR_PAGINA):
+    """
+    Uma página da listagem: retorna (vendas, proximo_cursor), com
+    `proximo_cursor` None quando não há mais páginas. O cursor é o id da
+    última venda ('faixa:id' quando há pesquisa); um cursor malformado
+    levanta ValueError.
+    """
+    limit = max(1, min(limit, VENDAS_POR_PAGINA_MAX))
+    conditions, params = sales_filters(cur, args)
+    term = search_term(args)
+
+    select_params = []
+    sql = _VENDAS_COLUNAS
+    if term:
+        relevance, select_params = _relevance(term)
+        sql += f",\n        {relevance} AS relevancia"
+    sql += _VENDAS_FROM
+
+    if cursor:
+        if term:
+            bucket, _, last_id = str(cursor).partition(':')
+            bucket, last_id = int(bucket), int(last_id)
+            relevance, relevance_params = _relevance(term)
+            conditions.append(f"({relevance} > %s OR ({relevance} = %s AND v.id < %s))")
+            params.extend(relevance_params + [bucket] + relevance_params + [bucket, last_id])
+        else:
+            conditions.append("v.id < %s")
+            params.append(int(cursor))
+
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    # Uma linha a mais só para saber se existe a próxima página.
+    sql += " ORDER BY relevancia, v.id DESC LIMIT %s" if term else " ORDER BY v.id DESC LIMIT %s"
+
+    rows = fetch_all(cur, sql, select_params + params + [limit + 1])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, f"{last['relevancia']}:{last['id']}" if term else last['id']
+    return rows, None